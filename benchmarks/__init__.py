@@ -0,0 +1 @@
+"""Benchmarks of the hot paths of `py_utils`, run with `python -m benchmarks`."""
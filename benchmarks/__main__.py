@@ -0,0 +1,74 @@
+"""Runs the benchmarks and compares runs.
+
+    python -m benchmarks run [--filter NAME] [--quick | --full] [--rounds N] [--output results.json]
+    python -m benchmarks compare baseline.json current.json [--threshold 0.1]
+"""
+from benchmarks import bench_orm, bench_utils  # noqa: F401, registers the benchmarks
+from benchmarks.harness import BENCHMARKS, compare, results_document, run
+
+import argparse
+import json
+import sys
+
+
+def _run(args) -> int:
+    benchmarks = [bench for bench in BENCHMARKS if not args.filter or args.filter in bench.name]
+    if not benchmarks:
+        print(f"No benchmark matches {args.filter!r}", file=sys.stderr)
+        return 2
+
+    def params(bench):
+        if args.quick:
+            return bench.params[:1]
+        if args.full and bench.full_params is not None:
+            return bench.full_params
+        return bench.params
+
+    rounds = 1 if args.quick and args.rounds is None else args.rounds
+    document = results_document(run(benchmarks, rounds=rounds, params=params))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+    return 0
+
+
+def _compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    comparison = compare(baseline, current, threshold=args.threshold)
+    print(f"{'benchmark':<50} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for entry in comparison:
+        print(f"{entry['benchmark']:<50} {entry['baseline'] * 1000:>12.3f} {entry['current'] * 1000:>12.3f} "
+              f"{entry['ratio']:>7.2f}{'  REGRESSED' if entry['regressed'] else ''}")
+    return 1 if any(entry["regressed"] for entry in comparison) else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--filter", help="Only run the benchmarks whose name contains this text")
+    sizes = run_parser.add_mutually_exclusive_group()
+    sizes.add_argument("--quick", action="store_true", help="Run the smallest size once, as a smoke test")
+    sizes.add_argument("--full", action="store_true", help="Also run the largest sizes, e.g. 1M rows")
+    run_parser.add_argument("--rounds", type=int, help="Overrides the number of rounds of every benchmark")
+    run_parser.add_argument("--output", help="The JSON file to write the results to")
+    run_parser.set_defaults(handler=_run)
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files, exits with 1 on a regression")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="The relative slowdown of the median reported as a regression. Defaults to 0.1")
+    compare_parser.set_defaults(handler=_compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
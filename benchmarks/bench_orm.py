@@ -0,0 +1,97 @@
+from benchmarks import data
+from benchmarks.harness import benchmark
+from py_utils.models import JobStatus
+from py_utils.orm import LOADING_STRATEGIES
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+import functools
+
+
+# The row counts of the query benchmarks
+QUERY_SIZES = (10000, 100000)
+FULL_QUERY_SIZES = QUERY_SIZES + (1000000,)
+
+
+def _fresh_database():
+    """Returns a client of an empty database, reused across rounds but emptied before each."""
+    db_client = _fresh_database.client
+    if db_client is None:
+        db_client = _fresh_database.client = data.new_database("inserts")
+    with db_client._engine.begin() as connection:
+        connection.execute(delete(JobStatus))
+    return db_client
+
+
+_fresh_database.client = None
+
+
+@benchmark(params=(1000,))
+def insert_data(count):
+    db_client = _fresh_database()
+    rows = list(data.job_statuses(count))
+
+    def run():
+        for row in rows:
+            db_client.insert_data(row)
+
+    return run
+
+
+@benchmark(params=(1000, 10000))
+def insert_many(count):
+    db_client = _fresh_database()
+    rows = list(data.job_statuses(count))
+    return functools.partial(db_client.insert_many, rows)
+
+
+@benchmark(params=(1000, 10000))
+def insert_many_return_defaults(count):
+    db_client = _fresh_database()
+    rows = list(data.job_statuses(count))
+    return functools.partial(db_client.insert_many, rows, return_defaults=True)
+
+
+@benchmark(params=(1000, 10000))
+def upsert(count):
+    db_client = _fresh_database()
+    rows = list(data.job_statuses(count))
+    db_client.insert_many(rows, return_defaults=True)
+    return functools.partial(db_client.upsert, rows)
+
+
+@benchmark(params=QUERY_SIZES, rounds=3, full_params=FULL_QUERY_SIZES)
+def query_model(count):
+    db_client = data.populated_database(count)
+    return functools.partial(db_client.query_model, JobStatus, load="noload")
+
+
+@benchmark(params=QUERY_SIZES, rounds=3, full_params=FULL_QUERY_SIZES)
+def iter_model(count):
+    db_client = data.populated_database(count)
+
+    def run():
+        for _ in db_client.iter_model(JobStatus, chunk_size=5000, load="noload"):
+            pass
+
+    return run
+
+
+@benchmark(params=QUERY_SIZES, rounds=3, full_params=FULL_QUERY_SIZES)
+def query_columns(count):
+    db_client = data.populated_database(count)
+    return functools.partial(db_client.query, JobStatus, columns=["id", "script_name", "elapsed_time"])
+
+
+@benchmark(params=("joined", "selectin", "lazy"), rounds=3)
+def relationship_loading(strategy):
+    """Loads 2,000 jobs with 3 reports each and reads the reports, `lazy` selects them one job at a time."""
+    db_client = data.populated_database(2000, reports_per_job=3)
+    statement = select(JobStatus).options(LOADING_STRATEGIES[strategy]("*"))
+
+    def run():
+        with Session(db_client._engine) as session:
+            for job_status in session.exec(statement).unique():
+                len(job_status.report_data)
+
+    return run
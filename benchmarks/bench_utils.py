@@ -0,0 +1,159 @@
+from benchmarks import data
+from benchmarks.harness import benchmark
+from py_utils import log_config, utils
+from py_utils.background_writer import BackgroundWriter
+from py_utils.mailer import Mailer
+from tests.py_utils.smtp_stub import StubSMTPServer
+
+import atexit
+import functools
+import logging
+import os
+import sys
+import tempfile
+
+
+_directory = tempfile.TemporaryDirectory(prefix="py_utils-benchmarks-files-")
+_smtp_server = None
+
+
+def _smtp_port() -> int:
+    """Starts the local SMTP stub on first use, it runs until exit."""
+    global _smtp_server
+    if _smtp_server is None:
+        _smtp_server = StubSMTPServer().__enter__()
+        atexit.register(_smtp_server.__exit__, None, None, None)
+    # the stub keeps the messages it receives
+    _smtp_server.messages.clear()
+    return _smtp_server.port
+
+
+def _attachment(size: int) -> str:
+    path = os.path.join(_directory.name, f"attachment-{size}.csv")
+    if not os.path.exists(path):
+        with open(path, "w") as f:
+            row = "1234,etl.py,2024-01-01T00:00:00,INFO\n"
+            f.write(row * (size // len(row)))
+    return path
+
+
+@benchmark(params=(100,))
+def script_helper_log(count):
+    db_client = data.new_database("script-helper")
+    helpers = [utils.ScriptHelper("bench.py", db_client) for _ in range(count)]
+
+    def run():
+        for helper in helpers:
+            helper.log_successful_job({"rows": 10})
+
+    return run
+
+
+@benchmark(params=(100,))
+def script_helper_log_background(count):
+    """Logs through a `BackgroundWriter`, timing what the script waits for, not the writes."""
+    db_client = data.new_database("script-helper")
+    writer = BackgroundWriter(db_client)
+    helpers = [utils.ScriptHelper("bench.py", db_client, writer=writer) for _ in range(count)]
+
+    def run():
+        for helper in helpers:
+            helper.log_successful_job({"rows": 10})
+
+    return run, writer.close
+
+
+@benchmark(params=(10000,))
+def script_helper_phase(count):
+    helper = utils.ScriptHelper("bench.py", data.new_database("script-helper"))
+
+    def run():
+        for _ in range(count):
+            with helper.phase("step"):
+                pass
+        helper._timings.clear()
+
+    return run
+
+
+@benchmark(params=("direct", "queue"))
+def log_calls(mode):
+    """Logs 10,000 INFO records to the log file and the terminal, timing what the caller waits for."""
+    logger = logging.getLogger()
+    # handlers already there, e.g. installed by a module level `logging.info` call, are set aside for the round
+    root_handlers, root_level = logger.handlers[:], logger.level
+    for handler in root_handlers:
+        logger.removeHandler(handler)
+    logs_dir, log_config.logs_dir = log_config.logs_dir, tempfile.mkdtemp(dir=_directory.name)
+    devnull = open(os.devnull, "w")
+
+    # the terminal is replaced, its speed depends on where the output goes
+    stderr, sys.stderr = sys.stderr, devnull
+    try:
+        log_config.configure_logging(use_queue=mode == "queue")
+    finally:
+        sys.stderr = stderr
+        log_config.logs_dir = logs_dir
+
+    def run():
+        for i in range(10000):
+            logging.info("record %d", i)
+
+    def teardown():
+        log_config.stop_queue_listener()
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+            handler.close()
+        for handler in root_handlers:
+            logger.addHandler(handler)
+        logger.setLevel(root_level)
+        devnull.close()
+
+    return run, teardown
+
+
+@benchmark(params=(100, 1000, 10000), rounds=10)
+def get_unique_filename(collisions):
+    directory = os.path.join(_directory.name, f"collisions-{collisions}")
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+        data.files(directory, "log.log", collisions)
+    return functools.partial(utils.get_unique_filename, os.path.join(directory, "log.log"))
+
+
+@benchmark(params=(20,))
+def send_email(count):
+    port = _smtp_port()
+
+    def run():
+        for _ in range(count):
+            utils.send_email(f"127.0.0.1:{port}", "sender@example.com", ["user@example.com"], "Subject", "body")
+
+    return run
+
+
+@benchmark(params=(20,))
+def send_email_mailer(count):
+    mailer = Mailer("127.0.0.1", _smtp_port())
+
+    def run():
+        with mailer:
+            for _ in range(count):
+                utils.send_email("unused", "sender@example.com", ["user@example.com"], "Subject", "body",
+                                 mailer=mailer)
+
+    return run
+
+
+@benchmark(params=(False, True), rounds=3)
+def send_email_attachment(stream):
+    """Sends a 20MB attachment, read into memory or streamed."""
+    mailer = Mailer("127.0.0.1", _smtp_port())
+    path = _attachment(20 * 1024 * 1024)
+
+    def run():
+        with mailer:
+            utils.send_email("unused", "sender@example.com", ["user@example.com"], "Subject", "body", path,
+                             mailer=mailer, stream=stream)
+
+    return run
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+from py_utils.models import JobStatus, JobStatusLevels, ReportData
+from py_utils.orm import DbClient
+from typing import Dict, Iterator, List
+
+import os
+import random
+import tempfile
+
+
+SCRIPT_NAMES = ["etl.py", "sync.py", "report.py", "backup.py", "cleanup.py"]
+HOSTS = [f"host-{i:02d}" for i in range(8)]
+
+# The clients of the databases prepared by `populated_database`, kept for the whole run since they are slow to build
+_databases: Dict[tuple, DbClient] = {}
+_directory = tempfile.TemporaryDirectory(prefix="py_utils-benchmarks-")
+
+
+def job_statuses(count: int, reports_per_job: int = 0, seed: int = 0) -> Iterator[JobStatus]:
+    """Generates `JobStatus` rows with realistic looking values, the same for a given seed.
+
+    Args:
+        count (int): The number of rows.
+        reports_per_job (int): The number of `ReportData` attached to each row. Defaults to 0.
+        seed (int): The seed of the random values. Defaults to 0.
+
+    Returns:
+        Iterator[JobStatus]: The rows, without ids.
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        started = start + timedelta(seconds=i * 60 + rng.randint(0, 59))
+        elapsed = rng.randint(0, 3600)
+        job_status = JobStatus(
+            host=rng.choice(HOSTS),
+            script_path=f"/opt/jobs/{SCRIPT_NAMES[i % len(SCRIPT_NAMES)]}",
+            script_name=SCRIPT_NAMES[i % len(SCRIPT_NAMES)],
+            executed_by="cron",
+            script_start_time=started,
+            script_end_time=started + timedelta(seconds=elapsed),
+            elapsed_time=elapsed,
+            job_summary_data={"data": {"rows": rng.randint(0, 100000), "files": rng.randint(0, 20)}, "error": ""},
+            level=JobStatusLevels.ERROR if rng.random() < 0.05 else JobStatusLevels.INFO,
+        )
+        job_status.report_data = [
+            ReportData(report_name=f"report-{j}", script_name=job_status.script_name,
+                       report_data="id,value\n" + "".join(f"{k},{rng.random()}\n" for k in range(20)))
+            for j in range(reports_per_job)
+        ]
+        yield job_status
+
+
+def new_database(name: str = "bench") -> DbClient:
+    """Creates an empty sqlite database with the log tables, in a directory removed at exit."""
+    path = os.path.join(_directory.name, f"{name}-{os.urandom(4).hex()}.sqlite")
+    db_client = DbClient.sqlite(path, share_engine=False)
+    db_client.create_tables()
+    return db_client
+
+
+def populated_database(count: int, reports_per_job: int = 0) -> DbClient:
+    """Returns the client of a sqlite database holding `count` generated rows, built once per run.
+
+    Args:
+        count (int): The number of `JobStatus` rows.
+        reports_per_job (int): The number of `ReportData` per row. Defaults to 0.
+
+    Returns:
+        DbClient: The client of the database, shared by the benchmarks; don't close it or write to the database.
+    """
+    key = (count, reports_per_job)
+    if key not in _databases:
+        db_client = new_database(f"populated-{count}-{reports_per_job}")
+        db_client.insert_many(job_statuses(count, reports_per_job), batch_size=5000)
+        _databases[key] = db_client
+
+    return _databases[key]
+
+
+def files(directory: str, name: str, count: int) -> List[str]:
+    """Creates the numbered copies `name (1).ext` to `name (count).ext` of a file, and the file itself."""
+    base, extension = os.path.splitext(name)
+    paths = [os.path.join(directory, name)]
+    paths.extend(os.path.join(directory, f"{base} ({i}){extension}") for i in range(1, count + 1))
+    for path in paths:
+        open(path, "w").close()
+    return paths
@@ -0,0 +1,156 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import gc
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+@dataclass
+class Benchmark():
+    """A registered benchmark.
+
+    `setup` is called once per round with the parameter and returns the callable that is timed, so preparing the
+    data of a round is not measured. It may also return a `(run, teardown)` tuple, `teardown` is called untimed
+    after `run`. `full_params` are the parameters of a `--full` run, i.e. with larger sizes.
+    """
+    name: str
+    setup: Callable[[Any], Any]
+    params: Sequence[Any] = (None,)
+    rounds: int = 5
+    group: str = ""
+    full_params: Optional[Sequence[Any]] = None
+
+
+@dataclass
+class Result():
+    """The timings of a benchmark for one parameter, in seconds."""
+    name: str
+    param: Any
+    times: List[float] = field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        return self.name if self.param is None else f"{self.name}[{self.param}]"
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "param": self.param,
+            "rounds": len(self.times),
+            "min": min(self.times),
+            "median": statistics.median(self.times),
+            "mean": statistics.fmean(self.times),
+            "stdev": statistics.stdev(self.times) if len(self.times) > 1 else 0.0,
+            "times": self.times,
+        }
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(params: Sequence[Any] = (None,), rounds: int = 5, name: Optional[str] = None,
+              full_params: Optional[Sequence[Any]] = None):
+    """Registers the decorated function as a benchmark.
+
+    Args:
+        params (Sequence[Any]): The parameters the benchmark runs with, e.g. the number of rows.
+        rounds (int): The number of times each parameter is timed. Defaults to 5.
+        name (str, optional): The name of the benchmark. Defaults to the name of the function.
+        full_params (Sequence[Any], optional): The parameters of a full run. Defaults to `params`.
+    """
+    def decorator(setup: Callable[[Any], Any]):
+        group = setup.__module__.rsplit(".", 1)[-1]
+        BENCHMARKS.append(Benchmark(name or setup.__name__, setup, tuple(params), rounds, group,
+                                    tuple(full_params) if full_params is not None else None))
+        return setup
+
+    return decorator
+
+
+def run(benchmarks: Sequence[Benchmark], rounds: Optional[int] = None,
+        params: Optional[Callable[[Benchmark], Sequence[Any]]] = None, log: Callable[[str], None] = print
+        ) -> List[Result]:
+    """Runs benchmarks, timing only the callables returned by their setup.
+
+    Args:
+        benchmarks (Sequence[Benchmark]): The benchmarks to run.
+        rounds (int, optional): Overrides the number of rounds of every benchmark.
+        params (Callable, optional): Returns the parameters to run a benchmark with, instead of its own.
+        log (Callable[[str], None]): Receives a line per result. Defaults to `print`.
+
+    Returns:
+        List[Result]: The results, one per benchmark and parameter.
+    """
+    results = []
+    for bench in benchmarks:
+        for param in (params(bench) if params is not None else bench.params):
+            result = Result(bench.name, param)
+            for _ in range(rounds or bench.rounds):
+                timed, teardown = bench.setup(param), None
+                if isinstance(timed, tuple):
+                    timed, teardown = timed
+                gc.collect()
+                start = time.perf_counter()
+                timed()
+                result.times.append(time.perf_counter() - start)
+                if teardown is not None:
+                    teardown()
+
+            results.append(result)
+            log(f"{result.key:<50} median {statistics.median(result.times) * 1000:>12.3f} ms"
+                f"  min {min(result.times) * 1000:>12.3f} ms")
+
+    return results
+
+
+def results_document(results: Sequence[Result]) -> Dict[str, Any]:
+    """Returns the JSON document of a run, identifying the commit and environment it ran on."""
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "results": [result.summary() for result in results],
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """Compares the medians of two runs.
+
+    Args:
+        baseline (Dict[str, Any]): The results document of the reference run.
+        current (Dict[str, Any]): The results document of the run to check.
+        threshold (float): The relative slowdown of the median above which a benchmark regressed. Defaults to 10%.
+
+    Returns:
+        List[Dict[str, Any]]: The benchmarks found in both runs with their medians, ratio and whether they regressed.
+    """
+    def by_key(document):
+        return {Result(entry["name"], entry["param"]).key: entry for entry in document["results"]}
+
+    baseline_results = by_key(baseline)
+    comparison = []
+    for key, entry in by_key(current).items():
+        if key not in baseline_results:
+            continue
+        before, after = baseline_results[key]["median"], entry["median"]
+        ratio = after / before if before else float("inf")
+        comparison.append({
+            "benchmark": key, "baseline": before, "current": after, "ratio": ratio, "regressed": ratio > 1 + threshold,
+        })
+
+    return comparison
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,312 @@
+from .orm import (
+    _chunked, _column_statement, _count_statement, _has_related, _keyset, _loader_options, _metadata_hash,
+    _page_statement, _pool_options, _query_statement, _resolve_sqlite_pragmas, _rows_by_table, _set_sqlite_pragmas,
+    _stream_statement, _verified_schemas, _yield_chunk, _T
+)
+from sqlalchemy import inspect, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Type, Union
+
+import logging
+
+
+class AsyncDbClient():
+    """An asyncio counterpart of `DbClient`.
+
+    Requires an async driver, i.e., `aiosqlite` for sqlite or `asyncmy` for mysql, which are installed with the
+    `async` extra. Models are returned detached from their session, so relationships need to be loaded eagerly;
+    lazy loading them from a coroutine raises `MissingGreenlet`.
+    """
+
+    def __init__(
+            self, url: str, echo=False, pool_size: Optional[int] = None, max_overflow: Optional[int] = None,
+            pool_recycle: Optional[int] = None, pool_pre_ping: bool = False, pool_timeout: Optional[float] = None,
+            sqlite_pragmas: Optional[Union[str, Dict[str, Any]]] = None):
+        """Creates an `AsyncDbClient`
+
+        Unlike `DbClient`, the engine is not shared between clients since async connections belong to the event
+        loop they were created in. The connection is established on first use.
+
+        Args:
+            url (str): The database url using an async driver, i.e., `sqlite+aiosqlite:///db.sqlite`.
+            echo (bool): Whether to print `sqlmodel` output to the console.
+            pool_size (int, optional): The number of connections kept open in the pool.
+            max_overflow (int, optional): The number of connections allowed above `pool_size`.
+            pool_recycle (int, optional): The number of seconds after which a connection is replaced.
+            pool_pre_ping (bool): Whether to test connections for liveness when they are checked out.
+            pool_timeout (float, optional): The number of seconds to wait for a connection from the pool.
+            sqlite_pragmas (Union[str, Dict[str, Any]], optional): The name of a preset in `SQLITE_PRAGMA_PRESETS`
+                or the pragmas to apply to every new sqlite connection.
+
+        Returns:
+            An instance of AsyncDbClient.
+
+        Raises:
+            ValueError: When `sqlite_pragmas` is not a known preset or contains invalid pragmas.
+            Exception: When failing to create a `sqlmodel` engine.
+        """
+        engine_options = _pool_options(pool_size, max_overflow, pool_recycle, pool_pre_ping, pool_timeout)
+        try:
+            self._engine = create_async_engine(url, echo=echo, **engine_options)
+        except Exception as e:
+            logging.error("Failed to create engine with error of type: %s", type(e))
+            raise e
+
+        if sqlite_pragmas is not None:
+            _set_sqlite_pragmas(self._engine.sync_engine, _resolve_sqlite_pragmas(sqlite_pragmas))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Disposes the engine of this client and its pooled connections.
+
+        Returns:
+            None
+        """
+        await self._engine.dispose()
+
+    @classmethod
+    def mysql(cls, connection_string: str, echo=False, **engine_options):
+        """Create an async mysql client using the `asyncmy` driver.
+
+        Args:
+            connection_string (str): The db connection string i.e., `<user>:<password>@<host>:<port>/<database>`.
+            echo (bool): Whether to print `sqlmodel` output to the console.
+            **engine_options: Pool options passed to the constructor, i.e., `pool_size` or `pool_recycle`.
+        """
+        url = f"mysql+asyncmy://{connection_string}"
+        return cls(url, echo, **engine_options)
+
+    @classmethod
+    def sqlite(cls, path: str, echo=False, pragmas: Optional[Union[str, Dict[str, Any]]] = None, **engine_options):
+        """Create an async sqlite client using the `aiosqlite` driver.
+
+        The sqlite db is created on first use if it does not already exist.
+
+        Args:
+            path (str): The path to the sqlite db.
+            echo (bool): Whether to print `sqlmodel` output to the console.
+            pragmas (Union[str, Dict[str, Any]], optional): The tuning profile, refer to `DbClient.sqlite`.
+            **engine_options: Pool options passed to the constructor, i.e., `pool_size` or `pool_timeout`.
+        """
+        url = f"sqlite+aiosqlite:///{path}"
+        return cls(url, echo, sqlite_pragmas=pragmas, **engine_options)
+
+    async def create_tables(self, use_cache: bool = True):
+        """Creates the database tables
+
+        Args:
+            use_cache (bool): Whether to skip the check when the tables were already verified by this client.
+
+        Returns:
+            None
+
+        Raises:
+            Exception: When failing to create tables in `sqlmodel` engine.
+        """
+        schema_hash = _metadata_hash(SQLModel.metadata)
+        verified = _verified_schemas.setdefault(self._engine.sync_engine, set())
+        if use_cache and schema_hash in verified:
+            return
+
+        try:
+            async with self._engine.begin() as connection:
+                await connection.run_sync(SQLModel.metadata.create_all)
+        except Exception as e:
+            logging.error("Failed to create tables: %s", type(e))
+            raise e
+
+        verified.add(schema_hash)
+
+    async def insert_data(self, model: _T) -> _T:
+        """Insert model into database.
+
+        Args:
+            model (SQLModel): The model to insert into the database.
+
+        Returns:
+            The inserted entry.
+
+        Raises:
+            Exception: When failing to insert the model.
+        """
+        async with AsyncSession(self._engine, expire_on_commit=False) as session:
+            try:
+                session.add(model)
+                await session.commit()
+                if logging.getLogger().isEnabledFor(logging.DEBUG):
+                    logging.debug("Data inserted successfully for %s", model.__tablename__)
+
+                return model
+            except IntegrityError as e:
+                await session.rollback()
+                logging.error("Integrity Error: %s", e)
+                raise e
+            except Exception as e:
+                await session.rollback()
+                logging.error("Error inserting data: %s", e)
+                raise e
+
+    async def insert_many(self, models: Iterable[_T], batch_size: int = 1000, return_defaults: bool = False
+                          ) -> List[_T]:
+        """Insert many models into the database using one transaction per batch.
+
+        Refer to `DbClient.insert_many`.
+
+        Args:
+            models (Iterable[SQLModel]): The models to insert into the database.
+            batch_size (int): The number of models written per transaction. Defaults to 1000.
+            return_defaults (bool): Whether to populate the generated primary keys on the provided models.
+
+        Returns:
+            The inserted entries.
+
+        Raises:
+            ValueError: When `batch_size` is not a positive integer.
+            IntegrityError: When a batch violates a database constraint.
+            Exception: When failing to insert a batch.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        inserted = []
+        async with AsyncSession(self._engine, expire_on_commit=False) as session:
+            for batch in _chunked(models, batch_size):
+                try:
+                    if return_defaults or any(_has_related(model) for model in batch):
+                        session.add_all(batch)
+                    else:
+                        for (table, _), rows in _rows_by_table(batch).items():
+                            await session.execute(insert(table), rows)
+                    await session.commit()
+                    inserted.extend(batch)
+                    if logging.getLogger().isEnabledFor(logging.DEBUG):
+                        logging.debug("Inserted batch of %d models", len(batch))
+                except IntegrityError as e:
+                    await session.rollback()
+                    logging.error("Integrity Error: %s", e)
+                    raise e
+                except Exception as e:
+                    await session.rollback()
+                    logging.error("Error inserting data: %s", e)
+                    raise e
+
+        return inserted
+
+    async def query_model(self, model: Type[_T], load: Optional[str] = None, defer: Optional[Sequence[Any]] = None
+                          ) -> List[_T]:
+        """Queries the database for the provided `model`.
+
+        Args:
+            model (Type[SQLModel]): The model class definition.
+            load (str, optional): The relationship loading strategy, refer to `DbClient.query_model`.
+            defer (Sequence, optional): Attribute names of large columns to leave out.
+
+        Returns:
+            list (List[SQLModel]): A list of all models.
+        """
+        async with AsyncSession(self._engine) as session:
+            statement = select(model).options(*_loader_options(model, load, defer))
+            results = await session.exec(statement)
+            return list(results.unique())
+
+    async def query(
+            self, model: Type[_T], columns: Optional[Sequence[Any]] = None, where: Optional[Sequence[Any]] = None,
+            filter_by: Optional[Dict[str, Any]] = None, order_by: Optional[Sequence[Any]] = None,
+            group_by: Optional[Sequence[Any]] = None, limit: Optional[int] = None, offset: Optional[int] = None,
+            as_dict: bool = False, load: Optional[str] = None, defer: Optional[Sequence[Any]] = None
+    ) -> List[Any]:
+        """Queries the database for the provided `model`, filtering, ordering and projecting in SQL.
+
+        Refer to `DbClient.query` for the arguments.
+
+        Returns:
+            list (List): A list of models, or of tuples/dictionaries when `columns` is provided.
+        """
+        statement = _query_statement(model, columns, where, filter_by, order_by, group_by, limit, offset, load, defer)
+        async with AsyncSession(self._engine) as session:
+            if not columns:
+                results = await session.exec(statement)
+                return list(results.unique())
+
+            rows = (await session.execute(statement)).all()
+            if as_dict:
+                return [row._asdict() for row in rows]
+            return rows
+
+    async def load_column(self, instance: SQLModel, column: Any) -> Any:
+        """Loads a column of a model returned by a query, typically a deferred one.
+
+        Refer to `DbClient.load_column`.
+
+        Returns:
+            Any: The value of the column.
+        """
+        statement, key = _column_statement(instance, column)
+        async with AsyncSession(self._engine) as session:
+            value = (await session.execute(statement)).scalar_one()
+
+        set_committed_value(instance, key, value)
+        return value
+
+    async def count(self, model: Type[SQLModel], where: Optional[Sequence[Any]] = None,
+                    filter_by: Optional[Dict[str, Any]] = None) -> int:
+        """Counts the entries of the provided `model` in the database.
+
+        Refer to `DbClient.count` for the arguments.
+
+        Returns:
+            int: The number of matching entries.
+        """
+        async with AsyncSession(self._engine) as session:
+            result = await session.execute(_count_statement(model, where, filter_by))
+            return result.scalar_one()
+
+    async def iter_model(
+            self, model: Type[_T], chunk_size: int = 1000, where: Optional[Sequence[Any]] = None,
+            order_by: Optional[Sequence[Any]] = None, batches: bool = False, load: Optional[str] = "selectin",
+            defer: Optional[Sequence[Any]] = None
+    ) -> AsyncIterator[Union[_T, List[_T]]]:
+        """Lazily queries the database for the provided `model`.
+
+        Refer to `DbClient.iter_model` for the arguments, use it with `async for`.
+
+        Returns:
+            AsyncIterator: An iterator over the models, or over lists of models when `batches` is set.
+
+        Raises:
+            ValueError: When `chunk_size` is not a positive integer or `load` can't be streamed.
+        """
+        statement = _stream_statement(model, chunk_size, where, load, defer)
+        keyset = None if order_by else _keyset(model)
+        async with AsyncSession(self._engine) as session:
+            if keyset is None:
+                statement = statement.order_by(*(order_by or inspect(model).primary_key)).execution_options(
+                    yield_per=chunk_size)
+                result = await session.stream_scalars(statement)
+                async for partition in result.partitions():
+                    for item in _yield_chunk(partition, batches):
+                        yield item
+                return
+
+            key, attribute = keyset
+            last_key = None
+            while True:
+                chunk = (await session.exec(_page_statement(statement, key, last_key, chunk_size))).all()
+                if not chunk:
+                    return
+
+                for item in _yield_chunk(chunk, batches):
+                    yield item
+
+                if len(chunk) < chunk_size:
+                    return
+                last_key = getattr(chunk[-1], attribute)
@@ -0,0 +1,201 @@
+from . import serializers
+from .orm import DbClient, convert_model_to_dict
+from sqlalchemy import inspect
+from sqlmodel import SQLModel
+from typing import List, Optional
+
+import atexit
+import functools
+import logging
+import queue
+import threading
+
+
+# Placed on the queue, when there is room, to wake up the writer thread once it is stopping
+_WAKE = object()
+
+
+class BackgroundWriter():
+    """Writes models to the database from a background thread.
+
+    Models submitted to the writer are put on a bounded in-memory queue and inserted in batches by a daemon thread,
+    so a slow or unreachable database doesn't block the caller. Queued models are flushed when the writer is closed,
+    which happens automatically at interpreter exit, waiting at most `exit_timeout` seconds. Batches that fail to
+    insert, and models still queued when closing times out, are appended to `spool_path`, when provided, as JSON
+    lines of the form `{"table": "job_status", "data": {...}}`. The related models of a model, e.g. the `timings`
+    of a `JobStatus`, are included in `data` as lists of rows under the name of their relationship.
+    """
+
+    def __init__(
+            self, db_client: DbClient, max_queue_size: int = 10000, batch_size: int = 100,
+            flush_interval: float = 1.0, on_full: str = "block", spool_path: Optional[str] = None,
+            exit_timeout: float = 10.0):
+        """Creates a `BackgroundWriter` and starts its thread.
+
+        Args:
+            db_client (DbClient): The database client to write the models with.
+            max_queue_size (int): The maximum number of models waiting to be written. Defaults to 10000.
+            batch_size (int): The maximum number of models inserted per transaction. Defaults to 100.
+            flush_interval (float): The number of seconds to wait for more models before writing a partial batch.
+            on_full (str): What `submit` does when the queue is full, `block` until there is room or `drop` the
+                model. Defaults to `block`.
+            spool_path (str, optional): The file to append models to when they can't be written to the database.
+            exit_timeout (float): The maximum number of seconds to wait for the queued models to be written at
+                interpreter exit. Defaults to 10.
+
+        Raises:
+            ValueError: When `on_full` is neither `block` nor `drop`.
+        """
+        if on_full not in ("block", "drop"):
+            raise ValueError(f"Unknown on_full policy '{on_full}', expected 'block' or 'drop'")
+
+        self._db_client = db_client
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._on_full = on_full
+        self._spool_path = spool_path
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._spool_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._closed = False
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._run, name="BackgroundWriter", daemon=True)
+        self._thread.start()
+        self._close_at_exit = functools.partial(self.close, timeout=exit_timeout)
+        atexit.register(self._close_at_exit)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, model: SQLModel) -> bool:
+        """Queues a model to be written to the database.
+
+        Args:
+            model (SQLModel): The model to write.
+
+        Returns:
+            bool: True if the model was queued, and False if it was dropped because the queue is full.
+
+        Raises:
+            RuntimeError: When the writer is closed.
+        """
+        if self._closed:
+            raise RuntimeError("Cannot submit to a closed BackgroundWriter")
+
+        if self._on_full == "block":
+            self._queue.put(model)
+            return True
+
+        try:
+            self._queue.put_nowait(model)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logging.warning("BackgroundWriter queue is full, dropped %s", type(model).__name__)
+            return False
+
+    def flush(self):
+        """Blocks until every queued model has been written or spooled.
+
+        Returns:
+            None
+        """
+        self._queue.join()
+
+    def close(self, timeout: Optional[float] = None):
+        """Writes the queued models and stops the writer thread.
+
+        When `timeout` expires the models still queued are spooled instead. The batch being written at that time
+        is left to the thread, it may still be committed. Closing a writer more than once has no effect.
+
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait for the queued models to be written.
+
+        Returns:
+            None
+        """
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self._close_at_exit)
+
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            # the thread is busy writing and checks `_stopping` once done
+            pass
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            remaining = []
+            while True:
+                try:
+                    model = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if model is not _WAKE:
+                    remaining.append(model)
+            logging.warning("BackgroundWriter did not finish writing, spooling %d queued models", len(remaining))
+            if remaining:
+                self._spool(remaining)
+
+    def _run(self):
+        while True:
+            try:
+                if self._stopping.is_set():
+                    batch = [self._queue.get_nowait()]
+                else:
+                    batch = [self._queue.get(timeout=self._flush_interval)]
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+
+            # drain what is already queued, up to a full batch
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            models = [model for model in batch if model is not _WAKE]
+            if models:
+                self._write(models)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch: List[SQLModel]):
+        try:
+            # flushed through the unit of work, which writes the related models and populates the keys
+            self._db_client.insert_many(batch, batch_size=len(batch), return_defaults=True)
+        except Exception as e:
+            logging.error("BackgroundWriter failed to write %d models: %s", len(batch), type(e))
+            self._spool(batch)
+
+    def _spool(self, batch: List[SQLModel]):
+        if self._spool_path is None:
+            logging.error("No spool_path provided, %d models were lost", len(batch))
+            return
+
+        try:
+            with self._spool_lock, open(self._spool_path, "ab") as spool:
+                for model in batch:
+                    record = {"table": model.__tablename__, "data": _spooled_row(model)}
+                    spool.write(serializers.dumps(record) + b"\n")
+        except OSError as e:
+            logging.error("Failed to spool %d models to %s: %s", len(batch), self._spool_path, e)
+
+
+def _spooled_row(model: SQLModel) -> dict:
+    """Returns the columns of `model` along with the rows of its related models, like `retention` archives them."""
+    row = convert_model_to_dict(model)
+    for relationship in inspect(model).mapper.relationships:
+        # only the collections that were set or loaded, reading the others would query the database
+        related = model.__dict__.get(relationship.key)
+        if relationship.uselist and related:
+            row[relationship.key] = [convert_model_to_dict(related_model) for related_model in related]
+    return row
@@ -0,0 +1,128 @@
+from . import serializers
+from sqlalchemy.types import LargeBinary, TypeDecorator
+from typing import Any, Optional
+
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Encoded payloads start with this byte, which never starts valid utf-8 text, followed by a byte of flags
+_MAGIC = b"\xff"
+_JSON = 0x01
+_ZLIB = 0x02
+_ZSTD = 0x04
+
+
+class CompressedPayload(TypeDecorator):
+    """A binary column storing text or JSON serializable values, compressed when they are large.
+
+    Strings are stored as utf-8 and any other value is serialized to JSON once with `serializers.dumps`. Values of
+    at least `min_size` bytes are compressed with zlib, or zstd when the optional `zstandard` package is installed
+    and selected.
+    Values written before a column was switched to this type, plain text, are returned as is.
+
+    Values are decoded when the row is loaded. To only load and decode them when needed, defer the column in the
+    query (see `DbClient.query`) and load it with `DbClient.load_column`.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, min_size: int = 512, compression: str = "zlib", level: Optional[int] = None,
+                 length: int = 16777215):
+        """Creates a `CompressedPayload` column type.
+
+        Args:
+            min_size (int): The encoded size in bytes from which values are compressed. Defaults to 512.
+            compression (str): The compression algorithm, `zlib` or `zstd`. Defaults to `zlib`.
+            level (int, optional): The compression level. Defaults to the algorithm's default level.
+            length (int): The maximum size in bytes of the column, mysql stores it in the smallest blob type that
+                fits. Defaults to 16MB (`MEDIUMBLOB`).
+
+        Raises:
+            ValueError: When the compression algorithm is unknown or its package is not installed.
+        """
+        if compression not in ("zlib", "zstd"):
+            raise ValueError(f"Unknown compression '{compression}', expected 'zlib' or 'zstd'")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+
+        super().__init__(length=length)
+        self.min_size = min_size
+        self.compression = compression
+        self.level = level
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[bytes]:
+        if value is None:
+            return None
+        return encode_payload(value, self.min_size, self.compression, self.level)
+
+    def process_result_value(self, value: Any, dialect) -> Any:
+        if value is None:
+            return None
+        return decode_payload(value)
+
+
+def encode_payload(value: Any, min_size: int = 512, compression: str = "zlib", level: Optional[int] = None) -> bytes:
+    """Encodes a value the way `CompressedPayload` stores it.
+
+    Args:
+        value (Any): A string or a JSON serializable value.
+        min_size (int): The encoded size in bytes from which the value is compressed. Defaults to 512.
+        compression (str): The compression algorithm, `zlib` or `zstd`. Defaults to `zlib`.
+        level (int, optional): The compression level. Defaults to the algorithm's default level.
+
+    Returns:
+        bytes: The encoded value.
+    """
+    flags = 0
+    if isinstance(value, str):
+        data = value.encode("utf-8")
+    else:
+        flags |= _JSON
+        data = serializers.dumps(value)
+
+    if len(data) >= min_size:
+        if compression == "zstd":
+            flags |= _ZSTD
+            data = zstandard.ZstdCompressor(level=level if level is not None else 3).compress(data)
+        else:
+            flags |= _ZLIB
+            data = zlib.compress(data, level if level is not None else -1)
+
+    return _MAGIC + bytes([flags]) + data
+
+
+def decode_payload(value: Any) -> Any:
+    """Decodes a value stored by `CompressedPayload`.
+
+    Args:
+        value (Any): The stored value, either encoded bytes or legacy text.
+
+    Returns:
+        Any: The decoded string or JSON value.
+
+    Raises:
+        ValueError: When the value is zstd compressed and the zstandard package is not installed.
+    """
+    if isinstance(value, str):
+        return value
+
+    value = bytes(value)
+    if not value.startswith(_MAGIC):
+        return value.decode("utf-8")
+
+    flags, data = value[1], value[2:]
+    if flags & _ZSTD:
+        if zstandard is None:
+            raise ValueError("Decoding a zstd compressed payload requires the zstandard package")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif flags & _ZLIB:
+        data = zlib.decompress(data)
+
+    if flags & _JSON:
+        return serializers.loads(data)
+    return data.decode("utf-8")
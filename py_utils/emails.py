@@ -0,0 +1,159 @@
+from contextlib import ExitStack
+from email.message import EmailMessage
+from email.policy import SMTP
+from .mail_spool import MailSpool
+from .mailer import Mailer, prepare_attachment, send_file, write_email
+from typing import Optional, Sequence
+
+import os
+import re
+import smtplib
+import tempfile
+
+
+def _contains_html(content: str) -> bool:
+    """Utility function that checks if the content contains html.
+
+    Args:
+        content (str): The content to test for html.
+
+    Returns:
+        bool: Returns True if the content contains html, and False otherwise.
+    """
+    pattern = r"<[^>]*>"
+
+    if re.search(pattern, content) is not None:
+        return True
+    else:
+        return False
+
+
+def build_email(
+        sender: str, recipients: list[str], subject: str, body: str, *file: str,
+        compress_over: Optional[int] = None, compression: str = "gzip",
+        max_attachment_size: Optional[int] = None) -> EmailMessage:
+    """Builds the message `send_email` sends.
+
+    Args:
+        sender (str): The sender of the email, i.e., the "From" field.
+        recipients (list[str]): The recipients to send the emails to.
+        subject (str): The subject line of the email.
+        body (str | None): The body of the email.
+        *file (str): The path(s) to the file(s) to send as an attachment.
+        compress_over (int, optional): The size in bytes above which attachments are compressed.
+        compression (str): The compression format of large attachments, `gzip` or `zip`. Defaults to `gzip`.
+        max_attachment_size (int, optional): The size in bytes, after compression, above which an attachment is
+            refused.
+
+    Returns:
+        EmailMessage: The message.
+
+    Raises:
+        ValueError: When an attachment is larger than `max_attachment_size`.
+    """
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = ", ".join(recipients)
+
+    if _contains_html(body):
+        msg.set_content(body, subtype='html')
+    else:
+        msg.set_content(body)
+
+    if file:
+        for f in file:
+            attachment = prepare_attachment(f, compress_over, compression, max_attachment_size)
+            with attachment.fileobj as file_obj:
+                msg.add_attachment(
+                    file_obj.read(), maintype=attachment.maintype,
+                    subtype=attachment.subtype, filename=attachment.filename
+                )
+
+    return msg
+
+
+def send_email(
+        host: str, sender: str, recipients: list[str], subject: str, body: str,
+        *file: str, output=None, mailer: Optional[Mailer] = None, stream: bool = False,
+        compress_over: Optional[int] = None, compression: str = "gzip", max_attachment_size: Optional[int] = None,
+        spool: Optional[MailSpool] = None):
+    """Sends an email using smtp.ufl.edu.
+
+    Args:
+        host (str): The name of the remote host to which to connect.
+        sender (str): The sender of the email, i.e., the "From" field.
+        recipients (list[str]): The recipients to send the emails to.
+        subject (str): The subject line of the email.
+        body (str | None): The body of the email.
+        *file (str): The path(s) to the file(s) to send as an attachment.
+        output:
+        mailer (Mailer, optional): The mailer to send with, reusing its connection instead of connecting to `host`.
+        stream (bool): Whether to stream the attachments in chunks instead of reading them into memory. The message
+            is written to `output`, or to a temporary file it is sent from.
+        compress_over (int, optional): The size in bytes above which attachments are compressed.
+        compression (str): The compression format of large attachments, `gzip` or `zip`. Defaults to `gzip`.
+        max_attachment_size (int, optional): The size in bytes, after compression, above which an attachment is
+            refused.
+        spool (MailSpool, optional): The spool to queue the email in instead of sending it. The email is written as
+            with `output` and returns as soon as it is queued, it is sent in the background.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: When an attachment is larger than `max_attachment_size`.
+    """
+    if spool is not None:
+        output = spool.new_message_path()
+        try:
+            send_email(host, sender, recipients, subject, body, *file, output=output, stream=stream,
+                       compress_over=compress_over, compression=compression, max_attachment_size=max_attachment_size)
+        except Exception:
+            if os.path.exists(output):
+                os.remove(output)
+            raise
+        spool.add(output)
+        return
+
+    if stream:
+        _send_streaming_email(host, sender, recipients, subject, body, file, output, mailer,
+                              compress_over, compression, max_attachment_size)
+        return
+
+    msg = build_email(sender, recipients, subject, body, *file, compress_over=compress_over,
+                      compression=compression, max_attachment_size=max_attachment_size)
+
+    if output:
+        with open(output, "wb") as fp:
+            fp.write(msg.as_bytes(policy=SMTP))
+    elif mailer is not None:
+        mailer.send(msg)
+    else:
+        with smtplib.SMTP(host) as server:
+            server.send_message(msg)
+
+
+def _send_streaming_email(
+        host: str, sender: str, recipients: list[str], subject: str, body: str, files: Sequence[str], output,
+        mailer: Optional[Mailer], compress_over: Optional[int], compression: str,
+        max_attachment_size: Optional[int]):
+    with ExitStack() as stack:
+        attachments = []
+        for f in files:
+            attachment = prepare_attachment(f, compress_over, compression, max_attachment_size)
+            stack.enter_context(attachment.fileobj)
+            attachments.append(attachment)
+
+        msg = build_email(sender, recipients, subject, body)
+        fp = stack.enter_context(open(output, "wb") if output else tempfile.TemporaryFile())
+        write_email(fp, msg, attachments)
+        if output:
+            return
+
+        fp.seek(0)
+        if mailer is not None:
+            mailer.send_file(fp, sender, recipients)
+        else:
+            with smtplib.SMTP(host) as server:
+                send_file(server, fp, sender, recipients)
@@ -1,30 +1,247 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from . import utils
-from typing import List
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from . import serializers, utils
+from typing import Any, Dict, List, Optional
 
+import atexit
+import gzip
 import logging
 import os
+import queue
+import shutil
 import sys
 
 
 fmt = '%(asctime)s  %(levelname)-9s %(message)s [%(module)s:%(funcName)s:%(lineno)s]'
 logs_dir = "logs"
-todays_date = datetime.today().strftime('%Y-%m-%d')
-log_filename = os.path.join(logs_dir, f"log-{todays_date}.log")
+# The log file of `configure_logging(rotate=...)`, rotated files get a date or number suffix
+rotating_log_name = "log.log"
 
+# The attributes of every record, any other attribute was passed to the log call with `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
 
-def configure_logging(handlers: List[logging.Handler] = [], verbose: bool = False):
+# Compresses the rotated log files, its thread finishes the pending files at exit
+_compressor: Optional[ThreadPoolExecutor] = None
+
+# The listener writing the records queued by `configure_logging(use_queue=True)`
+_queue_listener: Optional[QueueListener] = None
+_queue_handler: Optional["_DroppingQueueHandler"] = None
+
+
+def __getattr__(name: str):
+    # computed on access, so a long running process doesn't keep using the date it was started on
+    if name == "todays_date":
+        return datetime.today().strftime('%Y-%m-%d')
+    if name == "log_filename":
+        return os.path.join(logs_dir, f"log-{__getattr__('todays_date')}.log")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines, so log shippers can read their fields without parsing `fmt`.
+
+    Each line holds the time, level, logger, message and source location of the record, followed by the `context`
+    fields of the formatter and the fields passed to the log call with `extra`. The lines are encoded with
+    `serializers.dumps`.
+    """
+
+    def __init__(self, context: Optional[Dict[str, Any]] = None):
+        """Creates a `JsonFormatter`.
+
+        Args:
+            context (Dict[str, Any], optional): The fields added to every line, e.g. the script name, host and run id.
+        """
+        super().__init__()
+        self.context = dict(context or {})
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "process": record.process,
+        }
+        entry.update(self.context)
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+
+        try:
+            return serializers.dumps(entry).decode("utf-8")
+        except TypeError:
+            # an `extra` value that isn't serializable
+            return serializers.dumps({key: _jsonable(value) for key, value in entry.items()}).decode("utf-8")
+
+
+def _jsonable(value: Any) -> Any:
+    try:
+        serializers.dumps(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class _GzipRotator():
+    """Compresses rotated log files with gzip on a background thread.
+
+    Used as the `rotator` of a rotating handler whose `namer` adds `.gz`. The log file is renamed right away and
+    compressed afterwards. The handlers of `_file_handler` wait for the compression of the previous rollover before
+    shifting the rotated files, otherwise the file being compressed would be missed by the shift and overwritten.
+    """
+
+    def __init__(self):
+        self._pending: Optional[Future] = None
+
+    @staticmethod
+    def namer(name: str) -> str:
+        return f"{name}.gz"
+
+    def __call__(self, source: str, dest: str):
+        global _compressor
+        if not os.path.exists(source):
+            return
+
+        self.wait()
+        uncompressed = dest[:-len(".gz")]
+        os.rename(source, uncompressed)
+        if _compressor is None:
+            _compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LogCompressor")
+        try:
+            self._pending = _compressor.submit(_compress_log, uncompressed, dest)
+        except RuntimeError:
+            # the interpreter is shutting down, e.g. records written by the queue listener at exit
+            _compress_log(uncompressed, dest)
+
+    def wait(self):
+        """Blocks until the last rotated file is compressed."""
+        if self._pending is not None:
+            self._pending.result()
+
+
+class _RotatingFileHandler(RotatingFileHandler):
+    def doRollover(self):
+        if isinstance(self.rotator, _GzipRotator):
+            self.rotator.wait()
+        super().doRollover()
+
+
+class _TimedRotatingFileHandler(TimedRotatingFileHandler):
+    def doRollover(self):
+        # the backups to delete are listed before rotating
+        if isinstance(self.rotator, _GzipRotator):
+            self.rotator.wait()
+        super().doRollover()
+
+
+def _compress_log(source: str, dest: str):
+    try:
+        with open(source, "rb") as f_in, gzip.open(f"{dest}.tmp", "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.replace(f"{dest}.tmp", dest)
+        os.remove(source)
+    except OSError as e:
+        # logging it could rotate the file again
+        print(f"Failed to compress rotated log file {source}: {e}", file=sys.stderr)
+
+
+def _file_handler(
+        rotate: Optional[str], when: str, max_bytes: int, backup_count: int, compress: bool) -> logging.Handler:
+    """Creates the handler writing the log file."""
+    if rotate is None:
+        log_filename = globals().get("log_filename") or __getattr__("log_filename")
+        return logging.FileHandler(utils.get_unique_filename(log_filename, reserve=True))
+
+    filename = os.path.join(logs_dir, rotating_log_name)
+    if rotate == "time":
+        handler = _TimedRotatingFileHandler(filename, when=when, backupCount=backup_count)
+    else:
+        handler = _RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count)
+
+    if compress:
+        handler.rotator = _GzipRotator()
+        handler.namer = _GzipRotator.namer
+    return handler
+
+
+class _QueueListener(QueueListener):
+    """A `QueueListener` that waits for room in a bounded queue to stop, instead of failing when it is full."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """A `QueueHandler` that counts the records it drops when its queue is full instead of reporting an error.
+
+    Records are queued as they are, the message and traceback are formatted by the handlers of the listener. The
+    arguments of a log call are therefore formatted after it returns, so they should not be modified afterwards.
+    """
+
+    def __init__(self, queue: queue.Queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the default formats the message and the traceback on the calling thread, and drops `exc_info`
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(
+        handlers: List[logging.Handler] = [], verbose: bool = False, use_queue: bool = False,
+        max_queue_size: int = 0, rotate: Optional[str] = None, when: str = "midnight",
+        max_bytes: int = 10 * 1024 * 1024, backup_count: int = 14, compress: bool = True, json_logs: bool = False,
+        context: Optional[Dict[str, Any]] = None):
     """Configures the root logger
 
     Configures the root logger with default settings.
 
+    By default the logs are written to `log_filename`, named after the current date, or to a numbered variant of it
+    when it already exists. With `rotate`, they are written to `rotating_log_name` in `logs_dir` instead, which is
+    rotated every `when` (`time`) or when it reaches `max_bytes` (`size`). The rotated files are suffixed with their
+    date or number, gzip compressed in the background, and only the last `backup_count` are kept.
+
+    With `use_queue`, log calls only put the record on a queue and the handlers format and write it from a
+    background thread, so logging never waits on the disk or the terminal. The queued records are written when the
+    interpreter exits.
+
     Args:
         handlers (List[logging.Handler]): The handlers to add to the logger
         verbose (bool): optional, if set to TRUE set Level to logging.DEBUG
+        use_queue (bool): optional, if set to TRUE write the records from a background thread
+        max_queue_size (int): optional, the maximum number of queued records with `use_queue`, records logged
+            while the queue is full are dropped and counted by `dropped_records`. Unbounded by default.
+        rotate (str): optional, `time` or `size` to rotate the log file
+        when (str): optional, the interval of `time` rotation, as for `TimedRotatingFileHandler`. Defaults to
+            `midnight`
+        max_bytes (int): optional, the size of the log file triggering `size` rotation. Defaults to 10MB
+        backup_count (int): optional, the number of rotated log files to keep. Defaults to 14
+        compress (bool): optional, if set to FALSE rotated log files are not compressed
+        json_logs (bool): optional, if set to TRUE write the log file as JSON lines with `JsonFormatter`
+        context (Dict[str, Any]): optional, the fields added to every JSON line, e.g. the script name and run id
 
     Returns:
         None
+
+    Raises:
+        ValueError: When `rotate` is neither `time` nor `size`.
     """
+    if rotate not in (None, "time", "size"):
+        raise ValueError(f"Unknown rotate mode '{rotate}', expected 'time' or 'size'")
+
     formatter = logging.Formatter(fmt)
 
     logger = logging.getLogger()
@@ -41,11 +258,58 @@ def configure_logging(handlers: List[logging.Handler] = [], verbose: bool = Fals
     stream_handler.setLevel(log_level)
 
     # create a file handler
-    file_handler = logging.FileHandler(utils.get_unique_filename(log_filename))
-    file_handler.setFormatter(formatter)
+    file_handler = _file_handler(rotate, when, max_bytes, backup_count, compress)
+    file_handler.setFormatter(JsonFormatter(context) if json_logs else formatter)
+
+    if not use_queue:
+        logger.addHandler(stream_handler)
+        logger.addHandler(file_handler)
+
+        for handler in handlers:
+            logger.addHandler(handler)
+        return
+
+    global _queue_listener, _queue_handler
+    stop_queue_listener()
+
+    records = queue.Queue(maxsize=max_queue_size)
+    _queue_handler = _DroppingQueueHandler(records)
+    _queue_listener = _QueueListener(records, stream_handler, file_handler, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+    atexit.register(stop_queue_listener)
+
+    logger.addHandler(_queue_handler)
+
+
+def dropped_records() -> int:
+    """Returns the number of records dropped because the logging queue was full.
+
+    Returns:
+        int: The number of dropped records, 0 when `configure_logging` was not called with `use_queue`.
+    """
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def stop_queue_listener():
+    """Writes the queued records and stops the background thread started by `configure_logging(use_queue=True)`.
+
+    The handlers are detached from the root logger. Stopping more than once has no effect.
+
+    Returns:
+        None
+    """
+    global _queue_listener
+    if _queue_listener is None:
+        return
 
-    logger.addHandler(stream_handler)
-    logger.addHandler(file_handler)
+    listener, _queue_listener = _queue_listener, None
+    atexit.unregister(stop_queue_listener)
+    logging.getLogger().removeHandler(_queue_handler)
+    listener.stop()
 
-    for handler in handlers:
-        logger.addHandler(handler)
+    if _queue_handler.dropped:
+        listener.handle(logging.getLogger(__name__).makeRecord(
+            __name__, logging.WARNING, __file__, 0, "Dropped %d log records because the logging queue was full",
+            (_queue_handler.dropped,), None, "stop_queue_listener"))
+    for handler in listener.handlers:
+        handler.flush()
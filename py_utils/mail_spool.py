@@ -0,0 +1,286 @@
+from email.parser import BytesHeaderParser
+from email.policy import default
+from email.utils import getaddresses, parseaddr
+from .mailer import Mailer, send_file
+from typing import BinaryIO, List, Optional, Tuple
+
+import atexit
+import functools
+import logging
+import os
+import shutil
+import smtplib
+import tempfile
+import threading
+import time
+import uuid
+
+
+class MailSpool():
+    """Delivers emails from a spool directory in the background.
+
+    Messages are `.eml` files, as written by `send_email` with `output`, that are moved atomically into the spool so
+    a half written message is never sent. A daemon thread sends them and retries the ones that fail with an
+    exponential backoff, so a script doesn't wait on, or fail because of, a slow or unreachable SMTP server.
+    At exit the thread is given `exit_timeout` seconds to finish the message it is sending, and the messages still
+    in the spool are sent by the next `MailSpool` using the same directory, which can also run in a separate process
+    with `start=False` and `drain`.
+
+    The spool directory holds:
+        tmp/: Messages being written.
+        new/: Messages waiting to be sent, each not before its modification time.
+        sending/: Messages being sent.
+        failed/: Messages that were refused by the server or ran out of attempts.
+    """
+
+    def __init__(
+            self, spool_dir: str, host: Optional[str] = None, mailer: Optional[Mailer] = None,
+            max_attempts: int = 8, backoff: float = 30.0, max_backoff: float = 3600.0, poll_interval: float = 5.0,
+            stale_after: float = 3600.0, start: bool = True, timeout: float = 30.0, exit_timeout: float = 5.0):
+        """Creates a `MailSpool`, its directories, and starts its thread.
+
+        Args:
+            spool_dir (str): The spool directory.
+            host (str, optional): The SMTP server to send to, when no `mailer` is provided.
+            mailer (Mailer, optional): The mailer to send with.
+            max_attempts (int): The number of attempts to send a message before it is moved to `failed/`.
+            backoff (float): The number of seconds to wait before retrying a message, doubled after each attempt.
+            max_backoff (float): The maximum number of seconds to wait before retrying a message.
+            poll_interval (float): The number of seconds between checks for messages to retry.
+            stale_after (float): The number of seconds after which a message left in `sending/`, by a process that
+                stopped while sending it, is queued again.
+            start (bool): Whether to start the delivery thread. Call `drain` to send the messages otherwise.
+            timeout (float): The number of seconds to wait for the SMTP server, when sending to `host`. Defaults to 30.
+            exit_timeout (float): The maximum number of seconds to wait for the thread at exit. Defaults to 5.
+
+        Raises:
+            ValueError: When neither `host` nor `mailer` is provided, or `max_attempts` is not a positive integer.
+        """
+        if host is None and mailer is None:
+            raise ValueError("Either host or mailer must be provided")
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be a positive integer")
+
+        self._host = host
+        self._mailer = mailer
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._poll_interval = poll_interval
+        self._stale_after = stale_after
+        self._timeout = timeout
+        self._dirs = {name: os.path.join(spool_dir, name) for name in ("tmp", "new", "sending", "failed")}
+        for directory in self._dirs.values():
+            os.makedirs(directory, exist_ok=True)
+
+        self._wake = threading.Event()
+        self._closed = False
+        self._final_drain = True
+        self._thread = None
+        self._close_at_exit = functools.partial(self.close, timeout=exit_timeout, drain=False)
+        if start:
+            self._thread = threading.Thread(target=self._run, name="MailSpool", daemon=True)
+            self._thread.start()
+            atexit.register(self._close_at_exit)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def pending(self) -> int:
+        """The number of messages waiting to be sent."""
+        return sum(1 for entry in os.scandir(self._dirs["new"]) if entry.name.endswith(".eml"))
+
+    @property
+    def failed(self) -> List[str]:
+        """The paths of the messages that could not be sent."""
+        return sorted(entry.path for entry in os.scandir(self._dirs["failed"]) if entry.name.endswith(".eml"))
+
+    def add(self, path: str) -> str:
+        """Moves a message file into the spool to be sent.
+
+        Args:
+            path (str): The `.eml` file, with CRLF line endings as written by `send_email` with `output`.
+
+        Returns:
+            str: The path of the message in the spool.
+
+        Raises:
+            RuntimeError: When the spool is closed.
+            OSError: When failing to move the file.
+        """
+        if self._closed:
+            raise RuntimeError("Cannot add to a closed MailSpool")
+
+        tmp_path = path
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self._dirs["tmp"]):
+            # a rename is only atomic within a file system, so the message is first moved next to the queue
+            tmp_path = self.new_message_path()
+            shutil.move(path, tmp_path)
+
+        spooled_path = os.path.join(self._dirs["new"], os.path.basename(tmp_path))
+        os.replace(tmp_path, spooled_path)
+        self._wake.set()
+        return spooled_path
+
+    def drain(self) -> int:
+        """Sends the messages that are due, once each.
+
+        Returns:
+            int: The number of messages sent.
+        """
+        self._requeue_stale()
+
+        now = time.time()
+        due = sorted(
+            (entry for entry in os.scandir(self._dirs["new"])
+             if entry.name.endswith(".eml") and entry.stat().st_mtime <= now),
+            key=lambda entry: entry.name)
+
+        sent = 0
+        for entry in due:
+            sending_path = os.path.join(self._dirs["sending"], entry.name)
+            try:
+                # claims the message, another drain may already have
+                os.replace(entry.path, sending_path)
+            except FileNotFoundError:
+                continue
+            os.utime(sending_path)
+            sent += self._deliver(sending_path)
+
+        return sent
+
+    def new_message_path(self) -> str:
+        """Returns a new path in the spool to write a message to, before passing it to `add`.
+
+        Returns:
+            str: The path, in the same file system as the queue so `add` moves the message atomically.
+        """
+        # names sort in the order the messages were spooled, then carry the number of attempts made
+        return os.path.join(self._dirs["tmp"], f"{time.time_ns()}-{uuid.uuid4().hex}.0.eml")
+
+    def close(self, timeout: Optional[float] = None, drain: bool = True):
+        """Stops the delivery thread, by default after a last attempt to send the messages that are due.
+
+        Messages that could not be sent stay in the spool. Closing a spool more than once has no effect. At exit the
+        spool is closed without the last attempt and waiting at most `exit_timeout` seconds.
+
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait for the thread.
+            drain (bool): Whether to attempt to send the messages that are due before stopping. Defaults to True.
+
+        Returns:
+            None
+        """
+        if self._closed:
+            return
+        self._final_drain = drain
+        self._closed = True
+        if self._thread is None:
+            return
+        atexit.unregister(self._close_at_exit)
+
+        self._wake.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logging.warning("MailSpool did not finish sending, %s messages are left in the spool", self.pending)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.clear()
+            self._drain_logged()
+            self._wake.wait(self._poll_interval)
+        if self._final_drain:
+            self._drain_logged()
+
+    def _drain_logged(self):
+        try:
+            self.drain()
+        except OSError as e:
+            logging.error("MailSpool failed to read the spool: %s", e)
+
+    def _requeue_stale(self):
+        stale = time.time() - self._stale_after
+        for entry in os.scandir(self._dirs["sending"]):
+            if entry.name.endswith(".eml") and entry.stat().st_mtime < stale:
+                logging.warning("Queuing %s again, it was left unsent in the spool", entry.name)
+                os.replace(entry.path, os.path.join(self._dirs["new"], entry.name))
+
+    def _deliver(self, path: str) -> bool:
+        name, attempts, extension = os.path.basename(path).rsplit(".", 2)
+        attempts = int(attempts) + 1
+
+        try:
+            with open(path, "rb") as fp:
+                sender, recipients, has_bcc = _envelope(fp)
+                fp.seek(0)
+                if has_bcc:
+                    fp = _without_bcc(fp)
+                with fp:
+                    if self._mailer is not None:
+                        self._mailer.send_file(fp, sender, recipients)
+                    else:
+                        with smtplib.SMTP(self._host, timeout=self._timeout) as server:
+                            send_file(server, fp, sender, recipients)
+        except Exception as e:
+            if _is_permanent(e) or attempts >= self._max_attempts:
+                logging.error("Failed to send %s after %s attempts: %s", name, attempts, e)
+                os.replace(path, os.path.join(self._dirs["failed"], f"{name}.{attempts}.{extension}"))
+                return False
+
+            delay = min(self._max_backoff, self._backoff * 2 ** (attempts - 1))
+            logging.warning("Failed to send %s, retrying in %.0f seconds: %s", name, delay, e)
+            retry_path = os.path.join(self._dirs["new"], f"{name}.{attempts}.{extension}")
+            os.replace(path, retry_path)
+            retry_time = time.time() + delay
+            os.utime(retry_path, (retry_time, retry_time))
+            return False
+
+        os.remove(path)
+        return True
+
+
+def _envelope(fp) -> Tuple[str, List[str], bool]:
+    """Reads the envelope sender and recipients from the headers of a message, and whether it has a Bcc header."""
+    headers = BytesHeaderParser(policy=default).parse(fp)
+    sender = parseaddr(str(headers.get("From", "")))[1]
+    recipients = [
+        address for _, address in getaddresses([str(value) for name in ("To", "Cc", "Bcc")
+                                                for value in headers.get_all(name, [])])
+        if address
+    ]
+    if not sender or not recipients:
+        raise ValueError("The message has no sender or no recipients")
+
+    return sender, recipients, "Bcc" in headers
+
+
+def _without_bcc(fp) -> BinaryIO:
+    """Copies a message without its Bcc headers, like `smtplib.SMTP.send_message`, to a temporary file."""
+    copy = tempfile.TemporaryFile()
+    in_bcc = False
+    for line in fp:
+        if line in (b"\r\n", b"\n"):
+            copy.write(line)
+            break
+        # a header continues on the lines starting with whitespace
+        if not line[:1].isspace():
+            in_bcc = line.lower().startswith(b"bcc:")
+        if not in_bcc:
+            copy.write(line)
+    shutil.copyfileobj(fp, copy)
+    fp.close()
+    copy.seek(0)
+    return copy
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Whether sending failed in a way retrying won't fix, refer to RFC 5321 section 4.2.1."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return isinstance(error, ValueError)
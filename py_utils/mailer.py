@@ -0,0 +1,366 @@
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage, MIMEPart
+from email.policy import SMTP
+from typing import BinaryIO, Callable, Iterable, List, NamedTuple, Optional, Sequence
+
+import base64
+import gzip
+import logging
+import mimetypes
+import os
+import queue
+import shutil
+import smtplib
+import tempfile
+import threading
+import uuid
+import zipfile
+
+
+# Attachments are read and base64 encoded in chunks of whole 76 character lines, 57 bytes each
+_CHUNK_SIZE = 57 * 1024
+
+_COMPRESSION_TYPES = {"gzip": "application/gzip", "zip": "application/zip"}
+_ENCODING_TYPES = {"gzip": "application/gzip", "bzip2": "application/x-bzip2", "xz": "application/x-xz"}
+
+
+class Attachment(NamedTuple):
+    """A file to attach to an email, read from `fileobj`."""
+    fileobj: BinaryIO
+    filename: str
+    maintype: str
+    subtype: str
+
+
+class Mailer():
+    """Sends emails over a pool of reusable SMTP connections.
+
+    Opening an SMTP session costs a TCP handshake, the greeting, `EHLO`, and possibly `STARTTLS` and `AUTH`. A
+    `Mailer` keeps its connections open across messages and reconnects when the server drops an idle session.
+    Close the mailer, or use it as a context manager, to quit the open sessions.
+    """
+
+    def __init__(
+            self, host: str, port: int = 0, username: Optional[str] = None, password: Optional[str] = None,
+            starttls: bool = False, timeout: float = 30.0, max_connections: int = 1):
+        """Creates a `Mailer`, connections are opened when they are first needed.
+
+        Args:
+            host (str): The name of the remote host to which to connect.
+            port (int): The port to connect to. Defaults to the standard SMTP port.
+            username (str, optional): The user to authenticate as. No authentication when omitted.
+            password (str, optional): The password of `username`.
+            starttls (bool): Whether to upgrade the connections to TLS with `STARTTLS`.
+            timeout (float): The number of seconds to wait for the server. Defaults to 30.
+            max_connections (int): The maximum number of connections, and therefore of messages sent at once.
+
+        Raises:
+            ValueError: When `max_connections` is not a positive integer.
+        """
+        if max_connections < 1:
+            raise ValueError("max_connections must be a positive integer")
+
+        self._host = host
+        self._port = port
+        self._username = username
+        self._password = password
+        self._starttls = starttls
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Quits the open SMTP sessions.
+
+        Returns:
+            None
+        """
+        self._closed = True
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            _quit(connection)
+
+    def send(self, msg: EmailMessage):
+        """Sends a message, reconnecting once if the server dropped the session.
+
+        Args:
+            msg (EmailMessage): The message to send, its recipients are read from its headers.
+
+        Returns:
+            None
+
+        Raises:
+            RuntimeError: When the mailer is closed.
+            smtplib.SMTPException: When the server rejects the message.
+            OSError: When failing to connect to the server.
+        """
+        self._send(lambda connection: connection.send_message(msg))
+
+    def send_file(self, fp: BinaryIO, sender: str, recipients: List[str]):
+        """Streams a message written by `write_email` from a file, reconnecting once if the server dropped the session.
+
+        Args:
+            fp (BinaryIO): The file containing the message, positioned at its start.
+            sender (str): The envelope sender.
+            recipients (List[str]): The envelope recipients.
+
+        Returns:
+            None
+
+        Raises:
+            RuntimeError: When the mailer is closed.
+            smtplib.SMTPException: When the server rejects the message.
+            OSError: When failing to connect to the server.
+        """
+        start = fp.tell()
+
+        def send(connection: smtplib.SMTP):
+            fp.seek(start)
+            send_file(connection, fp, sender, recipients)
+
+        self._send(send)
+
+    def send_many(self, messages: Iterable[EmailMessage]) -> List[Optional[Exception]]:
+        """Sends messages over up to `max_connections` connections at once.
+
+        A message that fails to send does not stop the others from being sent.
+
+        Args:
+            messages (Iterable[EmailMessage]): The messages to send.
+
+        Returns:
+            List[Optional[Exception]]: The error of each message, in order, or None when it was sent.
+        """
+        messages = list(messages)
+        with ThreadPoolExecutor(max_workers=self._max_connections, thread_name_prefix="Mailer") as executor:
+            futures = [executor.submit(self.send, msg) for msg in messages]
+
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                logging.error("Failed to send email: %s", error)
+
+        return errors
+
+    def _send(self, send: Callable[[smtplib.SMTP], None]):
+        if self._closed:
+            raise RuntimeError("Cannot send with a closed Mailer")
+
+        with self._slots:
+            connection = self._checkout()
+            try:
+                send(connection)
+            except smtplib.SMTPServerDisconnected:
+                logging.debug("SMTP session was dropped, reconnecting")
+                _quit(connection)
+                connection = self._connect()
+                try:
+                    send(connection)
+                except Exception:
+                    _quit(connection)
+                    raise
+            except smtplib.SMTPRecipientsRefused:
+                # the session is still usable after the server refused the recipients
+                self._idle.put(connection)
+                raise
+            except Exception:
+                _quit(connection)
+                raise
+
+            self._idle.put(connection)
+
+    def _checkout(self) -> smtplib.SMTP:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self._host, self._port, timeout=self._timeout)
+        try:
+            if self._starttls:
+                connection.starttls()
+            if self._username is not None:
+                connection.login(self._username, self._password)
+        except Exception:
+            _quit(connection)
+            raise
+
+        return connection
+
+
+def prepare_attachment(
+        path: str, compress_over: Optional[int] = None, compression: str = "gzip",
+        max_size: Optional[int] = None) -> Attachment:
+    """Opens a file to attach to an email, detecting its MIME type and compressing it when it is large.
+
+    Compression streams the file into a temporary file so it is never read into memory at once. Files that are
+    already compressed are attached as is.
+
+    Args:
+        path (str): The path to the file.
+        compress_over (int, optional): The size in bytes above which the file is compressed. Never when omitted.
+        compression (str): The compression format, `gzip` or `zip`. Defaults to `gzip`.
+        max_size (int, optional): The size in bytes, after compression, above which the file is refused.
+
+    Returns:
+        Attachment: The attachment, close its `fileobj` when done.
+
+    Raises:
+        ValueError: When the compression format is unknown or the attachment is larger than `max_size`.
+        OSError: When failing to read the file.
+    """
+    if compression not in _COMPRESSION_TYPES:
+        raise ValueError(f"Unknown compression '{compression}', expected one of {sorted(_COMPRESSION_TYPES)}")
+
+    filename = os.path.basename(path)
+    mime_type, encoding = mimetypes.guess_type(path)
+    if encoding is not None:
+        mime_type = _ENCODING_TYPES.get(encoding, "application/octet-stream")
+    mime_type = mime_type or "application/octet-stream"
+
+    size = os.path.getsize(path)
+    already_compressed = encoding is not None or mime_type in _COMPRESSION_TYPES.values()
+    if compress_over is not None and size > compress_over and not already_compressed:
+        fileobj = _compress(path, filename, compression)
+        filename = f"{filename}.{'gz' if compression == 'gzip' else 'zip'}"
+        mime_type = _COMPRESSION_TYPES[compression]
+        size = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(0)
+    else:
+        fileobj = open(path, "rb")
+
+    if max_size is not None and size > max_size:
+        fileobj.close()
+        raise ValueError(f"Attachment {filename} is {size} bytes, larger than the maximum of {max_size} bytes")
+
+    maintype, subtype = mime_type.split("/", 1)
+    return Attachment(fileobj, filename, maintype, subtype)
+
+
+def write_email(fp: BinaryIO, msg: EmailMessage, attachments: Sequence[Attachment]):
+    """Writes a message with attachments to a file, streaming the attachments in chunks.
+
+    Unlike `msg.as_bytes`, the attachments are base64 encoded a chunk at a time straight into `fp`, so memory
+    use doesn't depend on their size. Lines end with CRLF, ready to be sent over SMTP.
+
+    Args:
+        fp (BinaryIO): The file to write the message to.
+        msg (EmailMessage): The message headers and body, without attachments.
+        attachments (Sequence[Attachment]): The attachments to add to the message.
+
+    Returns:
+        None
+    """
+    if not attachments:
+        fp.write(msg.as_bytes(policy=SMTP))
+        return
+
+    boundary = f"=_{uuid.uuid4().hex}"
+    for name, value in msg.items():
+        if name.lower() not in ("content-type", "content-transfer-encoding", "mime-version"):
+            fp.write(SMTP.fold_binary(name, value))
+    fp.write(b"MIME-Version: 1.0\r\n")
+    fp.write(f'Content-Type: multipart/mixed; boundary="{boundary}"\r\n\r\n'.encode())
+
+    body = MIMEPart(policy=SMTP)
+    body.set_content(msg.get_content(), subtype=msg.get_content_subtype())
+    fp.write(f"--{boundary}\r\n".encode())
+    fp.write(body.as_bytes(policy=SMTP))
+
+    for attachment in attachments:
+        headers = MIMEPart(policy=SMTP)
+        headers["Content-Type"] = f"{attachment.maintype}/{attachment.subtype}"
+        headers["Content-Transfer-Encoding"] = "base64"
+        headers.add_header("Content-Disposition", "attachment", filename=attachment.filename)
+
+        fp.write(f"\r\n--{boundary}\r\n".encode())
+        for name, value in headers.items():
+            fp.write(SMTP.fold_binary(name, value))
+        fp.write(b"\r\n")
+        while chunk := attachment.fileobj.read(_CHUNK_SIZE):
+            fp.write(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+
+    fp.write(f"\r\n--{boundary}--\r\n".encode())
+
+
+def send_file(connection: smtplib.SMTP, fp: BinaryIO, sender: str, recipients: List[str]):
+    """Sends a message written by `write_email` over an SMTP connection, streaming it from the file.
+
+    Args:
+        connection (smtplib.SMTP): The connection to send the message with.
+        fp (BinaryIO): The file containing the message, positioned at its start.
+        sender (str): The envelope sender.
+        recipients (List[str]): The envelope recipients.
+
+    Returns:
+        None
+
+    Raises:
+        smtplib.SMTPException: When the server rejects the message.
+    """
+    connection.ehlo_or_helo_if_needed()
+    code, response = connection.mail(sender)
+    if code != 250:
+        connection.rset()
+        raise smtplib.SMTPSenderRefused(code, response, sender)
+
+    refused = {}
+    for recipient in recipients:
+        code, response = connection.rcpt(recipient)
+        if code not in (250, 251):
+            refused[recipient] = (code, response)
+    if len(refused) == len(recipients):
+        connection.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    code, response = connection.docmd("DATA")
+    if code != 354:
+        connection.rset()
+        raise smtplib.SMTPDataError(code, response)
+
+    for line in fp:
+        # dot-stuffing, refer to RFC 5321 section 4.5.2
+        if line.startswith(b"."):
+            line = b"." + line
+        connection.send(line)
+    connection.send(b".\r\n")
+
+    code, response = connection.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, response)
+
+
+def _compress(path: str, filename: str, compression: str) -> BinaryIO:
+    """Compresses a file into a temporary file, returned positioned at its start."""
+    compressed = tempfile.TemporaryFile()
+    with open(path, "rb") as source:
+        if compression == "gzip":
+            with gzip.GzipFile(filename=filename, mode="wb", fileobj=compressed) as target:
+                shutil.copyfileobj(source, target, _CHUNK_SIZE)
+        else:
+            with zipfile.ZipFile(compressed, "w", zipfile.ZIP_DEFLATED) as archive:
+                with archive.open(filename, "w", force_zip64=True) as target:
+                    shutil.copyfileobj(source, target, _CHUNK_SIZE)
+
+    compressed.seek(0)
+    return compressed
+
+
+def _quit(connection: smtplib.SMTP):
+    """Ends an SMTP session, closing the socket even when the server is gone."""
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.close()
@@ -0,0 +1,319 @@
+from bisect import bisect_left
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from typing import Dict, Optional, Sequence, Tuple
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import weakref
+
+
+# The upper bounds, in seconds, of the histogram buckets durations are counted in
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Statements are labelled with their operation, any other statement is labelled `other`
+_OPERATIONS = frozenset(("select", "insert", "update", "delete"))
+
+_Tags = Tuple[Tuple[str, str], ...]
+
+
+class MetricsSink():
+    """Receives the metrics recorded by `instrument_engine` and `DbClient`.
+
+    Subclasses implement `increment` and `timing`; the default implementations discard the metrics.
+    """
+
+    def increment(self, name: str, value: int = 1, tags: Optional[Dict[str, str]] = None):
+        """Adds `value` to a counter.
+
+        Args:
+            name (str): The name of the counter.
+            value (int): The amount to add. Defaults to 1.
+            tags (Dict[str, str], optional): The labels of the counter.
+
+        Returns:
+            None
+        """
+
+    def timing(self, name: str, seconds: float, tags: Optional[Dict[str, str]] = None):
+        """Records a duration.
+
+        Args:
+            name (str): The name of the timer.
+            seconds (float): The duration in seconds.
+            tags (Dict[str, str], optional): The labels of the timer.
+
+        Returns:
+            None
+        """
+
+    def flush(self):
+        """Writes out the recorded metrics, for sinks that buffer them.
+
+        Returns:
+            None
+        """
+
+
+class InMemorySink(MetricsSink):
+    """Keeps counters and duration histograms in memory, read them with `snapshot`."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Creates an `InMemorySink`.
+
+        Args:
+            buckets (Sequence[float]): The upper bounds, in seconds, of the histogram buckets. Defaults to
+                `DEFAULT_BUCKETS`.
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[Tuple[str, _Tags], int] = {}
+        self._timings: Dict[Tuple[str, _Tags], dict] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: int = 1, tags: Optional[Dict[str, str]] = None):
+        key = (name, _tag_items(tags))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def timing(self, name: str, seconds: float, tags: Optional[Dict[str, str]] = None):
+        key = (name, _tag_items(tags))
+        with self._lock:
+            histogram = self._timings.get(key)
+            if histogram is None:
+                histogram = self._timings[key] = {
+                    "count": 0, "sum": 0.0, "min": seconds, "max": seconds, "buckets": [0] * len(self.buckets),
+                }
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            histogram["min"] = min(histogram["min"], seconds)
+            histogram["max"] = max(histogram["max"], seconds)
+            index = bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                histogram["buckets"][index] += 1
+
+    def snapshot(self) -> dict:
+        """Returns a copy of the recorded metrics.
+
+        Series are keyed by their name and tags in the Prometheus notation, e.g.
+        `db_statement_rows_total{operation="insert"}`. Each histogram holds the `count`, `sum`, `min` and `max` of
+        its durations and the cumulative number of durations in each bucket, keyed by the upper bound of the bucket.
+
+        Returns:
+            dict: The `counters` and `timings` recorded so far.
+        """
+        with self._lock:
+            counters = {_series(name, tags): value for (name, tags), value in self._counters.items()}
+            timings = {}
+            for (name, tags), histogram in self._timings.items():
+                cumulative, buckets = 0, {}
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                timings[_series(name, tags)] = dict(histogram, buckets=buckets)
+
+        return {"counters": counters, "timings": timings}
+
+    def reset(self):
+        """Discards the recorded metrics.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+class PrometheusTextfileSink(InMemorySink):
+    """Writes the metrics to a file in the Prometheus text format, for the node exporter textfile collector.
+
+    The file is replaced atomically on every `flush` and when the sink is closed, which happens automatically at
+    interpreter exit.
+    """
+
+    def __init__(self, path: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Creates a `PrometheusTextfileSink`.
+
+        Args:
+            path (str): The file to write, its name should end with `.prom`.
+            buckets (Sequence[float]): The upper bounds, in seconds, of the histogram buckets. Defaults to
+                `DEFAULT_BUCKETS`.
+        """
+        super().__init__(buckets)
+        self.path = path
+        atexit.register(self.close)
+
+    def close(self):
+        """Writes the metrics a last time.
+
+        Returns:
+            None
+        """
+        atexit.unregister(self.close)
+        try:
+            self.flush()
+        except OSError as e:
+            logging.error("Failed to write metrics to %s: %s", self.path, e)
+
+    def flush(self):
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f"{_series(name, tags)} {value}"
+                             for (series, tags), value in sorted(self._counters.items()) if series == name)
+
+            for name in sorted({name for name, _ in self._timings}):
+                lines.append(f"# TYPE {name} histogram")
+                for (series, tags), histogram in sorted(self._timings.items()):
+                    if series != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, histogram["buckets"]):
+                        cumulative += count
+                        lines.append(f"{_series(f'{name}_bucket', tags + (('le', repr(bound)),))} {cumulative}")
+                    lines.append(f"{_series(f'{name}_bucket', tags + (('le', '+Inf'),))} {histogram['count']}")
+                    lines.append(f"{_series(f'{name}_sum', tags)} {histogram['sum']!r}")
+                    lines.append(f"{_series(f'{name}_count', tags)} {histogram['count']}")
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+class StatsdSink(MetricsSink):
+    """Sends the metrics to a StatsD daemon over UDP, with tags in the DogStatsD format.
+
+    Metrics are sent as they are recorded and lost when the daemon is not listening, sending never blocks.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8125, prefix: str = ""):
+        """Creates a `StatsdSink`.
+
+        Args:
+            host (str): The host of the StatsD daemon. Defaults to `127.0.0.1`.
+            port (int): The port of the StatsD daemon. Defaults to 8125.
+            prefix (str): The prefix added to the metric names, e.g. `my_script.`.
+        """
+        self._address = (host, port)
+        self._prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def increment(self, name: str, value: int = 1, tags: Optional[Dict[str, str]] = None):
+        self._send(f"{self._prefix}{name}:{value}|c", tags)
+
+    def timing(self, name: str, seconds: float, tags: Optional[Dict[str, str]] = None):
+        self._send(f"{self._prefix}{name}:{seconds * 1000:.3f}|ms", tags)
+
+    def close(self):
+        """Closes the socket.
+
+        Returns:
+            None
+        """
+        self._socket.close()
+
+    def _send(self, metric: str, tags: Optional[Dict[str, str]]):
+        if tags:
+            metric += "|#" + ",".join(f"{key}:{value}" for key, value in _tag_items(tags))
+        try:
+            self._socket.sendto(metric.encode(), self._address)
+        except OSError:
+            pass
+
+
+# The sinks each engine was instrumented for, so instrumenting twice doesn't count everything twice
+_instrumented: "weakref.WeakKeyDictionary[Engine, list]" = weakref.WeakKeyDictionary()
+
+
+def instrument_engine(engine: Engine, sink: MetricsSink, slow_query_threshold: Optional[float] = None):
+    """Records the statements executed and the connections checked out by an engine.
+
+    The following metrics are recorded, labelled with the `operation` of the statement (`select`, `insert`,
+    `update`, `delete` or `other`):
+        db_statement_duration_seconds: The time taken by each statement.
+        db_statement_rows_total: The number of rows inserted, updated or deleted.
+        db_statement_errors_total: The number of statements that failed.
+        db_slow_statements_total: The number of statements slower than `slow_query_threshold`.
+        db_pool_checkout_duration_seconds: The time waited for a connection from the pool, including connecting.
+
+    Instrumenting an engine more than once with the same sink has no effect. For an `AsyncDbClient`, instrument
+    the `sync_engine` of its engine.
+
+    Args:
+        engine (Engine): The engine to instrument.
+        sink (MetricsSink): The sink to record the metrics to.
+        slow_query_threshold (float, optional): The duration in seconds above which statements are logged as a
+            warning. No statements are logged when omitted.
+
+    Returns:
+        None
+    """
+    sinks = _instrumented.setdefault(engine, [])
+    if any(instrumented is sink for instrumented in sinks):
+        return
+    sinks.append(sink)
+
+    # connections can be shared by several instrumentations, each keeps its own start times
+    start_times = object()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(start_times, []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info[start_times].pop()
+        tags = {"operation": _operation(statement)}
+        sink.timing("db_statement_duration_seconds", duration, tags)
+        if tags["operation"] != "select" and cursor.rowcount > 0:
+            sink.increment("db_statement_rows_total", cursor.rowcount, tags)
+
+        if slow_query_threshold is not None and duration >= slow_query_threshold:
+            sink.increment("db_slow_statements_total", 1, tags)
+            logging.warning("Slow statement took %.3f seconds: %s", duration, statement)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get(start_times):
+            context.connection.info[start_times].pop()
+        sink.increment("db_statement_errors_total", 1, {"operation": _operation(context.statement or "")})
+
+    # the pool has no event before a checkout, so the engine's checkout is timed instead. The engine keeps its
+    # `raw_connection` when it is disposed and replaces its pool.
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            sink.timing("db_pool_checkout_duration_seconds", time.perf_counter() - start)
+
+    engine.raw_connection = timed_raw_connection
+
+
+def _operation(statement: str) -> str:
+    operation = statement.lstrip()[:6].lower()
+    return operation if operation in _OPERATIONS else "other"
+
+
+def _tag_items(tags: Optional[Dict[str, str]]) -> _Tags:
+    return tuple(sorted((key, str(value)) for key, value in (tags or {}).items()))
+
+
+def _series(name: str, tags: _Tags) -> str:
+    if not tags:
+        return name
+    labels = ",".join(f'{key}="{_escape(value)}"' for key, value in tags)
+    return f"{name}{{{labels}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -1,7 +1,9 @@
 from datetime import datetime
 from enum import Enum
-from sqlmodel import Field, SQLModel
-from typing import Optional, List
+from .column_types import CompressedPayload
+from sqlalchemy import Index
+from sqlmodel import Column, Field, SQLModel
+from typing import Any, Optional, List
 from sqlmodel import Relationship
 from datetime import timezone
 
@@ -14,6 +16,12 @@ class JobStatusLevels(str, Enum):
 
 class JobStatus(SQLModel, table=True):
     __tablename__: str = "job_status"
+    # The composite indexes also serve lookups on their first column alone, i.e., all the runs of a script
+    __table_args__ = (
+        Index("ix_job_status_script_name_script_start_time", "script_name", "script_start_time"),
+        Index("ix_job_status_level_script_start_time", "level", "script_start_time"),
+        Index("ix_job_status_host_script_start_time", "host", "script_start_time"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     created_date: datetime = Field(default=datetime.utcnow(), nullable=False)
@@ -22,13 +30,14 @@ class JobStatus(SQLModel, table=True):
     script_path: str = Field(nullable=True)
     script_name: str = Field(nullable=True)
     executed_by: str = Field(nullable=True)
-    script_start_time: datetime = Field(nullable=True)
+    script_start_time: datetime = Field(nullable=True, index=True)
     script_end_time: datetime = Field(nullable=True)
     elapsed_time: int = Field(nullable=True)
-    job_summary_data: str = Field(nullable=True, max_length=15000)
+    job_summary_data: Any = Field(sa_column=Column(CompressedPayload(), nullable=True))
     level: JobStatusLevels = Field(nullable=True)
     report_data: List["ReportData"] = Relationship(
         back_populates="job_status", sa_relationship_kwargs={"lazy": "joined"})
+    timings: List["JobTiming"] = Relationship(back_populates="job_status")
 
     def __str__(self):
         return (
@@ -44,12 +53,12 @@ class ReportData(SQLModel, table=True):
     __tablename__: str = "report_data"
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    report_data: Optional[str] = Field(default='', max_length=16000)
+    report_data: Optional[str] = Field(default='', sa_column=Column(CompressedPayload()))
     report_name: Optional[str] = Field(default='')
     date_generated: datetime = Field(default=datetime.now(timezone.utc), nullable=False)
     script_name: Optional[str] = Field()
     report_size: Optional[int] = Field(default=0)
-    job_status_id: Optional[int] = Field(default=None, foreign_key="job_status.id")
+    job_status_id: Optional[int] = Field(default=None, foreign_key="job_status.id", index=True)
     job_status: JobStatus = Relationship(back_populates="report_data")
 
     def __str__(self):
@@ -67,3 +76,32 @@ class ReportData(SQLModel, table=True):
     def __hash__(self):
         return hash((self.id, self.report_data, self.report_name, self.date_generated, self.script_name,
                      self.job_status_id))
+
+
+class JobTiming(SQLModel, table=True):
+    """The duration and resource usage of a phase of a job, recorded by `ScriptHelper.phase`.
+
+    The phase named `job` covers the whole run of the script. `peak_rss` is the peak resident memory of the process
+    when the phase ended, while `memory_peak` and `profile` are only recorded when requested.
+    """
+    __tablename__: str = "job_timing"
+    __table_args__ = (
+        Index("ix_job_timing_phase_started_at", "phase", "started_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_status_id: Optional[int] = Field(default=None, foreign_key="job_status.id", index=True)
+    phase: str = Field(nullable=False)
+    started_at: datetime = Field(nullable=True)
+    duration: float = Field(nullable=True)
+    cpu_time: float = Field(nullable=True)
+    peak_rss: Optional[int] = Field(default=None, nullable=True)
+    memory_peak: Optional[int] = Field(default=None, nullable=True)
+    profile: Any = Field(default=None, sa_column=Column(CompressedPayload(), nullable=True))
+    job_status: JobStatus = Relationship(back_populates="timings")
+
+    def __str__(self):
+        return (
+            f"phase: {self.phase}, started_at: {self.started_at}, duration: {self.duration},"
+            f" cpu_time: {self.cpu_time}, peak_rss: {self.peak_rss}"
+        )
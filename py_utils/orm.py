@@ -1,15 +1,43 @@
 from deprecated import deprecated
+from .column_types import CompressedPayload
+from .metrics import MetricsSink, instrument_engine
 from sqlalchemy.exc import IntegrityError, OperationalError
+from itertools import islice
+from sqlalchemy import MetaData, String, Table, event, func, inspect, insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import select as sa_select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import defer as defer_column
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm import defaultload, joinedload, lazyload, noload, raiseload, selectinload, subqueryload
 from sqlmodel import Session, create_engine, SQLModel, select
-from typing import List, Type, TypeVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Type, TypeVar, Union
 
+import functools
+import hashlib
 import logging
 import os
+import re
 import sqlite3
+import threading
+import time
+import weakref
 
 
 _T = TypeVar("_T", bound=SQLModel)
 
+# Relationship loading strategies that can be chosen per query, overriding the `lazy` setting of the model
+LOADING_STRATEGIES = {
+    "joined": joinedload,
+    "lazy": lazyload,
+    "noload": noload,
+    "raise": raiseload,
+    "selectin": selectinload,
+    "subquery": subqueryload,
+}
+
 
 def convert_model_to_dict(model) -> dict:
     """Returns dictionary representation of the provided model
@@ -23,37 +51,553 @@ def convert_model_to_dict(model) -> dict:
     return {key: getattr(model, key) for key in model.__table__.columns.keys()}
 
 
+def _rows_by_table(models: Iterable[SQLModel]) -> dict:
+    """Groups the column values of `models` by their table.
+
+    Primary key columns without a value are left out so the database generates them. Rows are also grouped
+    by the columns they provide so each group can be written with a single `executemany`.
+
+    Args:
+        models (Iterable[SQLModel]): The models to group.
+
+    Returns:
+        dict: A mapping of `(Table, columns)` to a list of row dictionaries.
+    """
+    rows_by_table = {}
+    for model in models:
+        table = model.__table__
+        row = {
+            key: value for key, value in convert_model_to_dict(model).items()
+            if value is not None or not table.columns[key].primary_key
+        }
+        rows_by_table.setdefault((table, tuple(row)), []).append(row)
+
+    return rows_by_table
+
+
+def _has_related(model: SQLModel) -> bool:
+    """Whether relationships of `model` hold related models, which `_rows_by_table` leaves out.
+
+    Args:
+        model (SQLModel): The model to check.
+
+    Returns:
+        bool: True when a relationship that was set or loaded holds a model or a non-empty collection.
+    """
+    for relationship in inspect(model).mapper.relationships:
+        # unloaded relationships are missing from the instance dictionary, reading them would load them
+        value = model.__dict__.get(relationship.key)
+        if value is not None and (not relationship.uselist or len(value) > 0):
+            return True
+    return False
+
+
+def _chunked(items: Iterable[_T], size: int) -> Iterator[List[_T]]:
+    """Yields lists of at most `size` items from `items`.
+
+    Args:
+        items (Iterable): The items to split into chunks.
+        size (int): The maximum number of items per chunk.
+
+    Returns:
+        Iterator[List]: An iterator over the chunks.
+    """
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# Pragmas applied to every new sqlite connection, trading durability for write throughput from top to bottom.
+# `bulk-load` does not journal to disk and may corrupt the database if the process crashes mid-transaction.
+SQLITE_PRAGMA_PRESETS = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "cache_size": -16000,
+        "temp_store": "MEMORY",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "bulk-load": {
+        "journal_mode": "MEMORY",
+        "synchronous": "OFF",
+        "busy_timeout": 30000,
+        "cache_size": -256000,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def _resolve_sqlite_pragmas(pragmas: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Returns the pragmas of a preset, or validates a dictionary of pragmas.
+
+    Args:
+        pragmas (Union[str, Dict[str, Any]]): The name of a preset in `SQLITE_PRAGMA_PRESETS` or the pragmas.
+
+    Returns:
+        Dict[str, Any]: The pragmas to apply.
+
+    Raises:
+        ValueError: When the preset is unknown or a pragma name or value is not valid.
+    """
+    if isinstance(pragmas, str):
+        if pragmas not in SQLITE_PRAGMA_PRESETS:
+            raise ValueError(f"Unknown sqlite preset '{pragmas}', expected one of {sorted(SQLITE_PRAGMA_PRESETS)}")
+        return SQLITE_PRAGMA_PRESETS[pragmas]
+
+    # pragmas can't be bound as parameters, so only allow plain names and values
+    for name, value in pragmas.items():
+        if not re.fullmatch(r"\w+", name) or not re.fullmatch(r"-?\w+", str(value)):
+            raise ValueError(f"Invalid sqlite pragma: {name}={value}")
+
+    return pragmas
+
+
+def _set_sqlite_pragmas(engine: Engine, pragmas: Dict[str, Any]):
+    """Registers a listener applying `pragmas` to every new connection of `engine`."""
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def _pool_options(pool_size: Optional[int], max_overflow: Optional[int], pool_recycle: Optional[int],
+                  pool_pre_ping: bool, pool_timeout: Optional[float]) -> dict:
+    """Returns the `create_engine` keyword arguments for the pool options that were set."""
+    options = {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_recycle": pool_recycle,
+        "pool_pre_ping": pool_pre_ping or None,
+        "pool_timeout": pool_timeout,
+    }
+    return {key: value for key, value in options.items() if value is not None}
+
+
+# Engines shared by the `DbClient`s of this process, keyed by url and engine options, and the number of clients
+# using each of them
+_engines: Dict[tuple, Engine] = {}
+_engine_refs: Dict[tuple, int] = {}
+_engines_lock = threading.Lock()
+
+
+def _acquire_engine(url: str, echo: bool, engine_options: dict, share_engine: bool,
+                    sqlite_pragmas: Optional[Dict[str, Any]] = None) -> tuple:
+    """Returns the registry key of an engine for `url`, creating the engine when it isn't shared yet.
+
+    Args:
+        url (str): The database url.
+        echo (bool): Whether the engine echoes its statements.
+        engine_options (dict): The keyword arguments passed to `create_engine`.
+        share_engine (bool): Whether an engine created with the same arguments may be reused.
+        sqlite_pragmas (Dict[str, Any], optional): The pragmas applied to every new sqlite connection.
+
+    Returns:
+        tuple: The key of the engine in the registry.
+    """
+    key = (url, echo, tuple(sorted(engine_options.items())), tuple(sorted((sqlite_pragmas or {}).items())))
+    if not share_engine:
+        # a unique key keeps the engine private to the client
+        key = key + (object(),)
+
+    with _engines_lock:
+        if key not in _engines:
+            engine = create_engine(url, echo=echo, **engine_options)
+            if sqlite_pragmas:
+                _set_sqlite_pragmas(engine, sqlite_pragmas)
+            _engines[key] = engine
+            _engine_refs[key] = 0
+        _engine_refs[key] += 1
+
+    return key
+
+
+def _release_engine(key: tuple):
+    """Releases an engine acquired with `_acquire_engine`, disposing it when it is no longer used."""
+    with _engines_lock:
+        _engine_refs[key] -= 1
+        if _engine_refs[key] > 0:
+            return
+        engine = _engines.pop(key)
+        del _engine_refs[key]
+
+    engine.dispose()
+
+
+def dispose_engines():
+    """Disposes every engine shared by the `DbClient`s of this process.
+
+    Clients that are still open keep working, their connections are re-established on next use.
+
+    Returns:
+        None
+    """
+    with _engines_lock:
+        engines = list(_engines.values())
+
+    for engine in engines:
+        engine.dispose()
+
+
+# The hashes of the metadata whose tables were created or verified, per engine
+_verified_schemas: "weakref.WeakKeyDictionary[Engine, set]" = weakref.WeakKeyDictionary()
+
+
+def _metadata_hash(metadata: MetaData) -> str:
+    """Returns a hash of the tables, columns and indexes of `metadata`."""
+    schema = []
+    for table in metadata.sorted_tables:
+        columns = [(column.name, repr(column.type), column.nullable, column.primary_key) for column in table.columns]
+        indexes = sorted(index.name or "" for index in table.indexes)
+        schema.append((table.name, columns, indexes))
+
+    return hashlib.sha256(repr(schema).encode()).hexdigest()
+
+
+def _schema_marker_name(engine: Engine, schema_hash: str) -> str:
+    """Returns the name of the marker file for the tables of `schema_hash` in the database of `engine`.
+
+    The inode of sqlite databases is part of the name so a recreated database file is checked again.
+    """
+    identity = engine.url.render_as_string(hide_password=False)
+    if engine.url.get_backend_name() == "sqlite" and engine.url.database:
+        try:
+            identity += f":{os.stat(engine.url.database).st_ino}"
+        except OSError:
+            pass
+
+    return hashlib.sha256(f"{identity}:{schema_hash}".encode()).hexdigest()
+
+
+def _resolve_column(model: Type[SQLModel], column: Any) -> Any:
+    """Returns the attribute of `model` named `column`, or `column` itself when it is already an expression."""
+    if isinstance(column, str):
+        return getattr(model, column)
+    return column
+
+
+def _column_statement(instance: SQLModel, column: Any) -> tuple:
+    """Builds the statement selecting one column of the row of `instance`, by its primary key.
+
+    Returns:
+        tuple: The statement and the attribute name of the column.
+
+    Raises:
+        ValueError: When `instance` has no primary key value.
+    """
+    mapper = inspect(type(instance))
+    attribute = _resolve_column(type(instance), column)
+    primary_key = mapper.primary_key_from_instance(instance)
+    if any(value is None for value in primary_key):
+        raise ValueError(f"{type(instance).__name__} has no primary key value, it was not inserted")
+
+    statement = sa_select(attribute).where(*(key == value for key, value in zip(mapper.primary_key, primary_key)))
+    return statement, attribute.key
+
+
+def _apply_filters(statement, model: Type[SQLModel], where: Optional[Sequence[Any]],
+                   filter_by: Optional[Dict[str, Any]]):
+    """Adds the `where` expressions and the `filter_by` equality filters to `statement`."""
+    if where:
+        statement = statement.where(*where)
+    if filter_by:
+        statement = statement.where(*(getattr(model, key) == value for key, value in filter_by.items()))
+    return statement
+
+
+def _loader_options(model: Type[SQLModel], load: Optional[str], defer: Optional[Sequence[Any]]) -> list:
+    """Builds the loader options applying the `load` strategy and deferring the `defer` columns.
+
+    Args:
+        model (Type[SQLModel]): The model class definition.
+        load (str, optional): The relationship loading strategy, one of `LOADING_STRATEGIES`.
+        defer (Sequence, optional): Attribute names or attributes of `model` to defer, or columns of related models
+            as attributes, i.e., `ReportData.report_data`, or `relationship.column` names, i.e.,
+            `"report_data.report_data"`.
+
+    Returns:
+        list: The loader options.
+
+    Raises:
+        ValueError: When `load` is not a known loading strategy, or a deferred column is not of `model` or one of
+            its related models.
+    """
+    options = []
+    if load is not None:
+        if load not in LOADING_STRATEGIES:
+            raise ValueError(f"Unknown loading strategy '{load}', expected one of {sorted(LOADING_STRATEGIES)}")
+        options.append(LOADING_STRATEGIES[load]("*"))
+
+    for column in defer or []:
+        options.append(_defer_option(model, column))
+
+    return options
+
+
+def _defer_option(model: Type[SQLModel], column: Any):
+    """Returns the option deferring `column`, of `model` or of a model related to it, refer to `_loader_options`."""
+    relationships = inspect(model).relationships
+    if isinstance(column, str) and "." in column:
+        name, column = column.split(".", 1)
+        if name not in relationships:
+            raise ValueError(f"{model.__name__} has no relationship '{name}'")
+        relationship = relationships[name]
+        return defaultload(relationship.class_attribute).defer(getattr(relationship.mapper.class_, column))
+
+    attribute = _resolve_column(model, column)
+    entity = getattr(attribute, "class_", model)
+    if entity is model:
+        return defer_column(attribute)
+
+    # a column of a related model is deferred along the relationship loading it, keeping the loading strategy
+    matching = [relationship for relationship in relationships if relationship.mapper.class_ is entity]
+    if len(matching) != 1:
+        raise ValueError(f"Can't defer {attribute}, {model.__name__} needs exactly one relationship to "
+                         f"{entity.__name__}; use a 'relationship.column' name")
+    return defaultload(matching[0].class_attribute).defer(attribute)
+
+
+def _payload_column_ddl(dialect, table: Table, column) -> str:
+    """Returns the statement converting the text column `column` to the binary type of its `CompressedPayload`."""
+    preparer = dialect.identifier_preparer
+    table_name, column_name = preparer.format_table(table), preparer.format_column(column)
+    binary_type = column.type.compile(dialect=dialect)
+    if dialect.name == "mysql":
+        nullable = "NULL" if column.nullable else "NOT NULL"
+        return f"ALTER TABLE {table_name} MODIFY {column_name} {binary_type} {nullable}"
+    if dialect.name == "postgresql":
+        return (f"ALTER TABLE {table_name} ALTER COLUMN {column_name} TYPE {binary_type} "
+                f"USING convert_to({column_name}, 'UTF8')")
+    raise NotImplementedError(f"Converting {table.name}.{column.name} is not supported on {dialect.name}, "
+                              f"alter it to a binary type manually")
+
+
+# The dialects with a native upsert, mapped to their `insert` construct
+_UPSERT_DIALECTS = {
+    "mysql": mysql_insert,
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+def _upsert_statement(dialect: str, table: Table, columns: Sequence[str], conflict_keys: Optional[Sequence[str]],
+                      update_columns: Optional[Sequence[str]]):
+    """Builds the upsert statement of `DbClient.upsert` for rows providing `columns`, refer to it for the arguments."""
+    if conflict_keys is None:
+        conflict_keys = [column.name for column in table.primary_key.columns]
+    if update_columns is None:
+        update_columns = [column for column in columns if column not in conflict_keys]
+
+    statement = _UPSERT_DIALECTS[dialect](table)
+    if dialect == "mysql":
+        if not update_columns:
+            return statement.prefix_with("IGNORE")
+        return statement.on_duplicate_key_update({column: statement.inserted[column] for column in update_columns})
+
+    if not update_columns:
+        return statement.on_conflict_do_nothing(index_elements=conflict_keys)
+    return statement.on_conflict_do_update(
+        index_elements=conflict_keys, set_={column: statement.excluded[column] for column in update_columns})
+
+
+def _query_statement(
+        model: Type[SQLModel], columns: Optional[Sequence[Any]], where: Optional[Sequence[Any]],
+        filter_by: Optional[Dict[str, Any]], order_by: Optional[Sequence[Any]], group_by: Optional[Sequence[Any]],
+        limit: Optional[int], offset: Optional[int], load: Optional[str], defer: Optional[Sequence[Any]]):
+    """Builds the statement of `DbClient.query`, refer to it for the arguments."""
+    if columns:
+        statement = sa_select(*(_resolve_column(model, column) for column in columns))
+    else:
+        statement = select(model).options(*_loader_options(model, load, defer))
+
+    statement = _apply_filters(statement, model, where, filter_by)
+    if group_by:
+        statement = statement.group_by(*(_resolve_column(model, column) for column in group_by))
+    if order_by:
+        statement = statement.order_by(*(_resolve_column(model, column) for column in order_by))
+    if limit is not None:
+        statement = statement.limit(limit)
+    if offset is not None:
+        statement = statement.offset(offset)
+
+    return statement
+
+
+def _count_statement(model: Type[SQLModel], where: Optional[Sequence[Any]], filter_by: Optional[Dict[str, Any]]):
+    """Builds the statement of `DbClient.count`, refer to it for the arguments."""
+    return _apply_filters(sa_select(func.count()).select_from(model), model, where, filter_by)
+
+
+def _stream_statement(model: Type[SQLModel], chunk_size: int, where: Optional[Sequence[Any]], load: Optional[str],
+                      defer: Optional[Sequence[Any]]):
+    """Validates the arguments of `DbClient.iter_model` and builds its unordered statement.
+
+    A `load` of `None` falls back to `selectin` since the model defaults may be `joined`, which can't be streamed.
+
+    Raises:
+        ValueError: When `chunk_size` is not a positive integer or `load` can't be streamed.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+    if load is None:
+        load = "selectin"
+    if load in ("joined", "subquery"):
+        raise ValueError(f"The '{load}' loading strategy can't be used when streaming results")
+
+    return _apply_filters(select(model).options(*_loader_options(model, load, defer)), model, where, None)
+
+
+def _keyset(model: Type[SQLModel]) -> Optional[tuple]:
+    """Returns the primary key column of `model` and its attribute name, or `None` for composite keys."""
+    mapper = inspect(model)
+    if len(mapper.primary_key) != 1:
+        return None
+
+    key = mapper.primary_key[0]
+    return key, mapper.get_property_by_column(key).key
+
+
+def _page_statement(statement, key: Any, last_key: Any, chunk_size: int):
+    """Returns the keyset pagination query for the page following `last_key`."""
+    page = statement.order_by(key).limit(chunk_size)
+    if last_key is not None:
+        page = page.where(key > last_key)
+    return page
+
+
+def _yield_chunk(chunk: List[_T], batches: bool) -> Iterator[Union[_T, List[_T]]]:
+    """Yields the chunk as a whole when `batches` is set, and its items otherwise."""
+    if batches:
+        yield list(chunk)
+    else:
+        yield from chunk
+
+
+def _timed(operation: str):
+    """Records the duration of a `DbClient` method to the client's metrics sink, when it has one."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self._metrics is None:
+                return method(self, *args, **kwargs)
+
+            tags = {"operation": operation}
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            except Exception:
+                self._metrics.increment("db_client_errors_total", 1, tags)
+                raise
+            finally:
+                self._metrics.timing("db_client_duration_seconds", time.perf_counter() - start, tags)
+
+        return wrapper
+    return decorator
+
+
 class DbClient():
-    def __init__(self, url: str, echo=False):
+    def __init__(
+            self, url: str, echo=False, pool_size: Optional[int] = None, max_overflow: Optional[int] = None,
+            pool_recycle: Optional[int] = None, pool_pre_ping: bool = False, pool_timeout: Optional[float] = None,
+            share_engine: bool = True, sqlite_pragmas: Optional[Union[str, Dict[str, Any]]] = None,
+            metrics: Optional[MetricsSink] = None, slow_query_threshold: Optional[float] = None):
         """Creates a `DbClient`
 
+        Clients created with the same url and engine options share one engine, and therefore one connection pool,
+        per process unless `share_engine` is `False`. Call `close` (or use the client as a context manager) to
+        release the engine; it is disposed once the last client using it is closed.
+
         Args:
             url (str): The database url.
             echo (bool): Whether to print `sqlmodel` output to the console.
+            pool_size (int, optional): The number of connections kept open in the pool.
+            max_overflow (int, optional): The number of connections allowed above `pool_size`.
+            pool_recycle (int, optional): The number of seconds after which a connection is replaced, this should
+                be lower than the server's `wait_timeout` for mysql.
+            pool_pre_ping (bool): Whether to test connections for liveness when they are checked out.
+            pool_timeout (float, optional): The number of seconds to wait for a connection from the pool.
+            share_engine (bool): Whether to share the engine with other clients using the same url and options.
+            sqlite_pragmas (Union[str, Dict[str, Any]], optional): The name of a preset in `SQLITE_PRAGMA_PRESETS`
+                or the pragmas to apply to every new sqlite connection, i.e., `{"journal_mode": "WAL"}`.
+            metrics (MetricsSink, optional): The sink to record the duration of the client's operations to, as
+                `db_client_duration_seconds` labelled with the `operation`, and the engine's metrics, refer to
+                `metrics.instrument_engine`. A shared engine records the statements of every client using it.
+            slow_query_threshold (float, optional): The duration in seconds above which statements are logged as a
+                warning, when `metrics` is provided.
 
         Returns:
             An instance of DbClient connected to the database.
 
         Raises:
+            ValueError: When `sqlite_pragmas` is not a known preset or contains invalid pragmas.
             Operational Error: When failing to connect to the database.
             Exception: When failing to create a `sqlmodel` engine.
         """
+        engine_options = _pool_options(pool_size, max_overflow, pool_recycle, pool_pre_ping, pool_timeout)
+
+        if sqlite_pragmas is not None:
+            sqlite_pragmas = _resolve_sqlite_pragmas(sqlite_pragmas)
+
+        self._engine_key = None
+        self._metrics = metrics
         try:
-            logging.debug(f"Attempting to connect to: {url}")
+            logging.debug("Attempting to connect to: %s", url)
+
+            self._engine_key = _acquire_engine(url, echo, engine_options, share_engine, sqlite_pragmas)
+            self._engine = _engines[self._engine_key]
+            if metrics is not None:
+                instrument_engine(self._engine, metrics, slow_query_threshold)
+        except Exception as e:
+            logging.error("Failed to create engine with error of type: %s", type(e))
+            raise e
 
-            self._engine = create_engine(url, echo=echo)
-            self._engine.connect()
+        try:
+            self._connect()
             logging.debug("Successfully connected to db.")
         except OperationalError as e:
-            logging.error(f"Connection failed: {e}")
-            raise e
-        except Exception as e:
-            logging.error(f"Failed to create engine with error of type: {type(e)}")
+            self.close()
+            logging.error("Connection failed: %s", e)
             raise e
-        # self._sessionmaker = sessionmaker(bind=self._engine)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @_timed("connect")
+    def _connect(self):
+        # check out a connection to verify the database is reachable and return it to the pool
+        with self._engine.connect():
+            pass
+
+    def close(self):
+        """Releases the engine of this client.
+
+        The engine and its pooled connections are disposed once no other client is using it. Closing a client
+        more than once has no effect.
+
+        Returns:
+            None
+        """
+        if self._engine_key is not None:
+            _release_engine(self._engine_key)
+            self._engine_key = None
 
     @classmethod
-    def mysql(cls, connection_string: str, echo=False):
+    def mysql(cls, connection_string: str, echo=False, **engine_options):
         """Create a mysql DbClient.
 
         This is a wrapper around the constructor to simplify creating a mysql client.
@@ -61,12 +605,13 @@ class DbClient():
         Args:
             connection_string (str): The db connection string i.e., `<user>:<password>@<host>:<port>/<database>`.
             echo (bool): Whether to print `sqlmodel` output to the console.
+            **engine_options: Pool options passed to the constructor, i.e., `pool_size` or `pool_recycle`.
         """
         url = f"mysql://{connection_string}"
-        return cls(url, echo)
+        return cls(url, echo, **engine_options)
 
     @classmethod
-    def sqlite(cls, path: str, echo=False):
+    def sqlite(cls, path: str, echo=False, pragmas: Optional[Union[str, Dict[str, Any]]] = None, **engine_options):
         """Create a sqlite DbClient.
 
         This is a wrapper around the constructor to simplify creating a sqlite client,
@@ -75,6 +620,9 @@ class DbClient():
         Args:
             path (str): The path to the sqlite db.
             echo (bool): Whether to print `sqlmodel` output to the console.
+            pragmas (Union[str, Dict[str, Any]], optional): The tuning profile, either a preset (`durable`, `fast`
+                or `bulk-load`) or the pragmas to apply to every new connection. Defaults to sqlite's settings.
+            **engine_options: Pool options passed to the constructor, i.e., `pool_size` or `pool_timeout`.
 
         Returns:
             An instance of DbClient connected to a sqlite database.
@@ -94,26 +642,152 @@ class DbClient():
             raise e
 
         url = f"sqlite:///{path}"
-        return cls(url, echo)
+        return cls(url, echo, sqlite_pragmas=pragmas, **engine_options)
 
-    def create_tables(self):
+    @_timed("create_tables")
+    def create_tables(self, use_cache: bool = True, marker_dir: Optional[str] = None):
         """Creates the database tables
 
         `SQLModel`s need to be imported before calling this function. Refer to:
         https://sqlmodel.tiangolo.com/tutorial/create-db-and-table/#sqlmodel-metadata-order-matters
 
+        Checking which tables exist costs a catalog query per table, so once the tables of the current metadata
+        are verified for an engine later calls are skipped. With `marker_dir` a marker file is also written for the
+        database url and metadata, which lets other processes skip the check as well. Only use markers for
+        databases whose tables are not dropped outside of this package.
+
+        Args:
+            use_cache (bool): Whether to skip the check when the tables were already verified. Defaults to True.
+            marker_dir (str, optional): The directory to keep the marker files in.
+
         Returns:
             None
 
         Raises:
             Exception: When failing to create tables in `sqlmodel` engine.
         """
+        schema_hash = _metadata_hash(SQLModel.metadata)
+        verified = _verified_schemas.setdefault(self._engine, set())
+        marker = None
+        if marker_dir is not None:
+            marker = os.path.join(marker_dir, f"{_schema_marker_name(self._engine, schema_hash)}.verified")
+
+        if use_cache and (schema_hash in verified or (marker is not None and os.path.exists(marker))):
+            logging.debug("Tables were already verified, skipping create_tables.")
+            verified.add(schema_hash)
+            return
+
         try:
             SQLModel.metadata.create_all(self._engine)
         except Exception as e:
-            logging.error(f"Failed to create tables: {type(e)}")
+            logging.error("Failed to create tables: %s", type(e))
             raise e
 
+        verified.add(schema_hash)
+        if marker is not None:
+            try:
+                os.makedirs(marker_dir, exist_ok=True)
+                open(marker, "w").close()
+            except OSError as e:
+                logging.warning("Failed to write schema marker %s: %s", marker, e)
+
+    @_timed("ensure_indexes")
+    def ensure_indexes(self, metadata: Optional[MetaData] = None) -> List[str]:
+        """Creates the indexes of the metadata that are missing from existing tables.
+
+        `create_tables` only creates missing tables, so indexes added to a model after its table was created are
+        never created. This adds them without rebuilding the table. Tables that don't exist are skipped, and so are
+        indexes on the same columns as an existing index under another name, e.g. the index mysql creates for a
+        foreign key, unless only the missing one is unique.
+
+        Args:
+            metadata (MetaData, optional): The metadata to read the indexes from. Defaults to `SQLModel.metadata`.
+
+        Returns:
+            List[str]: The names of the indexes that were created.
+
+        Raises:
+            Exception: When failing to create an index.
+        """
+        metadata = metadata if metadata is not None else SQLModel.metadata
+        inspector = inspect(self._engine)
+
+        created = []
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing = inspector.get_indexes(table.name)
+            names = {index["name"] for index in existing}
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name in names:
+                    continue
+                columns = [column.name for column in index.columns]
+                equivalent = next((
+                    other["name"] for other in existing
+                    if other["column_names"] == columns and (other["unique"] or not index.unique)
+                ), None)
+                if equivalent is not None:
+                    logging.debug("Skipped index %s, %s has the same columns", index.name, equivalent)
+                    continue
+                try:
+                    index.create(self._engine)
+                except Exception as e:
+                    logging.error("Failed to create index %s: %s", index.name, type(e))
+                    raise e
+                logging.debug("Created index %s", index.name)
+                created.append(index.name)
+
+        return created
+
+    def migrate_payload_columns(self, metadata: Optional[MetaData] = None) -> List[str]:
+        """Converts the text columns of existing tables that the models now store as a `CompressedPayload`.
+
+        `create_tables` never alters existing columns, so databases created before `JobStatus.job_summary_data` and
+        `ReportData.report_data` were switched to `CompressedPayload` still have them as `VARCHAR`, which mysql and
+        postgresql refuse binary payloads in. This converts them in place, to `MEDIUMBLOB` on mysql and `BYTEA` on
+        postgresql, keeping the stored text, which is still read. Sqlite stores the payloads in any column, so
+        nothing is converted there. Converting a column rewrites and locks its table while it runs.
+
+        Args:
+            metadata (MetaData, optional): The metadata to read the columns from. Defaults to `SQLModel.metadata`.
+
+        Returns:
+            List[str]: The `table.column` names of the converted columns.
+
+        Raises:
+            NotImplementedError: When a column needs converting on a database other than mysql and postgresql.
+            Exception: When failing to convert a column.
+        """
+        metadata = metadata if metadata is not None else SQLModel.metadata
+        dialect = self._engine.dialect
+        if dialect.name == "sqlite":
+            return []
+
+        inspector = inspect(self._engine)
+        converted = []
+        for table in metadata.sorted_tables:
+            payload_columns = [column for column in table.columns if isinstance(column.type, CompressedPayload)]
+            if not payload_columns or not inspector.has_table(table.name):
+                continue
+
+            existing = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+            for column in payload_columns:
+                if not isinstance(existing.get(column.name), String):
+                    continue
+                statement = _payload_column_ddl(dialect, table, column)
+                try:
+                    with self._engine.begin() as connection:
+                        connection.exec_driver_sql(statement)
+                except Exception as e:
+                    logging.error("Failed to convert column %s.%s: %s", table.name, column.name, type(e))
+                    raise e
+                logging.info("Converted column %s.%s to a binary payload", table.name, column.name)
+                converted.append(f"{table.name}.{column.name}")
+
+        return converted
+
+    @_timed("insert_data")
     def insert_data(self, model: _T) -> _T:
         """Insert model into database.
 
@@ -135,25 +809,147 @@ class DbClient():
             try:
                 session.add(model)
                 session.commit()
-                logging.debug(f"Data inserted successfully for {model.__tablename__}")
+                if logging.getLogger().isEnabledFor(logging.DEBUG):
+                    logging.debug("Data inserted successfully for %s", model.__tablename__)
 
                 return model
             except IntegrityError as e:
                 # Rollback the session in case of any integrity error
                 session.rollback()
-                logging.error(f"Integrity Error: {str(e)}")
+                logging.error("Integrity Error: %s", e)
                 raise e
             except Exception as e:
                 # Rollback the session in case of any other error
                 session.rollback()
-                logging.error(f"Error inserting data: {str(e)}")
+                logging.error("Error inserting data: %s", e)
                 raise e
 
-    def query_model(self, model: Type[_T]) -> List[_T]:
+    @_timed("insert_many")
+    def insert_many(self, models: Iterable[_T], batch_size: int = 1000, return_defaults: bool = False) -> List[_T]:
+        """Insert many models into the database using one transaction per batch.
+
+        Rows are written with a single multi-row `executemany` per batch and table instead of one
+        transaction per model. Each batch is committed on its own; when a batch fails it is rolled back,
+        batches committed before it are kept, and the error is raised. A batch where a model holds related
+        models, e.g. a `JobStatus` with `report_data`, is flushed through the ORM unit of work as with
+        `return_defaults` so the related models are written as well.
+
+        Args:
+            models (Iterable[SQLModel]): The models to insert into the database.
+            batch_size (int): The number of models written per transaction. Defaults to 1000.
+            return_defaults (bool): Whether to populate the generated primary keys and server defaults on the
+                provided models. This is slower since the rows are flushed through the ORM unit of work, which
+                fetches the keys with `RETURNING` where the database supports it. Defaults to `False`.
+
+        Returns:
+            The inserted entries.
+
+        Raises:
+            ValueError: When `batch_size` is not a positive integer.
+            IntegrityError: When a batch violates a database constraint.
+            Exception: When failing to insert a batch.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        inserted = []
+        with Session(self._engine, expire_on_commit=False) as session:
+            for batch in _chunked(models, batch_size):
+                try:
+                    if return_defaults or any(_has_related(model) for model in batch):
+                        session.add_all(batch)
+                    else:
+                        for (table, _), rows in _rows_by_table(batch).items():
+                            session.execute(insert(table), rows)
+                    session.commit()
+                    inserted.extend(batch)
+                    if logging.getLogger().isEnabledFor(logging.DEBUG):
+                        logging.debug("Inserted batch of %d models", len(batch))
+                except IntegrityError as e:
+                    # Rollback the failed batch, previously committed batches are kept
+                    session.rollback()
+                    logging.error("Integrity Error: %s", e)
+                    raise e
+                except Exception as e:
+                    session.rollback()
+                    logging.error("Error inserting data: %s", e)
+                    raise e
+
+        return inserted
+
+    @_timed("upsert")
+    def upsert(
+            self, models: Iterable[SQLModel], conflict_keys: Optional[Sequence[str]] = None,
+            update_columns: Optional[Sequence[str]] = None, batch_size: int = 1000) -> int:
+        """Insert models into the database, updating the existing rows they conflict with.
+
+        Uses `INSERT ... ON CONFLICT DO UPDATE` on sqlite and postgresql and `INSERT ... ON DUPLICATE KEY UPDATE` on
+        mysql, written with one `executemany` per batch and transaction. Other databases fall back to merging the
+        models one at a time. Only the columns of the models are written, not their related models.
+
+        Args:
+            models (Iterable[SQLModel]): The models to insert or update.
+            conflict_keys (Sequence[str], optional): The columns identifying an existing row, which need a primary
+                key or unique constraint. Defaults to the primary key. Mysql always uses every unique constraint.
+            update_columns (Sequence[str], optional): The columns to update on conflict. Defaults to all the
+                provided columns except the `conflict_keys`. When empty, conflicting models are skipped.
+            batch_size (int): The number of models written per transaction. Defaults to 1000.
+
+        Returns:
+            int: The number of models written.
+
+        Raises:
+            ValueError: When `batch_size` is not a positive integer, or a model holds related models.
+            IntegrityError: When a batch violates a database constraint.
+            Exception: When failing to write a batch.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        dialect = self._engine.dialect.name
+        written = 0
+        with Session(self._engine, expire_on_commit=False) as session:
+            for batch in _chunked(models, batch_size):
+                try:
+                    if dialect in _UPSERT_DIALECTS:
+                        if any(_has_related(model) for model in batch):
+                            raise ValueError("upsert does not write related models, insert or update them separately")
+                        for (table, columns), rows in _rows_by_table(batch).items():
+                            statement = _upsert_statement(dialect, table, columns, conflict_keys, update_columns)
+                            session.execute(statement, rows)
+                    else:
+                        for model in batch:
+                            session.merge(model)
+                    session.commit()
+                    written += len(batch)
+                    if logging.getLogger().isEnabledFor(logging.DEBUG):
+                        logging.debug("Upserted batch of %d models", len(batch))
+                except IntegrityError as e:
+                    session.rollback()
+                    logging.error("Integrity Error: %s", e)
+                    raise e
+                except Exception as e:
+                    session.rollback()
+                    logging.error("Error upserting data: %s", e)
+                    raise e
+
+        return written
+
+    @_timed("query_model")
+    def query_model(self, model: Type[_T], load: Optional[str] = None, defer: Optional[Sequence[Any]] = None
+                    ) -> List[_T]:
         """Queries the database for the provided `model`.
 
+        Relationships are loaded as configured on the model unless `load` is provided. Deferred columns are not
+        selected; the returned models are detached from their session so reading a deferred column raises
+        `DetachedInstanceError`, load it with `load_column` instead.
+
         Args:
             model (Type[SQLModel]): The model class definition.
+            load (str, optional): The relationship loading strategy, i.e., `noload`, `selectin`, `subquery`,
+                or `joined`. Defaults to the strategy configured on the model.
+            defer (Sequence, optional): Attribute names of large columns to leave out, i.e., `["job_summary_data"]`,
+                or columns of related models, i.e., `[ReportData.report_data]`.
 
         Returns:
             list (List[SQLModel]): A list of all models.
@@ -165,14 +961,158 @@ class DbClient():
             # mapper = inspect(model_class)
             # columns = [column.key for column in mapper.columns]
             # return [{column: getattr(result, column) for column in columns} for result in results]
-            statement = select(model)
+            statement = select(model).options(*_loader_options(model, load, defer))
             results = session.exec(statement).unique()
             for entry in results:
                 models.append(entry)
 
             return models
 
+    @_timed("query")
+    def query(
+            self, model: Type[_T], columns: Optional[Sequence[Any]] = None, where: Optional[Sequence[Any]] = None,
+            filter_by: Optional[Dict[str, Any]] = None, order_by: Optional[Sequence[Any]] = None,
+            group_by: Optional[Sequence[Any]] = None, limit: Optional[int] = None, offset: Optional[int] = None,
+            as_dict: bool = False, load: Optional[str] = None, defer: Optional[Sequence[Any]] = None
+    ) -> List[Any]:
+        """Queries the database for the provided `model`, filtering, ordering and projecting in SQL.
+
+        Without `columns` the matching models are returned. With `columns` only those columns are selected and
+        each result is a lightweight named tuple (or a dictionary when `as_dict` is set), so relationships and
+        unused columns are never loaded. Aggregates can be selected with `group_by`, for example
+        `columns=[JobStatus.level, func.count()]` and `group_by=[JobStatus.level]`.
+
+        Args:
+            model (Type[SQLModel]): The model class definition.
+            columns (Sequence, optional): Attribute names or column expressions to select.
+            where (Sequence, optional): Filter expressions, i.e., `[JobStatus.script_start_time >= since]`.
+            filter_by (Dict[str, Any], optional): Equality filters, i.e., `{"script_name": "etl.py"}`.
+            order_by (Sequence, optional): Attribute names or order expressions.
+            group_by (Sequence, optional): Attribute names or expressions to group the results by.
+            limit (int, optional): The maximum number of results to return.
+            offset (int, optional): The number of results to skip.
+            as_dict (bool): Whether to return projected results as dictionaries instead of tuples.
+            load (str, optional): The relationship loading strategy when returning models, refer to `query_model`.
+            defer (Sequence, optional): Attribute names of columns to defer when returning models, refer to
+                `load_column`.
+
+        Returns:
+            list (List): A list of models, or of tuples/dictionaries when `columns` is provided.
+        """
+        statement = _query_statement(model, columns, where, filter_by, order_by, group_by, limit, offset, load, defer)
+        with Session(self._engine) as session:
+            if not columns:
+                return list(session.exec(statement).unique())
+
+            rows = session.execute(statement).all()
+            if as_dict:
+                return [row._asdict() for row in rows]
+            return rows
+
+    @_timed("load_column")
+    def load_column(self, instance: SQLModel, column: Any) -> Any:
+        """Loads a column of a model returned by a query, typically a deferred one.
+
+        The value is selected by the primary key of `instance`, decoded by the column type, e.g. a
+        `CompressedPayload`, and set on `instance` without marking it as modified, so the attribute can then be
+        read from the detached model.
+
+        For example:
+
+            jobs = db_client.query_model(JobStatus, defer=["job_summary_data"])
+            summary = db_client.load_column(jobs[0], "job_summary_data")
+
+        Args:
+            instance (SQLModel): A model with its primary key set.
+            column (Any): The attribute name or attribute of the column.
+
+        Returns:
+            Any: The value of the column.
+
+        Raises:
+            ValueError: When `instance` has no primary key value.
+            NoResultFound: When the row of `instance` no longer exists.
+        """
+        statement, key = _column_statement(instance, column)
+        with Session(self._engine) as session:
+            value = session.execute(statement).scalar_one()
+
+        set_committed_value(instance, key, value)
+        return value
+
+    @_timed("count")
+    def count(self, model: Type[SQLModel], where: Optional[Sequence[Any]] = None,
+              filter_by: Optional[Dict[str, Any]] = None) -> int:
+        """Counts the entries of the provided `model` in the database.
+
+        Args:
+            model (Type[SQLModel]): The model class definition.
+            where (Sequence, optional): Filter expressions, i.e., `[JobStatus.level == "ERROR"]`.
+            filter_by (Dict[str, Any], optional): Equality filters, i.e., `{"script_name": "etl.py"}`.
+
+        Returns:
+            int: The number of matching entries.
+        """
+        statement = _count_statement(model, where, filter_by)
+        with Session(self._engine) as session:
+            return session.execute(statement).scalar_one()
+
+    def iter_model(
+            self, model: Type[_T], chunk_size: int = 1000, where: Optional[Sequence[Any]] = None,
+            order_by: Optional[Sequence[Any]] = None, batches: bool = False, load: Optional[str] = "selectin",
+            defer: Optional[Sequence[Any]] = None
+    ) -> Iterator[Union[_T, List[_T]]]:
+        """Lazily queries the database for the provided `model`.
+
+        Unlike `query_model`, rows are fetched `chunk_size` at a time so memory stays bounded no matter how large
+        the table is. Without `order_by` the rows are paged with keyset pagination on the primary key, which keeps
+        every query short and does not hold a cursor open between chunks. With `order_by` the rows are streamed
+        through a server-side cursor instead.
+
+        Relationships, including the ones configured with `lazy="joined"`, are loaded with `selectinload` per
+        chunk by default, so the rows don't need to be de-duplicated in memory.
+
+        Args:
+            model (Type[SQLModel]): The model class definition.
+            chunk_size (int): The number of rows fetched per round-trip. Defaults to 1000.
+            where (Sequence, optional): Filter expressions, i.e., `[JobStatus.level == "ERROR"]`.
+            order_by (Sequence, optional): Order expressions, i.e., `[JobStatus.script_start_time.desc()]`.
+            batches (bool): Whether to yield lists of up to `chunk_size` models instead of single models.
+            load (str, optional): The relationship loading strategy, `joined` and `subquery` can't be streamed.
+                Defaults to `selectin`, which is also used when `None` is passed.
+            defer (Sequence, optional): Attribute names of columns to defer.
+
+        Returns:
+            Iterator: An iterator over the models, or over lists of models when `batches` is set.
+
+        Raises:
+            ValueError: When `chunk_size` is not a positive integer or `load` can't be streamed.
+        """
+        statement = _stream_statement(model, chunk_size, where, load, defer)
+        keyset = None if order_by else _keyset(model)
+        with Session(self._engine) as session:
+            if keyset is None:
+                statement = statement.order_by(*(order_by or inspect(model).primary_key)).execution_options(
+                    yield_per=chunk_size)
+                for partition in session.exec(statement).partitions():
+                    yield from _yield_chunk(partition, batches)
+                return
+
+            key, attribute = keyset
+            last_key = None
+            while True:
+                chunk = session.exec(_page_statement(statement, key, last_key, chunk_size)).all()
+                if not chunk:
+                    return
+
+                yield from _yield_chunk(chunk, batches)
+
+                if len(chunk) < chunk_size:
+                    return
+                last_key = getattr(chunk[-1], attribute)
+
     @deprecated(version="2.1.1", reason="Use insert_data instead. This function will soon be removed")
+    @_timed("update_model")
     def update_model(self, model: _T, values: dict, pk_field: str = "id") -> _T:
         """Update model with values provided
 
@@ -204,5 +1144,5 @@ class DbClient():
             except Exception as e:
                 # Rollback the session in case of any other error
                 session.rollback()
-                logging.error(f"Error updating data: {str(e)}")
+                logging.error("Error updating data: %s", e)
                 raise e
@@ -0,0 +1,197 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from . import serializers
+from .models import JobStatus, JobStatusLevels, JobTiming, ReportData
+from .orm import DbClient, convert_model_to_dict
+from sqlalchemy import and_, delete, or_, text
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+from typing import Dict, List, Optional, Sequence, Union
+
+import gzip
+import logging
+import os
+import time
+
+
+@dataclass
+class RetentionPolicy():
+    """How long `JobStatus` rows are kept.
+
+    A policy applies to the rows matching its `script_name` and `level`, or to every row when neither is set. When
+    several policies match a row the most specific one wins, so a policy keeping `ERROR` rows for a year is not
+    overridden by a general policy keeping rows for a month. Between matching policies that are equally specific,
+    e.g. one for `sync.py` and one for `ERROR` rows, the one keeping the rows longest wins.
+    """
+    max_age: timedelta
+    script_name: Optional[str] = None
+    level: Optional[Union[JobStatusLevels, str]] = None
+    archive: bool = True
+
+    def _scope(self) -> list:
+        scope = []
+        if self.script_name is not None:
+            scope.append((JobStatus.script_name, self.script_name))
+        if self.level is not None:
+            scope.append((JobStatus.level, JobStatusLevels(self.level)))
+        return scope
+
+    def _is_narrower_than(self, other: "RetentionPolicy") -> bool:
+        scope = {str(column): value for column, value in self._scope()}
+        other_scope = {str(column): value for column, value in other._scope()}
+        return len(scope) > len(other_scope) and other_scope.items() <= scope.items()
+
+    def _takes_precedence_over(self, other: "RetentionPolicy") -> bool:
+        """Whether this policy decides the age of the rows matched by both policies."""
+        if self._is_narrower_than(other):
+            return True
+        if other._is_narrower_than(self):
+            return False
+
+        scope = {str(column): value for column, value in self._scope()}
+        other_scope = {str(column): value for column, value in other._scope()}
+        if any(other_scope.get(key, value) != value for key, value in scope.items()):
+            # the policies never match the same row
+            return False
+        return self.max_age > other.max_age
+
+
+@dataclass
+class RetentionResult():
+    """The outcome of `purge_job_status`.
+
+    `rollup` maps `(script_name, level, date)` to the number of purged runs and their total elapsed time.
+    """
+    deleted: int = 0
+    archives: List[str] = field(default_factory=list)
+    rollup: Dict[tuple, Dict[str, int]] = field(default_factory=dict)
+
+
+def purge_job_status(
+        db_client: DbClient, policies: Sequence[RetentionPolicy], batch_size: int = 500,
+        archive_dir: Optional[str] = None, vacuum: bool = False, pause: float = 0,
+        now: Optional[datetime] = None) -> RetentionResult:
+    """Deletes the `JobStatus` rows, and their `ReportData` and `JobTiming`, that are older than their retention policy.
+
+    Rows are deleted in batches of `batch_size`, each in its own short transaction, so writers are never locked out
+    for long. Rows of policies with `archive` set are first appended to a gzip compressed JSON lines file in
+    `archive_dir`, one line per `JobStatus` including its `report_data` and `timings`.
+
+    Args:
+        db_client (DbClient): The database client of the log database.
+        policies (Sequence[RetentionPolicy]): The retention policies to apply.
+        batch_size (int): The number of rows deleted per transaction. Defaults to 500.
+        archive_dir (str, optional): The directory to archive expired rows to. Nothing is archived when omitted.
+        vacuum (bool): Whether to reclaim the freed space afterwards with `VACUUM` on sqlite and postgresql or
+            `OPTIMIZE TABLE` on mysql. This locks the tables while it runs.
+        pause (float): The number of seconds to sleep between batches to leave room for other writers.
+        now (datetime, optional): The time the ages are computed from. Defaults to the current UTC time.
+
+    Returns:
+        RetentionResult: The number of deleted rows, the archive files written and a rollup of the deleted rows.
+
+    Raises:
+        ValueError: When `batch_size` is not a positive integer.
+        Exception: When failing to archive or delete a batch.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+
+    now = now or datetime.now(timezone.utc)
+    result = RetentionResult()
+    archive = None
+    if archive_dir is not None and any(policy.archive for policy in policies):
+        os.makedirs(archive_dir, exist_ok=True)
+        archive_path = os.path.join(archive_dir, f"job_status-{now.strftime('%Y%m%dT%H%M%S')}.jsonl.gz")
+        archive = gzip.open(archive_path, "ab")
+        result.archives.append(archive_path)
+
+    try:
+        with Session(db_client._engine) as session:
+            for policy in policies:
+                expired = _expired_condition(policy, policies, now)
+                while True:
+                    statement = select(JobStatus).where(expired).order_by(JobStatus.id).limit(batch_size)
+                    statement = statement.options(selectinload(JobStatus.report_data), selectinload(JobStatus.timings))
+                    batch = session.exec(statement).unique().all()
+                    if not batch:
+                        break
+
+                    if archive is not None and policy.archive:
+                        _archive_batch(archive, batch)
+                    _rollup_batch(result.rollup, batch)
+
+                    ids = [job_status.id for job_status in batch]
+                    try:
+                        session.execute(delete(ReportData).where(ReportData.job_status_id.in_(ids)))
+                        session.execute(delete(JobTiming).where(JobTiming.job_status_id.in_(ids)))
+                        session.execute(delete(JobStatus).where(JobStatus.id.in_(ids)))
+                        session.commit()
+                    except Exception as e:
+                        session.rollback()
+                        logging.error("Failed to purge job status batch: %s", e)
+                        raise e
+
+                    session.expunge_all()
+                    result.deleted += len(ids)
+                    if logging.getLogger().isEnabledFor(logging.DEBUG):
+                        logging.debug("Purged %d job status rows", len(ids))
+                    if len(batch) < batch_size:
+                        break
+                    time.sleep(pause)
+    finally:
+        if archive is not None:
+            archive.close()
+
+    if vacuum and result.deleted:
+        _reclaim_space(db_client)
+
+    return result
+
+
+def _expired_condition(policy: RetentionPolicy, policies: Sequence[RetentionPolicy], now: datetime):
+    """Builds the condition matching the rows `policy` expires, leaving out the rows of policies overriding it."""
+    conditions = [JobStatus.script_start_time < now - policy.max_age]
+    conditions.extend(column == value for column, value in policy._scope())
+
+    for other in policies:
+        if other._takes_precedence_over(policy):
+            # NOT (a AND b) that also keeps the rows where a column is NULL
+            conditions.append(or_(*(or_(column.is_(None), column != value) for column, value in other._scope())))
+
+    return and_(*conditions)
+
+
+def _archive_batch(archive, batch: List[JobStatus]):
+    for job_status in batch:
+        record = convert_model_to_dict(job_status)
+        record["report_data"] = [convert_model_to_dict(report) for report in job_status.report_data]
+        record["timings"] = [convert_model_to_dict(timing) for timing in job_status.timings]
+        archive.write(serializers.dumps(record) + b"\n")
+
+
+def _rollup_batch(rollup: Dict[tuple, Dict[str, int]], batch: List[JobStatus]):
+    for job_status in batch:
+        level = job_status.level.value if job_status.level is not None else None
+        date = job_status.script_start_time.date().isoformat() if job_status.script_start_time else None
+        totals = rollup.setdefault((job_status.script_name, level, date), {"runs": 0, "elapsed_time": 0})
+        totals["runs"] += 1
+        totals["elapsed_time"] += job_status.elapsed_time or 0
+
+
+def _reclaim_space(db_client: DbClient):
+    dialect = db_client._engine.dialect.name
+    statements = {
+        "mysql": ["OPTIMIZE TABLE job_status, report_data, job_timing"],
+        "postgresql": ["VACUUM ANALYZE job_status", "VACUUM ANALYZE report_data", "VACUUM ANALYZE job_timing"],
+        "sqlite": ["VACUUM"],
+    }.get(dialect)
+    if statements is None:
+        logging.debug("Reclaiming space is not supported for %s", dialect)
+        return
+
+    # VACUUM can't run inside a transaction
+    with db_client._engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        for statement in statements:
+            connection.execute(text(statement))
@@ -0,0 +1,246 @@
+from contextlib import ContextDecorator
+from datetime import datetime
+from .background_writer import BackgroundWriter
+from .models import JobStatus, JobStatusLevels, JobTiming
+from .orm import DbClient
+from typing import Any, Dict, List, Optional
+
+import cProfile
+import getpass
+import pytz
+import os
+import pstats
+import socket
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+def _peak_rss() -> Optional[int]:
+    """Returns the peak resident memory of the process in bytes, or None when it can't be measured."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _Phase(ContextDecorator):
+    """Times a phase of a job for `ScriptHelper.phase`."""
+
+    def __init__(self, helper: "ScriptHelper", name: str, trace_memory: bool, profile: bool, profile_limit: int):
+        self._helper = helper
+        self._name = name
+        self._trace_memory = trace_memory
+        self._profile = profile
+        self._profile_limit = profile_limit
+
+    def _recreate_cm(self):
+        # each call of a decorated function, possibly nested or concurrent, gets its own timer
+        return _Phase(self._helper, self._name, self._trace_memory, self._profile, self._profile_limit)
+
+    def __enter__(self):
+        # the peak of tracemalloc is global, resetting it for a nested phase would lose the peak of the outer one
+        if self._trace_memory and self._helper._tracing_memory:
+            raise RuntimeError(f"Phase '{self._name}' can't trace memory while another traced phase is running")
+        # enabling a profiler silently replaces the one of the outer phase
+        if self._profile and self._helper._profiling:
+            raise RuntimeError(f"Phase '{self._name}' can't be profiled while another profiled phase is running")
+
+        self._profiler = None
+        if self._profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            self._profiler = profiler
+            self._helper._profiling = True
+
+        self._started_tracing = False
+        if self._trace_memory:
+            self._helper._tracing_memory = True
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+            self._traced_start = tracemalloc.get_traced_memory()[0]
+
+        self._started_at = datetime.now(self._helper._tz)
+        self._cpu_start = time.process_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self._start
+        cpu_time = time.process_time() - self._cpu_start
+
+        timing = JobTiming(phase=self._name, started_at=self._started_at, duration=duration, cpu_time=cpu_time,
+                           peak_rss=_peak_rss())
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._helper._profiling = False
+            timing.profile = _profile_summary(self._profiler, self._profile_limit)
+        if self._trace_memory:
+            timing.memory_peak = tracemalloc.get_traced_memory()[1] - self._traced_start
+            if self._started_tracing:
+                tracemalloc.stop()
+            self._helper._tracing_memory = False
+
+        self._helper._timings.append(timing)
+        return False
+
+
+def _profile_summary(profiler: cProfile.Profile, limit: int) -> List[Dict[str, Any]]:
+    """Returns the `limit` functions with the highest cumulative time of a profile."""
+    stats = pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE)
+    summary = []
+    for (filename, line, function) in stats.fcn_list[:limit]:
+        _, calls, total_time, cumulative_time, _ = stats.stats[(filename, line, function)]
+        summary.append({
+            "function": f"{filename}:{line}({function})",
+            "calls": calls,
+            "total_time": total_time,
+            "cumulative_time": cumulative_time,
+        })
+    return summary
+
+
+class ScriptHelper():
+    """A helper class to log `JobStatus`.
+
+    An instance of `ScriptHelper` should be instantiated at the beginning of a script i.e., `helper = ScriptHelper()`,
+    and then used to call `log_failed_job` or `log_successful_job` when the script fails or completes. Internally,
+    `ScriptHelper` automatically captures `start_time`, `end_time`, `executed_by`, and `elapsed_time`, `script_path`,
+    `host`, and provides that information when attempting to log the `JobStatus`. When a `BackgroundWriter` is
+    provided the `JobStatus` is queued and written from a background thread instead, so a slow database does not
+    delay the end of the script.
+
+    The phases of a script can be timed with `phase`; their timings, and the timing of the whole run as the phase
+    `job`, are written as `JobTiming` rows along with the `JobStatus`.
+
+    References:
+    - The structure of `JobStatus` can be seen in `py_custodian/models.py`
+    """
+
+    def __init__(self, script_name: str, db_client: DbClient, tz: pytz.tzinfo.BaseTzInfo = pytz.utc,
+                 writer: Optional[BackgroundWriter] = None, schema_marker_dir: Optional[str] = None):
+        """Creates an instance of ScriptHelper defaulting the timezone to use UTC.
+
+        Args:
+            script_name (str): The name of the script that is creating an instance of this class.
+            db_client (DbClient): The database client to write logs with.
+            tz (pytz.tzinfo.BaseTzInfo, optional): The timezone to use for datetime fields. Defaults to pytz.utc.
+            writer (BackgroundWriter, optional): The writer to queue logs on instead of writing them synchronously.
+            schema_marker_dir (str, optional): The directory of the markers that let later scripts skip checking
+                the log tables exist, refer to `DbClient.create_tables`.
+        """
+        self.__tz = tz
+        self.__start_time = datetime.now(self.__tz)
+        self.__start_counter = time.perf_counter()
+        self.__start_cpu_time = time.process_time()
+        self.__parent_script = script_name
+        self.__executed_by = getpass.getuser()
+        self._timings: List[JobTiming] = []
+        self._tracing_memory = False
+        self._profiling = False
+
+        self._db_client = db_client
+        self._db_client.create_tables(marker_dir=schema_marker_dir)
+        self._writer = writer
+
+    @property
+    def _tz(self) -> pytz.tzinfo.BaseTzInfo:
+        return self.__tz
+
+    def phase(self, name: str, trace_memory: bool = False, profile: bool = False, profile_limit: int = 25):
+        """Times a phase of the script, used as a context manager or a decorator.
+
+        The wall clock duration and CPU time of the phase are measured with monotonic high resolution clocks, along
+        with the peak resident memory of the process. Each run of a phase is recorded, and written as a `JobTiming`
+        when the job is logged.
+
+        For example:
+
+            with helper.phase("download"):
+                download()
+
+            @helper.phase("transform")
+            def transform(rows):
+                ...
+
+        Args:
+            name (str): The name of the phase.
+            trace_memory (bool): Whether to record the peak memory allocated during the phase with `tracemalloc`.
+                This slows down allocations while the phase runs. Phases tracing memory can't be nested, untraced
+                phases can run inside them.
+            profile (bool): Whether to profile the phase with `cProfile`, recording the functions with the highest
+                cumulative time. Profiled phases can't be nested.
+            profile_limit (int): The number of functions recorded from the profile. Defaults to 25.
+
+        Returns:
+            A context manager, also usable as a decorator.
+
+        Raises:
+            ValueError: When the phase is named `job`, which is reserved for the whole run.
+            RuntimeError: On entering a phase tracing memory, or profiled, inside another one.
+        """
+        if name == "job":
+            raise ValueError("The phase name 'job' is reserved for the timing of the whole job")
+        return _Phase(self, name, trace_memory, profile, profile_limit)
+
+    def log_failed_job(self, summary_data: dict, error: str):
+        """Attempt to log a failed `JobStatus` entry to the log database.
+
+        Args:
+            summary_data (Dict): Summary data to capture in the log entry.
+        """
+        job_status = self._get_job_status_of_type(summary_data, error, False)
+        self._write(job_status)
+
+    def log_successful_job(self, summary_data: dict) -> JobStatus:
+        """Attempt to log a successful `JobStatus` entry to the log database.
+
+        Args:
+            summary_data (Dict): Summary data to capture in the log entry.
+        """
+        job_status = self._get_job_status_of_type(summary_data, "", True)
+        self._write(job_status)
+        return job_status
+
+    def _write(self, job_status: JobStatus):
+        if self._writer is not None:
+            self._writer.submit(job_status)
+        else:
+            self._db_client.insert_data(job_status)
+
+    def _get_job_status_of_type(self, summary_data: Dict, error: str, succeeded: bool):
+        level = JobStatusLevels.INFO if succeeded else JobStatusLevels.ERROR
+        end_time = datetime.now(self.__tz)
+        elapsed_time = int((end_time - self.__start_time).total_seconds())
+
+        job_status = JobStatus(
+            executed_by=self.__executed_by,
+            host=socket.gethostname(),
+            script_path=os.path.abspath(self.__parent_script),
+            script_name=self.__parent_script,
+            script_start_time=self.__start_time,
+            script_end_time=end_time,
+            elapsed_time=elapsed_time,
+            job_summary_data={"data": summary_data, "error": error},
+            level=level,
+        )
+
+        job_timing = JobTiming(
+            phase="job",
+            started_at=self.__start_time,
+            duration=time.perf_counter() - self.__start_counter,
+            cpu_time=time.process_time() - self.__start_cpu_time,
+            peak_rss=_peak_rss(),
+        )
+        job_status.timings = [job_timing] + self._timings
+        self._timings = []
+        return job_status
@@ -0,0 +1,142 @@
+from dataclasses import asdict, is_dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from uuid import UUID
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _default(value: Any) -> Any:
+    """Converts the values the JSON backends don't handle natively.
+
+    Args:
+        value (Any): The value to convert.
+
+    Returns:
+        Any: A JSON serializable representation of the value.
+
+    Raises:
+        TypeError: When the value can't be serialized.
+    """
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if is_dataclass(value) and not isinstance(value, type):
+        return asdict(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _orjson_backend() -> Tuple[Callable[[Any], bytes], Callable[[Union[bytes, str]], Any]]:
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    return dumps, orjson.loads
+
+
+def _msgspec_backend() -> Tuple[Callable[[Any], bytes], Callable[[Union[bytes, str]], Any]]:
+    encoder = msgspec.json.Encoder(enc_hook=_default)
+    decoder = msgspec.json.Decoder()
+    return encoder.encode, decoder.decode
+
+
+def _json_backend() -> Tuple[Callable[[Any], bytes], Callable[[Union[bytes, str]], Any]]:
+    encoder = json.JSONEncoder(default=_default, separators=(",", ":"), ensure_ascii=False)
+
+    def dumps(value: Any) -> bytes:
+        return encoder.encode(value).encode("utf-8")
+
+    return dumps, json.loads
+
+
+# The available backends, from fastest to slowest
+_BACKENDS: Dict[str, Callable] = {}
+if orjson is not None:
+    _BACKENDS["orjson"] = _orjson_backend
+if msgspec is not None:
+    _BACKENDS["msgspec"] = _msgspec_backend
+_BACKENDS["json"] = _json_backend
+
+_backend = next(iter(_BACKENDS))
+_dumps, _loads = _BACKENDS[_backend]()
+
+
+def available_backends() -> list:
+    """Returns the names of the installed serializer backends, from fastest to slowest."""
+    return list(_BACKENDS)
+
+
+def get_backend() -> str:
+    """Returns the name of the serializer backend in use."""
+    return _backend
+
+
+def set_backend(name: Optional[str] = None):
+    """Selects the serializer backend used by `dumps` and `loads`.
+
+    Args:
+        name (str, optional): `orjson`, `msgspec` or `json`. Defaults to the fastest installed backend.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: When the backend is unknown or not installed.
+    """
+    global _backend, _dumps, _loads
+
+    name = name or next(iter(_BACKENDS))
+    if name not in _BACKENDS:
+        raise ValueError(f"Serializer backend '{name}' is not available, expected one of {available_backends()}")
+
+    _dumps, _loads = _BACKENDS[name]()
+    _backend = name
+
+
+def dumps(value: Any) -> bytes:
+    """Serializes a value to JSON with the selected backend.
+
+    Besides the JSON types, datetimes, dates and times are written in ISO 8601 format, enums as their value,
+    dataclasses as objects, sets as arrays and decimals and UUIDs as strings.
+
+    Args:
+        value (Any): The value to serialize.
+
+    Returns:
+        bytes: The utf-8 encoded JSON.
+
+    Raises:
+        TypeError: When the value can't be serialized.
+    """
+    return _dumps(value)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Deserializes JSON with the selected backend.
+
+    Args:
+        data (Union[bytes, str]): The JSON to deserialize.
+
+    Returns:
+        Any: The deserialized value.
+    """
+    return _loads(data)
@@ -1,34 +1,39 @@
-from datetime import datetime
-from email.message import EmailMessage
-from email.policy import SMTP
-from .models import JobStatus, JobStatusLevels
-from .orm import DbClient
-from typing import Dict
-
-import getpass
+from typing import Any, Dict
+
+import importlib
 import json
-import pytz
 import os
 import re
-import smtplib
-import socket
 
 
-def _contains_html(content: str) -> bool:
-    """Utility function that checks if the content contains html.
+# The names defined in submodules that import sqlmodel, SQLAlchemy, pytz or the email package, loaded on first access
+# so scripts that only use the file helpers start quickly
+_LAZY_ATTRIBUTES = {
+    "ScriptHelper": "script_helper",
+    "build_email": "emails",
+    "send_email": "emails",
+    "_contains_html": "emails",
+    "BackgroundWriter": "background_writer",
+    "DbClient": "orm",
+    "JobStatus": "models",
+    "JobStatusLevels": "models",
+    "JobTiming": "models",
+    "Mailer": "mailer",
+    "MailSpool": "mail_spool",
+}
 
-    Args:
-        content (str): The content to test for html.
 
-    Returns:
-        bool: Returns True if the content contains html, and False otherwise.
-    """
-    pattern = r"<[^>]*>"
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(f".{_LAZY_ATTRIBUTES[name]}", __package__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    if re.search(pattern, content) is not None:
-        return True
-    else:
-        return False
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
 
 
 def directory_exists(path_to_dir: str) -> bool:
@@ -46,16 +51,21 @@ def directory_exists(path_to_dir: str) -> bool:
         return False
 
 
-def get_unique_filename(path_to_file: str) -> str:
+def get_unique_filename(path_to_file: str, reserve: bool = False) -> str:
     """Get a unique filename.
 
     Checks if the file exists, and if the file exists the function returns a unique
     incremented filename. If the file doesn't exist the function returns the `path_to_file`
     that was provided. For example, if `my_file.pdf` already exists the function will return
-    `my_file (1).pdf`, otherwise `my_file.pdf` is returned.
+    `my_file (1).pdf`, otherwise `my_file.pdf` is returned. The lowest free number is used, found
+    by reading the directory once.
+
+    With `reserve`, the file is created empty before its name is returned, with `O_CREAT | O_EXCL`
+    so that processes looking for a unique filename at the same time never get the same one.
 
     Args:
         path_to_file (str): The path to the file to check.
+        reserve (bool): Whether to create the file to reserve its name. Defaults to False.
 
     Returns:
         (str): A unique filename.
@@ -63,19 +73,37 @@ def get_unique_filename(path_to_file: str) -> str:
     Raises:
         OSError: If there is an error accessing the directory.
     """
-    if not os.path.exists(path_to_file):
+    if reserve:
+        if _reserve_file(path_to_file):
+            return path_to_file
+    elif not os.path.exists(path_to_file):
         return path_to_file
 
     name, extension = os.path.splitext(path_to_file)
+    directory, base = os.path.split(name)
+    pattern = re.compile(rf"{re.escape(base)} \(([1-9][0-9]*)\){re.escape(extension)}")
+    with os.scandir(directory or os.curdir) as entries:
+        taken = {int(match.group(1)) for entry in entries if (match := pattern.fullmatch(entry.name))}
 
     count = 1
+    while True:
+        while count in taken:
+            count += 1
 
-    new_filename = f'{name} ({count}){extension}'
-    while os.path.exists(new_filename):
-        count += 1
         new_filename = f'{name} ({count}){extension}'
+        if not reserve or _reserve_file(new_filename):
+            return new_filename
+        # created by another process since the directory was read
+        taken.add(count)
 
-    return new_filename
+
+def _reserve_file(path_to_file: str) -> bool:
+    """Creates an empty file, returning False if it already exists."""
+    try:
+        os.close(os.open(path_to_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+    except FileExistsError:
+        return False
+    return True
 
 
 def is_python_file(filename: str) -> bool:
@@ -95,110 +123,26 @@ def is_python_file(filename: str) -> bool:
     return False
 
 
-def send_email(
-        host: str, sender: str, recipients: list[str], subject: str, body: str,
-        *file: str, output=None):
-    """Sends an email using smtp.ufl.edu.
+def read_job_summary(job_summary_data: Any) -> Dict[str, Any]:
+    """Reads the `job_summary_data` of a `JobStatus` logged by `ScriptHelper`.
+
+    Rows logged by earlier versions of `ScriptHelper` stored the summary as JSON text with the `data` JSON-encoded
+    a second time. Both those and current rows are returned as `{"data": <summary data>, "error": <error>}`.
 
     Args:
-        host (str): The name of the remote host to which to connect.
-        sender (str): The sender of the email, i.e., the "From" field.
-        recipients (list[str]): The recipients to send the emails to.
-        subject (str): The subject line of the email.
-        body (str | None): The body of the email.
-        *file (str): The path(s) to the file(s) to send as an attachment.
-        output:
+        job_summary_data (Any): The `job_summary_data` of a `JobStatus`.
 
     Returns:
-        None
+        Dict[str, Any]: The summary data and error.
     """
-    msg = EmailMessage()
-    msg["Subject"] = subject
-    msg["From"] = sender
-    msg["To"] = ", ".join(recipients)
+    if job_summary_data is None:
+        return {"data": None, "error": ""}
 
-    if _contains_html(body):
-        msg.set_content(body, subtype='html')
-    else:
-        msg.set_content(body)
-
-    if file:
-        for f in file:
-            with open(f, "rb") as file_obj:
-                msg.add_attachment(
-                    file_obj.read(), maintype="text",
-                    subtype="plain", filename=os.path.basename(f)
-                )
-
-    if output:
-        with open(output, "wb") as fp:
-            fp.write(msg.as_bytes(policy=SMTP))
-    else:
-        with smtplib.SMTP(host) as server:
-            server.send_message(msg)
+    if not isinstance(job_summary_data, str):
+        return job_summary_data
 
+    summary = json.loads(job_summary_data)
+    if isinstance(summary.get("data"), str):
+        summary["data"] = json.loads(summary["data"])
 
-class ScriptHelper():
-    """A helper class to log `JobStatus`.
-
-    An instance of `ScriptHelper` should be instantiated at the beginning of a script i.e., `helper = ScriptHelper()`,
-    and then used to call `log_failed_job` or `log_successful_job` when the script fails or completes. Internally,
-    `ScriptHelper` automatically captures `start_time`, `end_time`, `executed_by`, and `elapsed_time`, `script_path`,
-    `host`, and provides that information when attempting to log the `JobStatus`
-
-    References:
-    - The structure of `JobStatus` can be seen in `py_custodian/models.py`
-    """
-
-    def __init__(self, script_name: str, db_client: DbClient, tz: pytz.tzinfo.BaseTzInfo = pytz.utc):
-        """Creates an instance of ScriptHelper defaulting the timezone to use UTC.
-
-        Args:
-            script_name (str): The name of the script that is creating an instance of this class.
-            db_client (DbClient): The database client to write logs with.
-            tz (pytz.tzinfo.BaseTzInfo, optional): The timezone to use for datetime fields. Defaults to pytz.utc.
-        """
-        self.__tz = tz
-        self.__start_time = datetime.now(self.__tz)
-        self.__parent_script = script_name
-        self.__executed_by = getpass.getuser()
-
-        self._db_client = db_client
-        self._db_client.create_tables()
-
-    def log_failed_job(self, summary_data: dict, error: str):
-        """Attempt to log a failed `JobStatus` entry to the log database.
-
-        Args:
-            summary_data (Dict): Summary data to capture in the log entry.
-        """
-        job_status = self._get_job_status_of_type(summary_data, error, False)
-        self._db_client.insert_data(job_status)
-
-    def log_successful_job(self, summary_data: dict) -> JobStatus:
-        """Attempt to log a successful `JobStatus` entry to the log database.
-
-        Args:
-            summary_data (Dict): Summary data to capture in the log entry.
-        """
-        job_status = self._get_job_status_of_type(summary_data, "", True)
-        self._db_client.insert_data(job_status)
-        return job_status
-
-    def _get_job_status_of_type(self, summary_data: Dict, error: str, succeeded: bool):
-        level = JobStatusLevels.INFO if succeeded else JobStatusLevels.ERROR
-        end_time = datetime.now(self.__tz)
-        elapsed_time = int((end_time - self.__start_time).total_seconds())
-
-        job_status = JobStatus(
-            executed_by=self.__executed_by,
-            host=socket.gethostname(),
-            script_path=os.path.abspath(self.__parent_script),
-            script_name=self.__parent_script,
-            script_start_time=self.__start_time,
-            script_end_time=end_time,
-            elapsed_time=elapsed_time,
-            job_summary_data=json.dumps({"data": json.dumps(summary_data), "error": error}),
-            level=level,
-        )
-        return job_status
+    return summary
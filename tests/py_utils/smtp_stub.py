@@ -0,0 +1,75 @@
+import socketserver
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+
+        self._reply("220 stub ESMTP")
+        envelope = {}
+        sent = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command[:4].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self._reply("250 stub")
+            elif verb == "MAIL":
+                envelope = {"sender": command[10:].strip("<> "), "recipients": []}
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                envelope["recipients"].append(command[8:].strip("<> "))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while (data := self.rfile.readline()) != b".\r\n":
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                with server.lock:
+                    server.messages.append(dict(envelope, data=b"".join(lines)))
+                self._reply("250 OK")
+                sent += 1
+                if server.drop_after is not None and sent >= server.drop_after:
+                    return
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+    def _reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    """A local SMTP server recording the messages it receives.
+
+    When `drop_after` is set the server closes each session after that many messages, like a server timing out
+    idle sessions.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_after=None):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.drop_after = drop_after
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+        self.port = self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,77 @@
+from datetime import datetime
+from py_utils.async_orm import AsyncDbClient
+from sqlalchemy.exc import IntegrityError
+from tests.py_utils.test_orm import Image, ImageStatus
+
+import importlib.util
+import os
+import unittest
+
+
+@unittest.skipUnless(importlib.util.find_spec("aiosqlite"), "requires the aiosqlite driver")
+class TestAsyncOrm(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.sqlite_db = "test_async_db.sqlite"
+        self.db_client = AsyncDbClient.sqlite(self.sqlite_db)
+        await self.db_client.create_tables()
+
+    def _images(self, count: int):
+        return [Image(core="bmc" if i % 2 else "dc", directory=f"dir-{i}", image_type="mri",
+                      fs_mod_date=datetime.now()) for i in range(count)]
+
+    async def test_insert_and_query_model(self):
+        image = await self.db_client.insert_data(self._images(1)[0])
+        await self.db_client.insert_many([ImageStatus(image_id=image.id) for _ in range(2)])
+
+        images = await self.db_client.query_model(Image)
+
+        self.assertEqual(1, len(images))
+        self.assertEqual(2, len(images[0].image_status))
+
+    async def test_insert_many_return_defaults(self):
+        inserted = await self.db_client.insert_many(self._images(5), batch_size=2, return_defaults=True)
+
+        self.assertEqual(5, len({image.id for image in inserted}))
+
+    async def test_insert_many_rolls_back_failed_batch(self):
+        images = self._images(2)
+        images[0].id = images[1].id = 1
+
+        with self.assertRaises(IntegrityError):
+            await self.db_client.insert_many(images, batch_size=1)
+
+        self.assertEqual(1, await self.db_client.count(Image))
+
+    async def test_load_column(self):
+        await self.db_client.insert_many(self._images(1))
+        (image,) = await self.db_client.query(Image, defer=["directory"], load="noload")
+
+        self.assertEqual("dir-0", await self.db_client.load_column(image, "directory"))
+        self.assertEqual("dir-0", image.directory)
+
+    async def test_query_and_count(self):
+        await self.db_client.insert_many(self._images(6))
+
+        rows = await self.db_client.query(Image, columns=["directory"], filter_by={"core": "bmc"},
+                                          order_by=["directory"], as_dict=True)
+
+        self.assertEqual([{"directory": "dir-1"}, {"directory": "dir-3"}, {"directory": "dir-5"}], rows)
+        self.assertEqual(3, await self.db_client.count(Image, where=[Image.core == "dc"]))
+
+    async def test_iter_model(self):
+        await self.db_client.insert_many(self._images(7))
+
+        keyset = [image.directory async for image in self.db_client.iter_model(Image, chunk_size=3)]
+        streamed = [len(batch) async for batch in self.db_client.iter_model(
+            Image, chunk_size=3, order_by=[Image.directory.desc()], batches=True)]
+
+        self.assertEqual([f"dir-{i}" for i in range(7)], keyset)
+        self.assertEqual([3, 3, 1], streamed)
+
+    async def asyncTearDown(self) -> None:
+        await self.db_client.close()
+        os.remove(self.sqlite_db)
+
+
+if __name__ == '__main__':
+    unittest.main()
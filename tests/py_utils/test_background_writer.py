@@ -0,0 +1,134 @@
+from py_utils.background_writer import BackgroundWriter
+from py_utils.models import JobStatus, JobTiming
+from py_utils.orm import DbClient
+
+import json
+import os
+import threading
+import time
+import unittest
+
+
+class BlockingClient():
+    """A stand-in client whose inserts wait until `release` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.inserted = []
+
+    def insert_many(self, models, batch_size, return_defaults):
+        self.release.wait()
+        self.inserted.extend(models)
+
+
+class TestBackgroundWriter(unittest.TestCase):
+    sqlite_db = "test_background_writer.sqlite"
+    spool_path = "test_background_writer.jsonl"
+
+    def test_close_writes_queued_models(self):
+        with DbClient.sqlite(self.sqlite_db) as db_client:
+            db_client.create_tables()
+            writer = BackgroundWriter(db_client, batch_size=4, flush_interval=0.01)
+
+            for i in range(10):
+                writer.submit(JobStatus(script_name=f"script-{i}.py"))
+            writer.close()
+
+            self.assertEqual(10, db_client.count(JobStatus))
+
+    def test_flush_waits_for_writes(self):
+        db_client = BlockingClient()
+        db_client.release.set()
+        with BackgroundWriter(db_client, flush_interval=0.01) as writer:
+            writer.submit(JobStatus(script_name="script.py"))
+            writer.flush()
+
+            self.assertEqual(1, len(db_client.inserted))
+
+    def test_drop_policy(self):
+        db_client = BlockingClient()
+        writer = BackgroundWriter(db_client, max_queue_size=1, batch_size=1, flush_interval=0.01, on_full="drop")
+
+        results = [writer.submit(JobStatus(script_name=f"script-{i}.py")) for i in range(5)]
+        db_client.release.set()
+        writer.close()
+
+        self.assertIn(False, results)
+        self.assertEqual(results.count(False), writer.dropped)
+        self.assertEqual(results.count(True), len(db_client.inserted))
+
+    def test_submit_after_close(self):
+        writer = BackgroundWriter(BlockingClient())
+        writer.close()
+
+        with self.assertRaises(RuntimeError):
+            writer.submit(JobStatus(script_name="script.py"))
+
+    def test_spools_models_that_fail_to_write(self):
+        # the tables are not created so the insert fails
+        with DbClient.sqlite(self.sqlite_db) as db_client:
+            with BackgroundWriter(db_client, flush_interval=0.01, spool_path=self.spool_path) as writer:
+                writer.submit(JobStatus(script_name="script.py"))
+
+        with open(self.spool_path) as spool:
+            records = [json.loads(line) for line in spool]
+
+        self.assertEqual(1, len(records))
+        self.assertEqual("job_status", records[0]["table"])
+        self.assertEqual("script.py", records[0]["data"]["script_name"])
+
+    def test_spools_related_models(self):
+        job_status = JobStatus(script_name="script.py", timings=[JobTiming(phase="job", duration=0.5)])
+        with DbClient.sqlite(self.sqlite_db) as db_client:
+            with BackgroundWriter(db_client, flush_interval=0.01, spool_path=self.spool_path) as writer:
+                writer.submit(job_status)
+
+        with open(self.spool_path) as spool:
+            (record,) = [json.loads(line) for line in spool]
+
+        timings = record["data"]["timings"]
+        self.assertEqual([("job", 0.5)], [(timing["phase"], timing["duration"]) for timing in timings])
+        self.assertNotIn("report_data", record["data"])
+
+    def test_close_timeout_spools_queued_models(self):
+        db_client = BlockingClient()
+        writer = BackgroundWriter(db_client, batch_size=1, flush_interval=0.01, spool_path=self.spool_path)
+        for i in range(3):
+            writer.submit(JobStatus(script_name=f"script-{i}.py"))
+
+        writer.close(timeout=0.1)
+        db_client.release.set()
+
+        with open(self.spool_path) as spool:
+            spooled = [json.loads(line)["data"]["script_name"] for line in spool]
+
+        # the first model was being written when closing timed out
+        self.assertEqual(["script-1.py", "script-2.py"], spooled)
+
+    def test_close_timeout_with_full_queue(self):
+        db_client = BlockingClient()
+        writer = BackgroundWriter(db_client, max_queue_size=1, batch_size=1, flush_interval=0.01,
+                                  spool_path=self.spool_path)
+        writer.submit(JobStatus(script_name="script-0.py"))
+        while not writer._queue.empty():
+            time.sleep(0.01)
+        # the thread is writing the first model and the second one fills the queue
+        writer.submit(JobStatus(script_name="script-1.py"))
+
+        start = time.monotonic()
+        writer.close(timeout=0.1)
+        elapsed = time.monotonic() - start
+        db_client.release.set()
+
+        self.assertLess(elapsed, 2)
+        with open(self.spool_path) as spool:
+            self.assertEqual(["script-1.py"], [json.loads(line)["data"]["script_name"] for line in spool])
+
+    def tearDown(self) -> None:
+        for path in [self.sqlite_db, self.spool_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+from py_utils.column_types import CompressedPayload, decode_payload, encode_payload
+from py_utils.models import JobStatus, ReportData
+from py_utils.orm import DbClient, _payload_column_ddl
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.orm.exc import DetachedInstanceError
+
+import os
+import sqlite3
+import unittest
+
+
+class TestColumnTypes(unittest.TestCase):
+    sqlite_db = "test_column_types.sqlite"
+
+    def test_round_trip(self):
+        for value in ["", "short text", "long text " * 1000, {"data": {"rows": list(range(500))}, "error": ""}]:
+            with self.subTest(value=str(value)[:20]):
+                self.assertEqual(value, decode_payload(encode_payload(value)))
+
+    def test_compresses_large_values_only(self):
+        small = encode_payload("a" * 100)
+        large = encode_payload("a" * 10000)
+
+        self.assertEqual(b"a" * 100, small[2:])
+        self.assertLess(len(large), 100)
+
+    def test_decodes_legacy_text(self):
+        self.assertEqual('{"data": "{}"}', decode_payload('{"data": "{}"}'))
+        self.assertEqual('{"data": "{}"}', decode_payload(b'{"data": "{}"}'))
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            CompressedPayload(compression="lz4")
+
+    def test_models_store_compressed_payloads(self):
+        summary = "summary " * 5000
+        with DbClient.sqlite(self.sqlite_db) as db_client:
+            db_client.create_tables()
+            job_status = db_client.insert_data(JobStatus(script_name="etl.py", job_summary_data=summary))
+            db_client.insert_data(ReportData(report_data=summary, job_status_id=job_status.id))
+
+            self.assertEqual(summary, db_client.query_model(JobStatus)[0].job_summary_data)
+            self.assertEqual(summary, db_client.query_model(ReportData)[0].report_data)
+
+        conn = sqlite3.connect(self.sqlite_db)
+        stored = conn.execute("SELECT job_summary_data FROM job_status").fetchone()[0]
+        conn.close()
+
+        self.assertLess(len(stored), len(summary) / 10)
+
+    def test_load_deferred_payload(self):
+        summary = {"data": {"rows": list(range(1000))}, "error": ""}
+        with DbClient.sqlite(self.sqlite_db) as db_client:
+            db_client.create_tables()
+            db_client.insert_data(JobStatus(script_name="etl.py", job_summary_data=summary))
+
+            (job_status,) = db_client.query(JobStatus, defer=["job_summary_data"], load="noload")
+            with self.assertRaises(DetachedInstanceError):
+                job_status.job_summary_data
+
+            self.assertEqual(summary, db_client.load_column(job_status, "job_summary_data"))
+            self.assertEqual(summary, job_status.job_summary_data)
+
+            with self.assertRaises(ValueError):
+                db_client.load_column(JobStatus(script_name="etl.py"), JobStatus.job_summary_data)
+
+    def test_migrate_payload_columns(self):
+        with DbClient.sqlite(self.sqlite_db) as db_client:
+            db_client.create_tables()
+            # sqlite stores payloads in any column
+            self.assertEqual([], db_client.migrate_payload_columns())
+
+        column = JobStatus.__table__.c.job_summary_data
+        self.assertEqual("ALTER TABLE job_status MODIFY job_summary_data BLOB(16777215) NULL",
+                         _payload_column_ddl(mysql.dialect(), JobStatus.__table__, column))
+        self.assertEqual("ALTER TABLE job_status ALTER COLUMN job_summary_data TYPE BYTEA "
+                         "USING convert_to(job_summary_data, 'UTF8')",
+                         _payload_column_ddl(postgresql.dialect(), JobStatus.__table__, column))
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.sqlite_db):
+            os.remove(self.sqlite_db)
+
+
+if __name__ == '__main__':
+    unittest.main()
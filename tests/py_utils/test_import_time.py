@@ -0,0 +1,54 @@
+from typing import Dict
+
+import os
+import subprocess
+import sys
+import unittest
+
+
+# The packages that make importing slow, only loaded when the parts of py_utils that need them are used
+HEAVY_PACKAGES = ["sqlalchemy", "sqlmodel", "pytz", "smtplib", "email"]
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _import_times(code: str) -> Dict[str, int]:
+    """Runs `code` in a new interpreter with `-X importtime`, returning the cumulative microseconds per module."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                             env=env, cwd=ROOT, check=True)
+
+    times = {}
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def _heavy_modules(times: Dict[str, int]):
+    return sorted(module for module in times if module.split(".")[0] in HEAVY_PACKAGES)
+
+
+class TestImportTime(unittest.TestCase):
+    def test_utils_is_lightweight(self):
+        times = _import_times("import py_utils.utils")
+
+        self.assertIn("py_utils.utils", times)
+        self.assertEqual([], _heavy_modules(times))
+
+    def test_log_config_is_lightweight(self):
+        times = _import_times("import py_utils.log_config")
+
+        self.assertIn("py_utils.log_config", times)
+        self.assertEqual([], _heavy_modules(times))
+
+    def test_heavy_attributes_load_on_access(self):
+        times = _import_times("from py_utils import utils; utils.ScriptHelper; utils.send_email")
+
+        self.assertEqual(HEAVY_PACKAGES, [package for package in HEAVY_PACKAGES if package in times])
+
+
+if __name__ == '__main__':
+    unittest.main()
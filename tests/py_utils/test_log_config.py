@@ -0,0 +1,172 @@
+from datetime import datetime
+from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+from py_utils import log_config, serializers
+from unittest import mock
+
+import gzip
+import logging
+import os
+import tempfile
+import threading
+import unittest
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, gate: threading.Event = None):
+        super().__init__()
+        self.gate = gate
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        if self.gate is not None:
+            self.gate.wait()
+        self.records.append(record)
+        self.threads.add(threading.current_thread().name)
+
+
+class TestLogConfig(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.logs_dir = log_config.logs_dir
+        log_config.logs_dir = self.directory.name
+        self.root_handlers = logging.getLogger().handlers[:]
+        self.root_level = logging.getLogger().level
+
+    def tearDown(self):
+        log_config.stop_queue_listener()
+        logger = logging.getLogger()
+        for handler in logger.handlers[:]:
+            if handler not in self.root_handlers:
+                logger.removeHandler(handler)
+                handler.close()
+        logger.setLevel(self.root_level)
+        log_config.logs_dir = self.logs_dir
+        self.directory.cleanup()
+
+    def test_queue_logging(self):
+        handler = ListHandler()
+        log_config.configure_logging([handler], use_queue=True)
+
+        logging.info("queued %s", "record")
+        log_config.stop_queue_listener()
+
+        self.assertEqual(["queued record"], [record.getMessage() for record in handler.records])
+        self.assertNotIn(threading.current_thread().name, handler.threads)
+        with open(os.path.join(self.directory.name, f"log-{datetime.today():%Y-%m-%d}.log")) as f:
+            self.assertIn("queued record", f.read())
+
+    def test_bounded_queue_drops_records(self):
+        gate = threading.Event()
+        handler = ListHandler(gate)
+        log_config.configure_logging([handler], use_queue=True, max_queue_size=2)
+
+        for i in range(10):
+            logging.info("record %d", i)
+        gate.set()
+        log_config.stop_queue_listener()
+
+        self.assertGreater(log_config.dropped_records(), 0)
+        self.assertEqual(10, len(handler.records) - 1 + log_config.dropped_records())
+        self.assertIn("Dropped", handler.records[-1].getMessage())
+
+    def test_lazy_log_filename(self):
+        today = datetime.today().strftime('%Y-%m-%d')
+
+        self.assertEqual(today, log_config.todays_date)
+        self.assertEqual(os.path.join(self.directory.name, f"log-{today}.log"), log_config.log_filename)
+
+    def test_size_rotation(self):
+        log_config.configure_logging(rotate="size", max_bytes=1000, backup_count=2)
+        (handler,) = [h for h in logging.getLogger().handlers if isinstance(h, RotatingFileHandler)]
+
+        for i in range(100):
+            logging.info("record %d", i)
+        handler.rotator.wait()
+
+        self.assertEqual(["log.log", "log.log.1.gz", "log.log.2.gz"], sorted(os.listdir(self.directory.name)))
+        with gzip.open(os.path.join(self.directory.name, "log.log.1.gz"), "rt") as f:
+            self.assertIn("record", f.read())
+
+    def test_size_rotation_while_compressing(self):
+        log_config.configure_logging(rotate="size", max_bytes=10 ** 6, backup_count=5)
+        (handler,) = [h for h in logging.getLogger().handlers if isinstance(h, RotatingFileHandler)]
+
+        # the compression of the first rollover is still running when the second one starts
+        gate = threading.Event()
+        compress_log = log_config._compress_log
+
+        def slow_compress_log(source, dest):
+            gate.wait(5)
+            compress_log(source, dest)
+
+        with mock.patch.object(log_config, "_compress_log", slow_compress_log):
+            logging.info("first")
+            handler.doRollover()
+            logging.info("second")
+            threading.Timer(0.2, gate.set).start()
+            handler.doRollover()
+            handler.rotator.wait()
+
+        for name, message in [("log.log.1.gz", "second"), ("log.log.2.gz", "first")]:
+            with gzip.open(os.path.join(self.directory.name, name), "rt") as f:
+                self.assertIn(message, f.read())
+
+    def test_time_rotation(self):
+        log_config.configure_logging(rotate="time")
+        (handler,) = [h for h in logging.getLogger().handlers if isinstance(h, TimedRotatingFileHandler)]
+
+        logging.info("yesterday")
+        handler.doRollover()
+        handler.rotator.wait()
+
+        (rotated,) = [name for name in os.listdir(self.directory.name) if name.endswith(".gz")]
+        self.assertRegex(rotated, r"^log\.log\.\d{4}-\d{2}-\d{2}\.gz$")
+        with gzip.open(os.path.join(self.directory.name, rotated), "rt") as f:
+            self.assertIn("yesterday", f.read())
+
+    def test_json_logs(self):
+        log_config.configure_logging(json_logs=True, context={"script_name": "test", "run_id": 7})
+        self._log_exception()
+        logging.getLogger().handlers[-1].flush()
+
+        self._assert_json_exception_entry()
+
+    def test_json_logs_through_queue(self):
+        handler = ListHandler()
+        log_config.configure_logging([handler], use_queue=True, json_logs=True,
+                                     context={"script_name": "test", "run_id": 7})
+        self._log_exception()
+        log_config.stop_queue_listener()
+
+        # the record is formatted by the listener's handlers, not when it is queued
+        (record,) = handler.records
+        self.assertEqual(("job",), record.args)
+        self.assertIsNotNone(record.exc_info)
+        self._assert_json_exception_entry()
+
+    def _log_exception(self):
+        try:
+            raise ValueError("bad value")
+        except ValueError:
+            logging.exception("failed %s", "job", extra={"rows": 3, "path": object()})
+
+    def _assert_json_exception_entry(self):
+        with open(log_config.log_filename, "rb") as f:
+            entry = serializers.loads(f.readline())
+
+        self.assertEqual("failed job", entry["message"])
+        self.assertEqual("ERROR", entry["level"])
+        self.assertEqual("_log_exception", entry["function"])
+        self.assertEqual(("test", 7, 3), (entry["script_name"], entry["run_id"], entry["rows"]))
+        self.assertTrue(entry["path"].startswith("<object"))
+        self.assertIn("ValueError: bad value", entry["exception"])
+        self.assertNotIn("msg", entry)
+
+    def test_unknown_rotate_mode(self):
+        with self.assertRaises(ValueError):
+            log_config.configure_logging(rotate="weekly")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+from email import message_from_bytes
+from email.policy import default
+from py_utils import utils
+from py_utils.mail_spool import MailSpool
+from py_utils.mailer import Mailer
+from tests.py_utils.smtp_stub import StubSMTPServer
+
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+
+class TestMailSpool(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.spool_dir = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _send(self, spool, i=0):
+        utils.send_email("unused", "sender@example.com", ["user@example.com"], f"Subject {i}", "body", spool=spool)
+
+    def test_send_email_to_spool(self):
+        with StubSMTPServer() as server:
+            spool = MailSpool(self.spool_dir, mailer=Mailer("127.0.0.1", server.port), start=False)
+            for i in range(3):
+                self._send(spool, i)
+
+            self.assertEqual(3, spool.pending)
+            self.assertEqual([], os.listdir(os.path.join(self.spool_dir, "tmp")))
+            self.assertEqual(3, spool.drain())
+
+        subjects = [message_from_bytes(message["data"], policy=default)["Subject"] for message in server.messages]
+        self.assertEqual(["Subject 0", "Subject 1", "Subject 2"], subjects)
+        self.assertEqual(0, spool.pending)
+
+    def test_background_delivery(self):
+        with StubSMTPServer() as server:
+            with MailSpool(self.spool_dir, mailer=Mailer("127.0.0.1", server.port), poll_interval=10) as spool:
+                self._send(spool)
+                deadline = time.monotonic() + 5
+                while not server.messages and time.monotonic() < deadline:
+                    time.sleep(0.01)
+
+        self.assertEqual(1, len(server.messages))
+        self.assertEqual(["user@example.com"], server.messages[0]["recipients"])
+        self.assertEqual(0, spool.pending)
+
+    def test_add_output_file(self):
+        output = os.path.join(self.spool_dir, "message.eml")
+        utils.send_email("unused", "sender@example.com", ["user@example.com"], "Subject", "body", output=output)
+
+        with StubSMTPServer() as server:
+            spool = MailSpool(self.spool_dir, mailer=Mailer("127.0.0.1", server.port), start=False)
+            spool.add(output)
+            spool.drain()
+
+        self.assertFalse(os.path.exists(output))
+        self.assertEqual("sender@example.com", server.messages[0]["sender"])
+
+    def test_retry_with_backoff(self):
+        spool = MailSpool(self.spool_dir, mailer=Mailer("127.0.0.1", 1, timeout=1), max_attempts=2, backoff=60,
+                          start=False)
+        self._send(spool)
+
+        self.assertEqual(0, spool.drain())
+        self.assertEqual(1, spool.pending)
+        (entry,) = os.scandir(os.path.join(self.spool_dir, "new"))
+        self.assertGreater(entry.stat().st_mtime, time.time() + 30)
+
+        # the message is not due yet
+        self.assertEqual(0, spool.drain())
+        self.assertEqual([], spool.failed)
+
+        os.utime(entry.path, (0, 0))
+        self.assertEqual(0, spool.drain())
+        self.assertEqual(0, spool.pending)
+        self.assertEqual(1, len(spool.failed))
+
+    def test_silent_server(self):
+        # accepts connections but never greets
+        with socket.socket() as listener:
+            listener.bind(("127.0.0.1", 0))
+            listener.listen()
+            host = "127.0.0.1:%d" % listener.getsockname()[1]
+
+            spool = MailSpool(self.spool_dir, host=host, timeout=0.2, start=False)
+            self._send(spool)
+            self.assertEqual(0, spool.drain())
+            self.assertEqual(1, spool.pending)
+
+            spool = MailSpool(self.spool_dir, host=host, timeout=30, poll_interval=0)
+            os.utime(next(os.scandir(os.path.join(self.spool_dir, "new"))).path, (0, 0))
+            deadline = time.monotonic() + 5
+            while spool.pending and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            start = time.monotonic()
+            spool.close(timeout=0.2, drain=False)
+            self.assertLess(time.monotonic() - start, 5)
+            self.assertEqual(1, len(os.listdir(os.path.join(self.spool_dir, "sending"))))
+
+    def test_bcc(self):
+        output = os.path.join(self.spool_dir, "message.eml")
+        utils.send_email("unused", "sender@example.com", ["user@example.com"], "Subject", "body", output=output)
+        with open(output, "rb") as f:
+            message = f.read()
+        with open(output, "wb") as f:
+            f.write(b"Bcc: hidden@example.com,\r\n other@example.com\r\n" + message)
+
+        with StubSMTPServer() as server:
+            spool = MailSpool(self.spool_dir, mailer=Mailer("127.0.0.1", server.port), start=False)
+            spool.add(output)
+            self.assertEqual(1, spool.drain())
+
+        self.assertEqual(["user@example.com", "hidden@example.com", "other@example.com"],
+                         server.messages[0]["recipients"])
+        self.assertNotIn(b"example.com\r\n other", server.messages[0]["data"])
+        self.assertNotIn(b"Bcc", server.messages[0]["data"])
+        self.assertEqual("Subject", message_from_bytes(server.messages[0]["data"], policy=default)["Subject"])
+
+    def test_requires_host_or_mailer(self):
+        with self.assertRaises(ValueError):
+            MailSpool(self.spool_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+from email import message_from_bytes
+from email.policy import default
+from py_utils import utils
+from py_utils.mailer import Mailer, prepare_attachment, write_email
+from tests.py_utils.smtp_stub import StubSMTPServer
+
+import gzip
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+
+def _message(i: int):
+    return utils.build_email("sender@example.com", [f"user{i}@example.com"], f"Report {i}", "body")
+
+
+class TestMailer(unittest.TestCase):
+    def test_reuses_connection(self):
+        with StubSMTPServer() as server, Mailer("127.0.0.1", server.port) as mailer:
+            for i in range(5):
+                mailer.send(_message(i))
+
+        self.assertEqual(1, server.connections)
+        self.assertEqual(5, len(server.messages))
+        self.assertEqual(["user4@example.com"], server.messages[4]["recipients"])
+
+    def test_reconnects_dropped_session(self):
+        with StubSMTPServer(drop_after=2) as server, Mailer("127.0.0.1", server.port) as mailer:
+            for i in range(5):
+                mailer.send(_message(i))
+
+        self.assertEqual(5, len(server.messages))
+        self.assertEqual(3, server.connections)
+
+    def test_send_many_limits_connections(self):
+        with StubSMTPServer() as server, Mailer("127.0.0.1", server.port, max_connections=3) as mailer:
+            errors = mailer.send_many(_message(i) for i in range(20))
+
+        self.assertEqual([None] * 20, errors)
+        self.assertEqual(20, len(server.messages))
+        self.assertLessEqual(server.connections, 3)
+
+    def test_send_many_reports_errors(self):
+        with Mailer("127.0.0.1", 1, timeout=1) as mailer:
+            errors = mailer.send_many([_message(0)])
+
+        self.assertIsInstance(errors[0], OSError)
+
+    def test_send_email_with_mailer(self):
+        with StubSMTPServer() as server, Mailer("127.0.0.1", server.port) as mailer:
+            for i in range(3):
+                utils.send_email("unused", "sender@example.com", ["user@example.com"], "Subject", "body",
+                                 mailer=mailer)
+
+        self.assertEqual(1, server.connections)
+        self.assertEqual(3, len(server.messages))
+
+    def test_send_email_streaming(self):
+        content = b".csv starting with a dot\n" * 5000
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "report.csv")
+            with open(path, "wb") as f:
+                f.write(content)
+
+            with StubSMTPServer() as server, Mailer("127.0.0.1", server.port) as mailer:
+                utils.send_email("unused", "sender@example.com", ["user@example.com"], "Subject", "body", path,
+                                 mailer=mailer, stream=True, compress_over=1000)
+
+        parsed = message_from_bytes(server.messages[0]["data"], policy=default)
+        attachment = next(parsed.iter_attachments())
+
+        self.assertEqual("report.csv.gz", attachment.get_filename())
+        self.assertEqual(content, gzip.decompress(attachment.get_content()))
+
+    def test_prepare_attachment_detects_mime_type(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for filename, expected in [("report.csv", "text/csv"), ("report.pdf", "application/pdf"),
+                                       ("report.csv.gz", "application/gzip"), ("report", "application/octet-stream")]:
+                path = os.path.join(directory, filename)
+                open(path, "wb").close()
+                attachment = prepare_attachment(path)
+                attachment.fileobj.close()
+                with self.subTest(filename=filename):
+                    self.assertEqual(expected, f"{attachment.maintype}/{attachment.subtype}")
+
+    def test_prepare_attachment_compresses_large_files(self):
+        content = b"id,value\n" * 10000
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "report.csv")
+            with open(path, "wb") as f:
+                f.write(content)
+
+            small = prepare_attachment(path, compress_over=len(content))
+            small.fileobj.close()
+            gzipped = prepare_attachment(path, compress_over=1000)
+            with gzipped.fileobj:
+                self.assertEqual(content, gzip.decompress(gzipped.fileobj.read()))
+            zipped = prepare_attachment(path, compress_over=1000, compression="zip")
+            with zipped.fileobj, zipfile.ZipFile(zipped.fileobj) as archive:
+                self.assertEqual(content, archive.read("report.csv"))
+
+            with self.assertRaises(ValueError):
+                prepare_attachment(path, max_size=1000)
+
+        self.assertEqual(("report.csv", "text"), (small.filename, small.maintype))
+        self.assertEqual(("report.csv.gz", "application/gzip"), (gzipped.filename, f"application/{gzipped.subtype}"))
+        self.assertEqual("report.csv.zip", zipped.filename)
+
+    def test_write_email_streams_attachments(self):
+        content = os.urandom(200000)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.bin")
+            with open(path, "wb") as f:
+                f.write(content)
+
+            msg = utils.build_email("sender@example.com", ["user@example.com"], "Subject", "<p>body</p>")
+            output = io.BytesIO()
+            attachment = prepare_attachment(path)
+            with attachment.fileobj:
+                write_email(output, msg, [attachment])
+
+        parsed = message_from_bytes(output.getvalue(), policy=default)
+        attachment = next(parsed.iter_attachments())
+
+        self.assertEqual("Subject", parsed["Subject"])
+        self.assertEqual("<p>body</p>", parsed.get_body().get_content().rstrip())
+        self.assertEqual("data.bin", attachment.get_filename())
+        self.assertEqual(content, attachment.get_content())
+
+    def test_send_file(self):
+        msg = utils.build_email("sender@example.com", ["user@example.com"], "Subject", ".leading dot")
+        fp = io.BytesIO()
+        write_email(fp, msg, [])
+        fp.seek(0)
+
+        with StubSMTPServer() as server, Mailer("127.0.0.1", server.port) as mailer:
+            mailer.send_file(fp, "sender@example.com", ["user@example.com"])
+
+        self.assertEqual(["user@example.com"], server.messages[0]["recipients"])
+        self.assertIn(b"\r\n.leading dot", server.messages[0]["data"])
+
+    def test_send_after_close(self):
+        mailer = Mailer("127.0.0.1")
+        mailer.close()
+
+        with self.assertRaises(RuntimeError):
+            mailer.send(_message(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+from datetime import datetime
+from py_utils.metrics import InMemorySink, PrometheusTextfileSink, StatsdSink, instrument_engine
+from py_utils.orm import DbClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from tests.py_utils.test_orm import Image
+
+import os
+import socket
+import tempfile
+import unittest
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.sink = InMemorySink()
+        self.db_client = DbClient.sqlite(os.path.join(self.directory.name, "metrics.sqlite"), metrics=self.sink)
+        self.db_client.create_tables()
+
+    def tearDown(self):
+        self.db_client.close()
+        self.directory.cleanup()
+
+    def _images(self, count: int):
+        return [Image(core="bmc", directory=f"dir-{i}", image_type="mri", fs_mod_date=datetime.now())
+                for i in range(count)]
+
+    def test_statement_metrics(self):
+        self.db_client.insert_many(self._images(5))
+        self.db_client.query_model(Image)
+        with self.assertRaises(OperationalError):
+            self.db_client.query(Image, where=[text("missing_column = 1")])
+
+        snapshot = self.sink.snapshot()
+        counters, timings = snapshot["counters"], snapshot["timings"]
+
+        self.assertEqual(5, counters['db_statement_rows_total{operation="insert"}'])
+        self.assertEqual(1, counters['db_statement_errors_total{operation="select"}'])
+        self.assertEqual(1, timings['db_statement_duration_seconds{operation="select"}']["count"])
+        self.assertGreater(timings["db_pool_checkout_duration_seconds"]["count"], 0)
+
+        select = timings['db_statement_duration_seconds{operation="select"}']
+        self.assertEqual(select["count"], list(select["buckets"].values())[-1])
+
+    def test_client_operation_metrics(self):
+        self.db_client.insert_data(self._images(1)[0])
+        with self.assertRaises(OperationalError):
+            self.db_client.query(Image, where=[text("missing_column = 1")])
+
+        snapshot = self.sink.snapshot()
+
+        self.assertEqual(1, snapshot["timings"]['db_client_duration_seconds{operation="connect"}']["count"])
+        self.assertEqual(1, snapshot["timings"]['db_client_duration_seconds{operation="insert_data"}']["count"])
+        self.assertEqual(1, snapshot["counters"]['db_client_errors_total{operation="query"}'])
+
+    def test_slow_query_log(self):
+        sink = InMemorySink()
+        instrument_engine(self.db_client._engine, sink, slow_query_threshold=0)
+        # instrumenting twice with the same sink has no effect
+        instrument_engine(self.db_client._engine, sink, slow_query_threshold=0)
+
+        with self.assertLogs(level="WARNING") as logs:
+            self.db_client.count(Image)
+
+        self.assertEqual(1, len(logs.records))
+        self.assertIn("SELECT count(*)", logs.records[0].getMessage())
+        self.assertEqual(1, sink.snapshot()["counters"]['db_slow_statements_total{operation="select"}'])
+        self.assertNotIn('db_slow_statements_total{operation="select"}', self.sink.snapshot()["counters"])
+
+    def test_prometheus_textfile(self):
+        path = os.path.join(self.directory.name, "metrics.prom")
+        sink = PrometheusTextfileSink(path, buckets=[0.1, 1])
+        sink.increment("rows_total", 3, {"operation": "insert"})
+        sink.timing("duration_seconds", 0.5, {"operation": "select"})
+        sink.close()
+
+        with open(path) as f:
+            lines = f.read().splitlines()
+
+        self.assertEqual([
+            "# TYPE rows_total counter",
+            'rows_total{operation="insert"} 3',
+            "# TYPE duration_seconds histogram",
+            'duration_seconds_bucket{operation="select",le="0.1"} 0',
+            'duration_seconds_bucket{operation="select",le="1"} 1',
+            'duration_seconds_bucket{operation="select",le="+Inf"} 1',
+            'duration_seconds_sum{operation="select"} 0.5',
+            'duration_seconds_count{operation="select"} 1',
+        ], lines)
+
+    def test_statsd(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server:
+            server.bind(("127.0.0.1", 0))
+            server.settimeout(5)
+            sink = StatsdSink(port=server.getsockname()[1], prefix="job.")
+            sink.increment("rows_total", 3, {"operation": "insert"})
+            sink.timing("duration_seconds", 0.25)
+            sink.close()
+
+            self.assertEqual(b"job.rows_total:3|c|#operation:insert", server.recv(1024))
+            self.assertEqual(b"job.duration_seconds:250.000|ms", server.recv(1024))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,13 @@
 from datetime import datetime
+from py_utils.models import JobStatus, ReportData
 from py_utils.orm import DbClient
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Column, Enum, Field, Relationship, SQLModel
 from typing import List, Optional
 
 import os
+import tempfile
 import unittest
 
 
@@ -121,6 +125,356 @@ class TestOrm(unittest.TestCase):
 
         self.assertIsInstance(expected, actual)
 
+    def test_insert_many(self):
+        self.db_client.create_tables()
+
+        expected = 25
+        images = [Image(core="bmc", directory=f"dir-{i}", image_type="mri", fs_mod_date=datetime.now())
+                  for i in range(expected)]
+
+        inserted = self.db_client.insert_many(images, batch_size=10)
+
+        self.assertEqual(expected, len(inserted))
+        self.assertEqual(expected, len(self.db_client.query_model(Image)))
+
+    def test_insert_many_return_defaults(self):
+        self.db_client.create_tables()
+
+        images = [Image(core="bmc", directory=f"dir-{i}", image_type="mri", fs_mod_date=datetime.now())
+                  for i in range(5)]
+
+        inserted = self.db_client.insert_many(images, batch_size=2, return_defaults=True)
+
+        self.assertTrue(all(image.id is not None for image in inserted))
+        self.assertEqual(5, len({image.id for image in inserted}))
+
+    def test_insert_many_related_models(self):
+        self.db_client.create_tables()
+
+        jobs = [JobStatus(script_name=f"job-{i}.py", elapsed_time=1) for i in range(4)]
+        jobs[2].report_data = [ReportData(report_name="first"), ReportData(report_name="second")]
+
+        self.db_client.insert_many(jobs, batch_size=2)
+
+        self.assertEqual(4, self.db_client.count(JobStatus))
+        self.assertEqual(2, self.db_client.count(ReportData))
+        (job,) = self.db_client.query(JobStatus, where=[JobStatus.script_name == "job-2.py"], load="selectin")
+        self.assertEqual(["first", "second"], sorted(report.report_name for report in job.report_data))
+
+    def test_insert_many_rolls_back_failed_batch(self):
+        self.db_client.create_tables()
+
+        images = [Image(id=i, core="bmc", directory=f"dir-{i}", image_type="mri", fs_mod_date=datetime.now())
+                  for i in range(1, 5)]
+        # the duplicate primary key fails the second batch
+        images.append(Image(id=3, core="bmc", directory="duplicate", image_type="mri", fs_mod_date=datetime.now()))
+
+        with self.assertRaises(IntegrityError):
+            self.db_client.insert_many(images, batch_size=3)
+
+        self.assertEqual(3, len(self.db_client.query_model(Image)))
+
+    def test_iter_model(self):
+        self.db_client.create_tables()
+        self.db_client.insert_many(
+            [Image(core="bmc", directory=f"dir-{i}", image_type="mri", fs_mod_date=datetime.now()) for i in range(7)])
+
+        images = list(self.db_client.iter_model(Image, chunk_size=3))
+
+        self.assertEqual([f"dir-{i}" for i in range(7)], [image.directory for image in images])
+
+    def test_iter_model_batches(self):
+        self.db_client.create_tables()
+        self.db_client.insert_many(
+            [Image(core="bmc", directory=f"dir-{i}", image_type="mri", fs_mod_date=datetime.now()) for i in range(7)])
+
+        batches = list(self.db_client.iter_model(Image, chunk_size=3, batches=True))
+
+        self.assertEqual([3, 3, 1], [len(batch) for batch in batches])
+
+    def test_iter_model_where_and_order_by(self):
+        self.db_client.create_tables()
+        self.db_client.insert_many(
+            [Image(core="bmc" if i % 2 else "dc", directory=f"dir-{i}", image_type="mri", fs_mod_date=datetime.now())
+             for i in range(6)])
+
+        images = list(self.db_client.iter_model(
+            Image, chunk_size=2, where=[Image.core == "bmc"], order_by=[Image.directory.desc()]))
+
+        self.assertEqual(["dir-5", "dir-3", "dir-1"], [image.directory for image in images])
+
+    def test_iter_model_loads_joined_relationships(self):
+        self.db_client.create_tables()
+        image = self.db_client.insert_data(
+            Image(core="bmc", directory="dir", image_type="mri", fs_mod_date=datetime.now()))
+        self.db_client.insert_many([ImageStatus(image_id=image.id) for _ in range(3)])
+
+        images = list(self.db_client.iter_model(Image, chunk_size=1))
+
+        self.assertEqual(1, len(images))
+        self.assertEqual(3, len(images[0].image_status))
+
+    def _insert_images(self):
+        self.db_client.insert_many([
+            Image(core="bmc" if i % 2 else "dc", directory=f"dir-{i}", image_type="mri", fs_mod_date=datetime.now())
+            for i in range(6)
+        ])
+
+    def test_query_filters_in_database(self):
+        self.db_client.create_tables()
+        self._insert_images()
+
+        images = self.db_client.query(Image, filter_by={"core": "bmc"}, where=[Image.directory != "dir-1"],
+                                      order_by=[Image.directory.desc()])
+
+        self.assertEqual(["dir-5", "dir-3"], [image.directory for image in images])
+
+    def test_query_projection_limit_offset(self):
+        self.db_client.create_tables()
+        self._insert_images()
+
+        rows = self.db_client.query(Image, columns=["directory", "core"], order_by=["directory"], limit=2, offset=1)
+
+        self.assertEqual([("dir-1", "bmc"), ("dir-2", "dc")], [tuple(row) for row in rows])
+        self.assertEqual("dir-1", rows[0].directory)
+
+    def test_query_as_dict_with_aggregate(self):
+        self.db_client.create_tables()
+        self._insert_images()
+
+        rows = self.db_client.query(Image, columns=[Image.core, func.count().label("total")], group_by=["core"],
+                                    order_by=["core"], as_dict=True)
+
+        self.assertEqual([{"core": "bmc", "total": 3}, {"core": "dc", "total": 3}], rows)
+
+    def test_count(self):
+        self.db_client.create_tables()
+        self._insert_images()
+
+        self.assertEqual(6, self.db_client.count(Image))
+        self.assertEqual(2, self.db_client.count(Image, where=[Image.directory < "dir-4"], filter_by={"core": "dc"}))
+
+    def _insert_image_with_statuses(self):
+        image = self.db_client.insert_data(
+            Image(core="bmc", directory="dir", image_type="mri", fs_mod_date=datetime.now()))
+        self.db_client.insert_many([ImageStatus(image_id=image.id) for _ in range(2)])
+
+    def test_query_model_loading_strategy(self):
+        self.db_client.create_tables()
+        self._insert_image_with_statuses()
+
+        for load, expected in [("noload", 0), ("selectin", 2), ("subquery", 2), ("joined", 2)]:
+            with self.subTest(load=load):
+                images = self.db_client.query_model(Image, load=load)
+                self.assertEqual(1, len(images))
+                self.assertEqual(expected, len(images[0].image_status))
+
+    def test_query_model_unknown_loading_strategy(self):
+        self.db_client.create_tables()
+
+        with self.assertRaises(ValueError):
+            self.db_client.query_model(Image, load="eager")
+
+    def test_query_defers_columns(self):
+        self.db_client.create_tables()
+        self._insert_image_with_statuses()
+
+        image = self.db_client.query(Image, load="noload", defer=["directory"])[0]
+
+        self.assertNotIn("directory", image.__dict__)
+        self.assertEqual("bmc", image.core)
+
+    def test_query_defers_related_columns(self):
+        self.db_client.create_tables()
+        job_status = JobStatus(script_name="etl.py", elapsed_time=1,
+                               report_data=[ReportData(report_name="report", report_data="id,value\n" * 100)])
+        self.db_client.insert_many([job_status])
+
+        for load, defer in [("joined", ReportData.report_data), ("selectin", "report_data.report_data"),
+                            (None, ReportData.report_data)]:
+            with self.subTest(load=load, defer=defer):
+                (job_status,) = self.db_client.query(JobStatus, load=load, defer=[defer, "job_summary_data"])
+
+                (report,) = job_status.report_data
+                self.assertEqual("report", report.report_name)
+                self.assertNotIn("report_data", report.__dict__)
+                self.assertNotIn("job_summary_data", job_status.__dict__)
+
+        with self.assertRaises(ValueError):
+            self.db_client.query(JobStatus, defer=[Image.directory])
+
+    def test_iter_model_without_load_strategy(self):
+        self.db_client.create_tables()
+        image = self.db_client.insert_data(
+            Image(core="bmc", directory="dir", image_type="mri", fs_mod_date=datetime.now()))
+        self.db_client.insert_many([ImageStatus(image_id=image.id) for _ in range(3)])
+
+        for order_by in (None, [Image.directory]):
+            with self.subTest(order_by=order_by):
+                images = list(self.db_client.iter_model(Image, chunk_size=1, order_by=order_by, load=None))
+
+                self.assertEqual(1, len(images))
+                self.assertEqual(3, len(images[0].image_status))
+
+    def test_iter_model_rejects_joined_loading(self):
+        self.db_client.create_tables()
+
+        with self.assertRaises(ValueError):
+            list(self.db_client.iter_model(Image, load="joined"))
+
+    def test_clients_share_engine(self):
+        other_client = DbClient.sqlite(self.sqlite_db)
+
+        self.assertIs(self.db_client._engine, other_client._engine)
+        other_client.close()
+
+    def test_private_engine_with_pool_options(self):
+        with DbClient.sqlite(self.sqlite_db, pool_size=2, pool_pre_ping=True, share_engine=False) as other_client:
+            self.assertIsNot(self.db_client._engine, other_client._engine)
+            self.assertEqual(2, other_client._engine.pool.size())
+
+    def test_close_disposes_unused_engine(self):
+        other_client = DbClient.sqlite(self.sqlite_db, pool_recycle=60)
+        engine = other_client._engine
+        other_client.close()
+        other_client.close()
+
+        self.assertEqual(0, engine.pool.checkedin())
+        with DbClient.sqlite(self.sqlite_db, pool_recycle=60) as new_client:
+            self.assertIsNot(engine, new_client._engine)
+
+    def test_sqlite_pragma_preset(self):
+        with DbClient.sqlite(self.sqlite_db, pragmas="fast") as client:
+            with client._engine.connect() as connection:
+                journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+                synchronous = connection.exec_driver_sql("PRAGMA synchronous").scalar()
+
+        self.assertEqual("wal", journal_mode)
+        # NORMAL
+        self.assertEqual(1, synchronous)
+
+    def test_sqlite_custom_pragmas(self):
+        with DbClient.sqlite(self.sqlite_db, pragmas={"busy_timeout": 1234}) as client:
+            with client._engine.connect() as connection:
+                self.assertEqual(1234, connection.exec_driver_sql("PRAGMA busy_timeout").scalar())
+
+    def test_sqlite_invalid_pragmas(self):
+        with self.assertRaises(ValueError):
+            DbClient.sqlite(self.sqlite_db, pragmas="unknown")
+        with self.assertRaises(ValueError):
+            DbClient.sqlite(self.sqlite_db, pragmas={"journal_mode": "WAL; DROP TABLE image"})
+
+    def _count_statements(self, client: DbClient) -> list:
+        statements = []
+        event.listen(client._engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        return statements
+
+    def test_create_tables_is_cached_per_engine(self):
+        statements = self._count_statements(self.db_client)
+
+        self.db_client.create_tables()
+        first_call = len(statements)
+        self.db_client.create_tables()
+        with DbClient.sqlite(self.sqlite_db) as shared_client:
+            shared_client.create_tables()
+
+        self.assertGreater(first_call, 0)
+        self.assertEqual(first_call, len(statements))
+
+        self.db_client.create_tables(use_cache=False)
+        self.assertGreater(len(statements), first_call)
+
+    def test_create_tables_marker(self):
+        with tempfile.TemporaryDirectory() as marker_dir:
+            self.db_client.create_tables(marker_dir=marker_dir)
+            self.assertEqual(1, len(os.listdir(marker_dir)))
+
+            with DbClient.sqlite(self.sqlite_db, share_engine=False) as other_client:
+                statements = self._count_statements(other_client)
+                other_client.create_tables(marker_dir=marker_dir)
+
+            self.assertEqual([], statements)
+
+    def _upsert_images(self, **kwargs):
+        self.db_client.insert_many([
+            Image(id=i, core="bmc", directory=f"dir-{i}", image_type="mri", fs_mod_date=datetime.now())
+            for i in range(1, 4)
+        ])
+
+        written = self.db_client.upsert([
+            Image(id=i, core="dc", directory=f"new-dir-{i}", image_type="mri", fs_mod_date=datetime.now())
+            for i in range(2, 6)
+        ], batch_size=3, **kwargs)
+
+        self.assertEqual(4, written)
+        return {image.id: image for image in self.db_client.query_model(Image)}
+
+    def test_upsert(self):
+        self.db_client.create_tables()
+
+        images = self._upsert_images()
+
+        self.assertEqual(5, len(images))
+        self.assertEqual(("bmc", "dir-1"), (images[1].core, images[1].directory))
+        self.assertEqual(("dc", "new-dir-2"), (images[2].core, images[2].directory))
+        self.assertEqual(("dc", "new-dir-5"), (images[5].core, images[5].directory))
+
+    def test_upsert_rejects_related_models(self):
+        self.db_client.create_tables()
+
+        job = JobStatus(script_name="job.py", elapsed_time=1, report_data=[ReportData(report_name="report")])
+
+        with self.assertRaises(ValueError):
+            self.db_client.upsert([job])
+
+    def test_upsert_update_columns(self):
+        self.db_client.create_tables()
+
+        images = self._upsert_images(conflict_keys=["id"], update_columns=["core"])
+
+        self.assertEqual(("dc", "dir-2"), (images[2].core, images[2].directory))
+
+    def test_upsert_skips_conflicts_without_update_columns(self):
+        self.db_client.create_tables()
+
+        images = self._upsert_images(update_columns=[])
+
+        self.assertEqual(("bmc", "dir-3"), (images[3].core, images[3].directory))
+        self.assertEqual(("dc", "new-dir-4"), (images[4].core, images[4].directory))
+
+    def test_ensure_indexes(self):
+        self.db_client.create_tables()
+        with self.db_client._engine.begin() as connection:
+            connection.exec_driver_sql("DROP INDEX ix_job_status_level_script_start_time")
+            connection.exec_driver_sql("DROP INDEX ix_report_data_job_status_id")
+
+        created = self.db_client.ensure_indexes()
+
+        self.assertEqual(["ix_job_status_level_script_start_time", "ix_report_data_job_status_id"], created)
+        self.assertEqual([], self.db_client.ensure_indexes())
+
+    def test_ensure_indexes_skips_indexes_on_the_same_columns(self):
+        self.db_client.create_tables()
+        with self.db_client._engine.begin() as connection:
+            connection.exec_driver_sql("DROP INDEX ix_report_data_job_status_id")
+            # like the index mysql creates for the foreign key
+            connection.exec_driver_sql("CREATE INDEX report_data_ibfk_1 ON report_data (job_status_id)")
+
+        self.assertEqual([], self.db_client.ensure_indexes())
+
+    def test_job_status_lookups_use_indexes(self):
+        self.db_client.create_tables()
+
+        with self.db_client._engine.connect() as connection:
+            plan = connection.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT * FROM job_status WHERE script_name = 'etl.py' "
+                "ORDER BY script_start_time DESC LIMIT 1").all()
+
+        self.assertIn("ix_job_status_script_name_script_start_time", str(plan))
+        self.assertIn("ix_report_data_job_status_id", {index.name for index in ReportData.__table__.indexes})
+        self.assertIn("ix_job_status_script_start_time", {index.name for index in JobStatus.__table__.indexes})
+
     def tearDown(self) -> None:
+        self.db_client.close()
         os.remove(self.sqlite_db)
         return super().tearDown()
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+from py_utils.models import JobStatus, JobStatusLevels, JobTiming, ReportData
+from py_utils.orm import DbClient
+from py_utils.retention import RetentionPolicy, purge_job_status
+
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+
+class TestRetention(unittest.TestCase):
+    sqlite_db = "test_retention.sqlite"
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+    def setUp(self) -> None:
+        self.db_client = DbClient.sqlite(self.sqlite_db)
+        self.db_client.create_tables()
+
+    def _insert(self, script_name: str, level: JobStatusLevels, days_old: int) -> JobStatus:
+        return self.db_client.insert_data(JobStatus(
+            script_name=script_name, level=level, elapsed_time=2,
+            script_start_time=self.now - timedelta(days=days_old)))
+
+    def test_purges_expired_rows_in_batches(self):
+        for days_old in [1, 40, 50, 60]:
+            self._insert("etl.py", JobStatusLevels.INFO, days_old)
+        old_job = self._insert("etl.py", JobStatusLevels.INFO, 70)
+        self.db_client.insert_data(ReportData(report_name="report", job_status_id=old_job.id))
+        self.db_client.insert_data(JobTiming(phase="job", duration=0.5, job_status_id=old_job.id))
+
+        result = purge_job_status(self.db_client, [RetentionPolicy(max_age=timedelta(days=30))], batch_size=2,
+                                  vacuum=True, now=self.now)
+
+        self.assertEqual(4, result.deleted)
+        self.assertEqual(1, self.db_client.count(JobStatus))
+        self.assertEqual(0, self.db_client.count(ReportData))
+        self.assertEqual(0, self.db_client.count(JobTiming))
+        self.assertEqual(4, sum(totals["runs"] for totals in result.rollup.values()))
+        self.assertEqual({"runs": 1, "elapsed_time": 2}, result.rollup[("etl.py", "INFO", "2024-03-23")])
+
+    def test_narrower_policies_take_precedence(self):
+        self._insert("etl.py", JobStatusLevels.INFO, 40)
+        self._insert("etl.py", JobStatusLevels.ERROR, 40)
+        self._insert("etl.py", JobStatusLevels.ERROR, 400)
+        self._insert("sync.py", JobStatusLevels.INFO, 40)
+        self._insert(None, JobStatusLevels.INFO, 40)
+
+        policies = [
+            RetentionPolicy(max_age=timedelta(days=30)),
+            RetentionPolicy(max_age=timedelta(days=365), level=JobStatusLevels.ERROR),
+            RetentionPolicy(max_age=timedelta(days=90), script_name="sync.py"),
+        ]
+        result = purge_job_status(self.db_client, policies, now=self.now)
+
+        remaining = self.db_client.query(JobStatus, columns=["script_name", "level"], order_by=["id"])
+        self.assertEqual(3, result.deleted)
+        self.assertEqual([("etl.py", JobStatusLevels.ERROR), ("sync.py", JobStatusLevels.INFO)],
+                         [tuple(row) for row in remaining])
+
+    def test_longest_of_equally_specific_policies_wins(self):
+        self._insert("sync.py", JobStatusLevels.ERROR, 100)
+        self._insert("sync.py", JobStatusLevels.INFO, 100)
+        self._insert("etl.py", JobStatusLevels.ERROR, 100)
+        self._insert("etl.py", JobStatusLevels.ERROR, 400)
+        self._insert("report.py", JobStatusLevels.ERROR, 50)
+        self._insert("report.py", JobStatusLevels.ERROR, 70)
+
+        policies = [
+            RetentionPolicy(max_age=timedelta(days=90), script_name="sync.py"),
+            RetentionPolicy(max_age=timedelta(days=365), level=JobStatusLevels.ERROR),
+            RetentionPolicy(max_age=timedelta(days=60), script_name="report.py", level=JobStatusLevels.ERROR),
+        ]
+        result = purge_job_status(self.db_client, policies, now=self.now)
+
+        remaining = self.db_client.query(JobStatus, columns=["script_name", "level"], order_by=["id"])
+        self.assertEqual(3, result.deleted)
+        self.assertEqual(["sync.py", "etl.py", "report.py"], [row.script_name for row in remaining])
+        self.assertTrue(all(row.level == JobStatusLevels.ERROR for row in remaining))
+
+    def test_archives_expired_rows(self):
+        job_status = self._insert("etl.py", JobStatusLevels.ERROR, 40)
+        self.db_client.insert_data(ReportData(report_name="report", job_status_id=job_status.id))
+        self._insert("etl.py", JobStatusLevels.INFO, 40)
+
+        policies = [
+            RetentionPolicy(max_age=timedelta(days=30), level="ERROR"),
+            RetentionPolicy(max_age=timedelta(days=30), level="INFO", archive=False),
+        ]
+        with tempfile.TemporaryDirectory() as archive_dir:
+            result = purge_job_status(self.db_client, policies, archive_dir=archive_dir, now=self.now)
+
+            with gzip.open(result.archives[0], "rt") as archive:
+                records = [json.loads(line) for line in archive]
+
+        self.assertEqual(2, result.deleted)
+        self.assertEqual(1, len(records))
+        self.assertEqual("etl.py", records[0]["script_name"])
+        self.assertEqual("report", records[0]["report_data"][0]["report_name"])
+
+    def tearDown(self) -> None:
+        self.db_client.close()
+        os.remove(self.sqlite_db)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from py_utils import serializers
+from py_utils.models import JobStatusLevels
+from uuid import UUID
+
+import unittest
+
+
+@dataclass
+class Summary():
+    rows: int
+    finished: datetime
+
+
+class TestSerializers(unittest.TestCase):
+    def test_round_trip_with_every_backend(self):
+        finished = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        value = {
+            "finished": finished,
+            "level": JobStatusLevels.ERROR,
+            "total": Decimal("1.10"),
+            "tags": {"etl"},
+            "summary": Summary(rows=3, finished=finished),
+            "id": UUID("12345678-1234-5678-1234-567812345678"),
+            "nested": {"values": [1, 2.5, None, True]},
+        }
+
+        for backend in serializers.available_backends():
+            with self.subTest(backend=backend):
+                serializers.set_backend(backend)
+                actual = serializers.loads(serializers.dumps(value))
+
+                self.assertIn(actual["finished"], ["2024-01-02T03:04:05+00:00", "2024-01-02T03:04:05Z"])
+                self.assertEqual("ERROR", actual["level"])
+                self.assertEqual("1.10", actual["total"])
+                self.assertEqual(["etl"], actual["tags"])
+                self.assertEqual(3, actual["summary"]["rows"])
+                self.assertEqual("12345678-1234-5678-1234-567812345678", actual["id"])
+                self.assertEqual({"values": [1, 2.5, None, True]}, actual["nested"])
+
+    def test_unsupported_value(self):
+        with self.assertRaises(TypeError):
+            serializers.dumps({"value": object()})
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            serializers.set_backend("pickle")
+
+    def tearDown(self) -> None:
+        serializers.set_backend()
+
+
+if __name__ == '__main__':
+    unittest.main()
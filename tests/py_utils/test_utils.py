@@ -1,8 +1,14 @@
+from datetime import datetime
+
+import json
 import sqlite3
+import tempfile
 import unittest
 import os
 
 from py_utils import utils
+from py_utils.background_writer import BackgroundWriter
+from py_utils.models import JobStatus, JobTiming
 from py_utils.orm import DbClient
 
 
@@ -36,6 +42,25 @@ class TestUtils(unittest.TestCase):
             utils.get_unique_filename(self.original_file_name),
             self.second_duplicate_file_name)
 
+    def test_get_unique_filename_fills_gap(self):
+        open(self.original_file_name, 'w').close()
+        open(self.second_duplicate_file_name, 'w').close()
+        self.assertEquals(
+            utils.get_unique_filename(self.original_file_name),
+            self.first_duplicate_file_name)
+
+    def test_get_unique_filename_reserve(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "job.log")
+            for i in range(100):
+                open(os.path.join(directory, f"job ({i + 1}).log"), 'w').close()
+
+            reserved = [utils.get_unique_filename(path, reserve=True) for _ in range(3)]
+
+            self.assertEqual([path, os.path.join(directory, "job (101).log"), os.path.join(directory, "job (102).log")],
+                             reserved)
+            self.assertTrue(all(os.path.isfile(p) for p in reserved))
+
     def test_script_helper_signature(self):
         """
         This test checks if log_failed_job and log_successful_job log status of data
@@ -63,6 +88,97 @@ class TestUtils(unittest.TestCase):
 
         self.assertEqual(count_job_status_data, 2)
         conn.close()
+        db_client.close()
+
+    def test_script_helper_background_writer(self):
+        with DbClient(f"sqlite:///{self.test_db}") as db_client:
+            writer = BackgroundWriter(db_client, flush_interval=0.01)
+            script_helper = utils.ScriptHelper("test_writer.py", db_client, writer=writer)
+            script_helper.log_failed_job({"info": "Could not write into sheet"}, "File not found")
+            script_helper.log_successful_job({"info": "File written"})
+            writer.close()
+
+            self.assertEqual(2, db_client.count(JobStatus, filter_by={"script_name": "test_writer.py"}))
+
+    def test_script_helper_stores_summary_once(self):
+        with DbClient(f"sqlite:///{self.test_db}") as db_client:
+            script_helper = utils.ScriptHelper("test_summary.py", db_client)
+            script_helper.log_failed_job({"rows": 3, "finished": datetime(2024, 1, 1)}, "File not found")
+
+            job_status = db_client.query_model(JobStatus)[0]
+
+        self.assertEqual({"data": {"rows": 3, "finished": "2024-01-01T00:00:00"}, "error": "File not found"},
+                         utils.read_job_summary(job_status.job_summary_data))
+
+    def test_script_helper_phases(self):
+        with DbClient(f"sqlite:///{self.test_db}") as db_client:
+            script_helper = utils.ScriptHelper("test_phases.py", db_client)
+
+            @script_helper.phase("transform")
+            def transform(rows):
+                return [row * 2 for row in rows]
+
+            with script_helper.phase("download", trace_memory=True, profile=True, profile_limit=5):
+                data = [bytearray(1024) for _ in range(100)]
+            transform(range(10))
+            transform(range(10))
+            script_helper.log_successful_job({"rows": len(data)})
+
+            timings = db_client.query(JobTiming, order_by=["id"])
+            job_status = db_client.query_model(JobStatus)[0]
+
+        self.assertEqual(["job", "download", "transform", "transform"], [timing.phase for timing in timings])
+        self.assertTrue(all(timing.job_status_id == job_status.id for timing in timings))
+        self.assertTrue(all(0 < timing.duration < 1 for timing in timings))
+        self.assertGreaterEqual(timings[1].memory_peak, 100 * 1024)
+        self.assertIsNone(timings[2].memory_peak)
+        self.assertLessEqual(len(timings[1].profile), 5)
+        self.assertIn("function", timings[1].profile[0])
+
+    def test_script_helper_nested_traced_phases(self):
+        with DbClient(f"sqlite:///{self.test_db}") as db_client:
+            script_helper = utils.ScriptHelper("test_phases.py", db_client)
+
+            with script_helper.phase("outer", trace_memory=True):
+                with script_helper.phase("inner"):
+                    pass
+                with self.assertRaises(RuntimeError):
+                    with script_helper.phase("traced inner", trace_memory=True):
+                        pass
+            # the outer phase is over, so tracing is allowed again
+            with script_helper.phase("next", trace_memory=True):
+                pass
+
+        self.assertEqual(["inner", "outer", "next"], [timing.phase for timing in script_helper._timings])
+
+    def test_script_helper_nested_profiled_phases(self):
+        with DbClient(f"sqlite:///{self.test_db}") as db_client:
+            script_helper = utils.ScriptHelper("test_phases.py", db_client)
+
+            with script_helper.phase("outer", profile=True, profile_limit=1000):
+                with self.assertRaises(RuntimeError):
+                    with script_helper.phase("profiled inner", profile=True):
+                        pass
+                sorted(range(100))
+            with script_helper.phase("next", profile=True):
+                pass
+
+        (outer, following) = script_helper._timings
+        self.assertEqual(["outer", "next"], [outer.phase, following.phase])
+        self.assertTrue(any("sorted" in entry["function"] for entry in outer.profile))
+
+    def test_script_helper_reserved_phase(self):
+        with DbClient(f"sqlite:///{self.test_db}") as db_client:
+            script_helper = utils.ScriptHelper("test_phases.py", db_client)
+
+            with self.assertRaises(ValueError):
+                script_helper.phase("job")
+
+    def test_read_legacy_job_summary(self):
+        legacy = json.dumps({"data": json.dumps({"info": "File written"}), "error": ""})
+
+        self.assertEqual({"data": {"info": "File written"}, "error": ""}, utils.read_job_summary(legacy))
+        self.assertEqual({"data": None, "error": ""}, utils.read_job_summary(None))
 
     def tearDown(self):
         if os.path.exists(self.test_db):
@@ -72,3 +188,6 @@ class TestUtils(unittest.TestCase):
 
         if os.path.isfile(self.first_duplicate_file_name):
             os.remove(self.first_duplicate_file_name)
+
+        if os.path.isfile(self.second_duplicate_file_name):
+            os.remove(self.second_duplicate_file_name)